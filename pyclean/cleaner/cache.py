@@ -0,0 +1,135 @@
+"""
+Persistent cache of package manager scan results.
+
+The last scan snapshot is stored per package manager together with the package manager
+fingerprint. Matching fingerprint means the snapshot can be used as is, otherwise it still
+lets the package manager reprocess only packages which changed since then.
+"""
+
+import hashlib
+import json
+import os
+from dataclasses import dataclass, fields
+from pathlib import Path
+from typing import Optional
+
+from pyclean.cleaner.package_managers.base import PackageInfo, ScanSnapshot
+from pyclean.cleaner.package_managers.file_list import FileList
+from pyclean.constants import PkgType
+
+# bump whenever the stored format or PackageInfo changes
+CACHE_VERSION = 4
+# 64 MiB
+DEFAULT_MAX_CACHE_SIZE = 64 * 1024 * 1024
+
+
+def default_cache_dir() -> Path:
+    cache_home = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(cache_home) / "pyclean"
+
+
+@dataclass
+class CacheEntry:
+    fingerprint: str
+    snapshot: ScanSnapshot
+
+
+def _package_to_dict(package: PackageInfo) -> dict:
+    # not asdict, it would deep copy the file list
+    result = {field.name: getattr(package, field.name) for field in fields(package)}
+    files = package.files if isinstance(package.files, FileList) else FileList(package.files)
+    return {**result, "files": files.to_json()}
+
+
+def _package_from_dict(package: dict) -> PackageInfo:
+    pkg_type = PkgType(package["pkg_type"]) if package["pkg_type"] else None
+    files = FileList.from_json(package["files"])
+    return PackageInfo(**{**package, "files": files, "pkg_type": pkg_type})
+
+
+class ScanCache:
+    def __init__(
+        self,
+        directory: Optional[Path] = None,
+        max_size: int = DEFAULT_MAX_CACHE_SIZE,
+    ) -> None:
+        self.directory = directory if directory is not None else default_cache_dir()
+        self.max_size = max_size
+
+    def _path(self, cache_key: str) -> Path:
+        return self.directory / f"{hashlib.sha256(cache_key.encode()).hexdigest()[:32]}.json"
+
+    def load(self, cache_key: str) -> Optional[CacheEntry]:
+        """
+        Get the last stored scan of the package manager.
+
+        Args:
+            cache_key: Identification of the package manager, see `PackageManager.cache_key`.
+        """
+        path = self._path(cache_key)
+        try:
+            with open(path) as cache_file:
+                content = json.load(cache_file)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+        if content.get("version") != CACHE_VERSION or content.get("cache_key") != cache_key:
+            return None
+
+        # mark as recently used for the eviction
+        path.touch()
+        snapshot = ScanSnapshot(
+            stamps=content["stamps"],
+            packages={
+                key: [_package_from_dict(package) for package in packages]
+                for key, packages in content["packages"].items()
+            },
+        )
+        return CacheEntry(fingerprint=content["fingerprint"], snapshot=snapshot)
+
+    def store(self, cache_key: str, fingerprint: str, snapshot: ScanSnapshot) -> None:
+        """
+        Store scan of the package manager and evict the least recently used entries
+        if the cache grew too large.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._path(cache_key)
+        content = {
+            "version": CACHE_VERSION,
+            "cache_key": cache_key,
+            "fingerprint": fingerprint,
+            "stamps": snapshot.stamps,
+            "packages": {
+                key: [_package_to_dict(package) for package in packages]
+                for key, packages in snapshot.packages.items()
+            },
+        }
+        # write to temporary file first, so concurrent runs never read half written cache
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "w") as cache_file:
+            json.dump(content, cache_file)
+
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def evict(self) -> None:
+        """
+        Remove least recently used entries until the cache fits into its maximum size.
+        """
+        entries = []
+        for path in self.directory.glob("*.json"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                # removed by another run in the meantime
+                continue
+
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+
+            path.unlink(missing_ok=True)
+            total_size -= size
@@ -1,48 +1,369 @@
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from queue import Queue
+from subprocess import CalledProcessError
+from typing import Optional
+
 from tqdm import tqdm
 
-from pyclean.cleaner.package_managers.base import PackageInfo
+from pyclean.cleaner.cache import ScanCache
+from pyclean.cleaner.conflicts import FileOwnershipIndex
+from pyclean.cleaner.duplicates import DuplicateIndex
+from pyclean.cleaner.impact import (
+    DuplicateDetails,
+    RemovalImpact,
+    RpmDependencyGraph,
+    pip_broken_requirements,
+)
+from pyclean.cleaner.interpreters import InterpreterDiscovery
+from pyclean.cleaner.package_managers.base import PackageInfo, PackageManager, ScanSnapshot
+from pyclean.cleaner.package_managers.dist_info import DistInfo
 from pyclean.cleaner.package_managers.pip import Pip
 from pyclean.cleaner.package_managers.pipx import Pipx
 from pyclean.cleaner.package_managers.rpm import Rpm
-from pyclean.constants import PkgType
-from pyclean.helpers import dupe_table
+from pyclean.cleaner.policy import Policy
+from pyclean.cleaner.removal import RemovalPlan, RemovalQueue, RemovalStep, execute_removal
+from pyclean.cleaner.shadowing import PathPriority, analyze_imports
+from pyclean.cleaner.uninstall import TrashSession
+from pyclean.cleaner.verify import PackageVerification, verify_packages
+from pyclean.constants import PkgType, RpmBackend
+from pyclean.helpers import canonicalize_name, dupe_table, iter_impact_notes, iter_removal_notes
 
 
 class Cleaner:
-    def __init__(self, system_clean: bool) -> None:
+    def __init__(
+        self,
+        system_clean: bool,
+        rpm_backend: RpmBackend = RpmBackend.cli,
+        site_packages: Iterable[str] = (),
+        cache: Optional[ScanCache] = None,
+        refresh_cache: bool = False,
+        discovery: Optional[InterpreterDiscovery] = None,
+        root: str = "/",
+    ) -> None:
         self.system_clean = system_clean
-        self._pkg_managers = [
-            # wtf mypy, pkg_manager is not abstract, where do you see it?
-            pkg_manager(self.system_clean)  # type: ignore
-            for pkg_manager in [Rpm, Pip, Pipx]
-            if pkg_manager(self.system_clean).exists()  # type: ignore
+        # root directory of the scanned system, e.g. an unpacked container image
+        self.root = root
+        self.cache = cache
+        # ignore cached results, but still store the fresh ones
+        self.refresh_cache = refresh_cache
+        rpm = Rpm(self.system_clean, backend=rpm_backend, root=root)
+        pkg_managers: list[PackageManager] = [
+            rpm,
+            Pip(
+                self.system_clean,
+                extra_paths=site_packages,
+                rpm=rpm if rpm.exists() else None,
+                # interpreters of a root can't be run, its site directories are guessed
+                discovery=discovery if root == "/" else None,
+                root=root,
+            ),
+            Pipx(self.system_clean, root=root),
         ]
+        self._pkg_managers = [pkg_manager for pkg_manager in pkg_managers if pkg_manager.exists()]
+        # python packages per package manager from the last scan
+        self._packages: dict[PkgType, list[PackageInfo]] = {}
+        self._duplicate_index = DuplicateIndex()
+        # errors of package managers which failed during the last scan
+        self.scan_errors: dict[PkgType, Exception] = {}
+        # steps of the last clean with their results
+        self.removal_steps: list[RemovalStep] = []
+        # read for removal impacts once per scan, see `removal_impact`
+        self._rpm_graph: Optional[RpmDependencyGraph] = None
+        self._pip_distributions: Optional[list[DistInfo]] = None
+
+    def enable_native_uninstall(self, trash: Optional[TrashSession] = None) -> TrashSession:
+        """
+        Uninstall pip packages natively, by moving their files to the trash session,
+        instead of spawning pip.
+
+        Returns:
+            The trash session, see `pyclean undo`.
+        """
+        trash = trash if trash is not None else TrashSession.create()
+        for pkg_manager in self._pkg_managers:
+            if isinstance(pkg_manager, Pip):
+                pkg_manager.trash = trash
+
+        return trash
+
+    def _iter_python_packages(self, pkg_manager: PackageManager) -> Iterator[PackageInfo]:
+        if self.cache is None:
+            yield from pkg_manager.iter_python_packages()
+            return
+
+        cache_key = pkg_manager.cache_key()
+        fingerprint = pkg_manager.fingerprint()
+        entry = None if self.refresh_cache else self.cache.load(cache_key)
+        if entry is not None:
+            if fingerprint is not None and entry.fingerprint == fingerprint:
+                pkg_manager.snapshot = entry.snapshot
+                yield from pkg_manager.packages_from_snapshot(entry.snapshot)
+                return
+
+            # stale, but still good to reprocess only what has changed since then
+            if pkg_manager.snapshot is None:
+                pkg_manager.snapshot = entry.snapshot
+
+        packages = []
+        for package in pkg_manager.iter_python_packages():
+            packages.append(package)
+            yield package
+
+        if fingerprint is not None:
+            snapshot = pkg_manager.snapshot or ScanSnapshot.from_packages(packages)
+            self.cache.store(cache_key, fingerprint, snapshot)
+
+    def _produce_python_packages(self, pkg_manager: PackageManager, events: Queue) -> None:
+        try:
+            for package in self._iter_python_packages(pkg_manager):
+                events.put((pkg_manager.pkg_type, package, None))
+        except Exception as e:
+            events.put((pkg_manager.pkg_type, None, e))
+            return
+
+        events.put((pkg_manager.pkg_type, None, None))
+
+    def _package_order(self, package: PackageInfo) -> int:
+        # keep the order of package managers no matter which one finished scan first
+        for i, pkg_manager in enumerate(self._pkg_managers):
+            if pkg_manager.pkg_type == package.pkg_type:
+                return i
+
+        return len(self._pkg_managers)
+
+    def _iter_scan(
+        self,
+        pkg_managers: Optional[list[PackageManager]] = None,
+    ) -> Iterator[tuple[str, str, list[PackageInfo]]]:
+        """
+        Scan package managers concurrently, a failing one doesn't abort the others.
+
+        Packages are consumed as the package managers stream them, so duplicates are
+        known long before the slowest package manager finishes.
+
+        Args:
+            pkg_managers: Package managers to (re)scan, all of them by default. Results
+                of the other package managers from previous scan are kept.
+
+        Yields:
+            Normalized name, name and packages of a duplicate as soon as its second provider
+            shows up. Once everything is scanned, duplicates which changed since they were
+            yielded, or which were known already from the previous scan, are yielded with
+            all of their packages. The name is the one of its first package, so it may
+            change in between, the normalized name identifies the duplicate.
+        """
+        if pkg_managers is None:
+            pkg_managers = self._pkg_managers
+
+        self._rpm_graph = None
+        self._pip_distributions = None
+        for pkg_manager in pkg_managers:
+            # every scan has to see the current state of the system
+            pkg_manager.invalidate()
+            self.scan_errors.pop(pkg_manager.pkg_type, None)
+
+        previous = {
+            pkg_manager.pkg_type: {
+                id(package): package for package in self._packages.get(pkg_manager.pkg_type, [])
+            }
+            for pkg_manager in pkg_managers
+        }
+        current: dict[PkgType, list[PackageInfo]] = {
+            pkg_manager.pkg_type: [] for pkg_manager in pkg_managers
+        }
+        # normalized name -> number of packages the duplicate was yielded with
+        yielded: dict[str, int] = {}
+        events: Queue = Queue()
+        with ThreadPoolExecutor(max_workers=max(len(pkg_managers), 1)) as executor:
+            for pkg_manager in pkg_managers:
+                executor.submit(self._produce_python_packages, pkg_manager, events)
+
+            pkg_manager_pbar = tqdm(total=len(pkg_managers))
+            pending = len(pkg_managers)
+            while pending:
+                pkg_type, package, error = events.get()
+                if package is not None:
+                    current[pkg_type].append(package)
+                    # reused from the previous scan, it is already indexed
+                    if id(package) in previous[pkg_type]:
+                        continue
+
+                    name = self._duplicate_index.add(package)
+                    group = self._duplicate_index.group(name, self._package_order)
+                    if group is not None and name not in yielded:
+                        yielded[name] = len(group)
+                        yield name, group[0].name, group
+
+                    continue
+
+                pending -= 1
+                pkg_manager_pbar.update(1)
+                indexed = [*previous[pkg_type].values(), *current[pkg_type]]
+                if error is not None:
+                    tqdm.write(f"Error: scanning {pkg_type.name} packages failed: {error}")
+                    self.scan_errors[pkg_type] = error
+                    current[pkg_type] = []
+                else:
+                    pkg_manager_pbar.set_description(f"Processed {pkg_type.name}")
+
+                # drop packages which are gone since the last scan
+                self._duplicate_index.replace(indexed, current[pkg_type])
+                self._packages[pkg_type] = current[pkg_type]
+
+        for name, group in self._duplicate_index.iter_duplicates(self._package_order):
+            if yielded.get(name) != len(group):
+                yield name, group[0].name, group
+
+    def _scan(self, pkg_managers: Optional[list[PackageManager]] = None) -> None:
+        for _ in self._iter_scan(pkg_managers):
+            pass
+
+    def _duplicates(self) -> dict[str, list[PackageInfo]]:
+        return self._duplicate_index.duplicates(self._package_order)
+
+    def iter_package_duplicates(self) -> Iterator[tuple[str, str, list[PackageInfo]]]:
+        """
+        Scan the system and stream duplicates as soon as they are found, see `_iter_scan`.
+        """
+        yield from self._iter_scan()
 
     def get_package_duplicates(self) -> dict[str, list[PackageInfo]]:
-        pkgs = []
-        pkg_manager_pbar = tqdm(self._pkg_managers)
-        for pkg_manager in pkg_manager_pbar:
-            pkg_manager_pbar.set_description(f"Processing {pkg_manager.pkg_type.name}")
-            pkgs.extend(pkg_manager.get_python_packages())
-
-        dupes_per_package_name = []
-        unique = set()
-        for pkg in pkgs:
-            if pkg.name in unique:
-                dupes_per_package_name.append(pkg.name)
+        self._scan()
+        return self._duplicates()
+
+    def verify_duplicates(
+        self,
+        jobs: Optional[int] = None,
+        max_in_flight: Optional[int] = None,
+    ) -> dict[str, list[PackageVerification]]:
+        """
+        Scan the system and check files of duplicate packages against digests recorded
+        by their package managers, to find out whose copy of the files is on the disk.
+
+        Args:
+            jobs: Number of hashing processes.
+            max_in_flight: Maximum number of hashing tasks submitted at once.
+        """
+        duplicates = self.get_package_duplicates()
+        pkg_managers = {pkg_manager.pkg_type: pkg_manager for pkg_manager in self._pkg_managers}
+        packages = []
+        for pkgs in tqdm(duplicates.values(), desc="Reading file digests"):
+            for pkg in pkgs:
+                pkg_manager = pkg_managers.get(pkg.pkg_type)  # type: ignore[arg-type]
+                digests = pkg_manager.file_digests(pkg) if pkg_manager is not None else {}
+                packages.append((pkg, digests))
+
+        verifications = iter(verify_packages(packages, jobs=jobs, max_in_flight=max_in_flight))
+        # verifications are in the same order as the packages
+        return {name: [next(verifications) for _ in pkgs] for name, pkgs in duplicates.items()}
+
+    def get_file_conflicts(self) -> dict[str, list[PackageInfo]]:
+        """
+        Scan the system and find files owned by more than one package, no matter
+        the names of the packages.
+
+        Returns:
+            Owners of each conflicting file, in order of package managers.
+        """
+        self._scan()
+        index = FileOwnershipIndex()
+        for package in self._all_packages():
+            index.add(package)
+
+        return index.conflicts()
+
+    def _all_packages(self) -> Iterator[PackageInfo]:
+        for pkg_manager in self._pkg_managers:
+            if pkg_manager.pkg_type in self.scan_errors:
+                continue
+
+            # rpm leaves python3- library out of its packages when there is a binary
+            # package with the same name, but all of them matter here
+            snapshot = pkg_manager.snapshot
+            if snapshot is not None:
+                yield from snapshot.all_packages()
             else:
-                unique.add(pkg.name)
-
-        result: dict[str, list[PackageInfo]] = {name: [] for name in dupes_per_package_name}
-        for pkg in pkgs:
-            # maybe installed same version via e.g. pip to user-space and system-wide, but
-            # then location should be different
-            if pkg.name in dupes_per_package_name and (
-                result.get(pkg.name) is None or pkg not in result[pkg.name]
+                yield from self._packages.get(pkg_manager.pkg_type, [])
+
+    def removal_impact(
+        self,
+        plan: RemovalPlan,
+        removed_rpms_before: Iterable[str] = (),
+    ) -> RemovalImpact:
+        """
+        Find out what else the removal plan removes or breaks, without running anything.
+
+        The last scan is used, see `plan_clean`. Dependencies are read just once per scan,
+        so impacts of many plans are cheap.
+
+        Args:
+            plan: The removal plan.
+            removed_rpms_before: Names of rpm packages removed after the last scan, e.g. by
+                queued removals, whatever they removed along is not repeated.
+        """
+        removed_rpms_before = set(removed_rpms_before)
+        impact = RemovalImpact()
+        pkg_managers = {pkg_manager.pkg_type: pkg_manager for pkg_manager in self._pkg_managers}
+        removed_rpms = {package.package_name for package in plan.packages.get(PkgType.rpm, [])}
+        rpm = pkg_managers.get(PkgType.rpm)
+        if removed_rpms and isinstance(rpm, Rpm):
+            if self._rpm_graph is None:
+                self._rpm_graph = RpmDependencyGraph(
+                    tqdm(rpm.iter_dependency_headers(), desc="Reading rpm dependencies"),
+                )
+
+            graph = self._rpm_graph
+            impact.rpm_dependents = graph.removal_closure(removed_rpms, removed_rpms_before)
+            removed_rpms |= set(impact.rpm_dependents)
+            if plan.auto_remove:
+                impact.rpm_unneeded = graph.unneeded(removed_rpms, removed_rpms_before)
+                removed_rpms |= set(impact.rpm_unneeded)
+
+            impact.rpm_unknown = graph.unresolved(
+                removed_rpms,
+                plan.auto_remove,
+                removed_rpms_before,
+            )
+
+        planned = {id(package) for packages in plan.packages.values() for package in packages}
+        removed_names = set()
+        remaining_names = set()
+        for package in self._all_packages():
+            name = canonicalize_name(package.name)
+            if id(package) in planned or (
+                package.pkg_type == PkgType.rpm
+                and package.package_name in removed_rpms | removed_rpms_before
             ):
-                result[pkg.name].append(pkg)
+                removed_names.add(name)
+            else:
+                remaining_names.add(name)
 
-        return result
+        pip = pkg_managers.get(PkgType.pip)
+        if isinstance(pip, Pip):
+            if self._pip_distributions is None:
+                self._pip_distributions = list(pip.iter_distributions())
+
+            impact.pip_broken = pip_broken_requirements(
+                self._pip_distributions,
+                removed_names,
+                remaining_names,
+            )
+
+        return impact
+
+    def plan_clean(
+        self,
+        pkg_type: Optional[PkgType],
+        auto_remove: bool,
+        policy: Optional[Policy] = None,
+    ) -> tuple[RemovalPlan, RemovalImpact]:
+        """
+        Compute what `clean` would remove, and what else would be removed or broken
+        because of that, without removing anything.
+        """
+        plan = self._plan(pkg_type, auto_remove, policy)
+        return plan, self.removal_impact(plan)
 
     def _input_for_package(self, package_infos: list[PackageInfo]) -> PackageInfo:
         while True:
@@ -63,76 +384,324 @@ class Cleaner:
 
             print("Invalid input.")
 
+    def _removal_impacts(
+        self,
+        packages: list[PackageInfo],
+        auto_remove: bool,
+        removed_rpms_before: frozenset[str],
+    ) -> list[RemovalImpact]:
+        impacts = []
+        for package in packages:
+            if package.pkg_type is None:
+                # nothing can remove it, see `_interactive_clean_step`
+                impacts.append(RemovalImpact())
+                continue
+
+            plan = RemovalPlan(auto_remove=auto_remove, packages={package.pkg_type: [package]})
+            impacts.append(self.removal_impact(plan, removed_rpms_before))
+
+        return impacts
+
+    def _duplicate_details(
+        self,
+        name: str,
+        packages: list[PackageInfo],
+        path_priority: Optional[PathPriority],
+        removed_rpms_before: frozenset[str] = frozenset(),
+    ) -> DuplicateDetails:
+        details = DuplicateDetails(name, packages, removed_rpms_before=removed_rpms_before)
+        # the choice is up to the user anyway, it is just less informed
+        if path_priority is not None:
+            try:
+                details.imports = analyze_imports(packages, path_priority)
+            except Exception as e:
+                tqdm.write(f"Error: can't tell which copy of {name} python imports: {e}")
+
+        try:
+            details.impacts = self._removal_impacts(packages, False, removed_rpms_before)
+            details.auto_remove_impacts = self._removal_impacts(
+                packages,
+                True,
+                removed_rpms_before,
+            )
+        except Exception as e:
+            details.impacts, details.auto_remove_impacts = [], []
+            tqdm.write(f"Error: can't tell what else removal of {name} removes: {e}")
+
+        return details
+
+    def _queue_removal(
+        self,
+        removals: RemovalQueue,
+        package: PackageInfo,
+        auto_remove: bool,
+        impact: Optional[RemovalImpact],
+        removed_rpms: set[str],
+    ) -> None:
+        """
+        Queue removal of the package, or run it in the foreground if dnf has to ask.
+
+        Args:
+            removals: Queue of the confirmed removals.
+            package: The package to remove.
+            auto_remove: Whether to automatically remove dependencies of the package.
+            impact: What else the removal removes, as the user has seen it, None if unknown.
+            removed_rpms: Names of rpm packages removed by the queued removals, updated
+                with those removed by this one.
+
+        Raises:
+            CalledProcessError: If sudo refused.
+        """
+        # dnf mustn't ask only if the user has seen everything it removes along
+        assume_yes = impact is not None and impact.complete
+        plan = RemovalPlan(
+            auto_remove=auto_remove,
+            assume_yes=assume_yes,
+            packages={package.pkg_type: [package]},  # type: ignore[dict-item]
+        )
+        if package.pkg_type != PkgType.rpm:
+            # pip and pipx never ask
+            removals.submit(plan)
+            return
+
+        removed_rpms.add(package.package_name)
+        if impact is None or not assume_yes:
+            # dnf asks itself, it can't share the terminal with the next question
+            removals.run(plan)
+            # only dnf knows what else it has removed, dependencies are read again
+            self._rpm_graph = None
+            return
+
+        rpm = next(
+            pkg_manager for pkg_manager in self._pkg_managers if isinstance(pkg_manager, Rpm)
+        )
+        rpm.authorize()
+        # don't wait for dnf, the next question can be asked right away
+        removals.submit(plan)
+        removed_rpms.update(impact.rpm_dependents, impact.rpm_unneeded)
+
     def _interactive_clean_step(
         self,
-        package_name: str,
-        packages_infos: list[PackageInfo],
+        details: DuplicateDetails,
+        removals: RemovalQueue,
+        path_priority: Optional[PathPriority],
+        removed_rpms: set[str],
     ) -> None:
-        package_infos_copy = packages_infos.copy()
-        while len(package_infos_copy) > 1:
-            print(dupe_table(package_name, package_infos_copy, verbose=False))
+        while len(details.packages) > 1:
+            print(
+                dupe_table(details.name, details.packages, verbose=False, imports=details.imports),
+            )
+            for note in iter_impact_notes(details):
+                print(note)
+
             print("Choose package for removal (write the number of the package above):")
 
-            chosen_pkg = self._input_for_package(package_infos_copy)
+            chosen_pkg = self._input_for_package(details.packages)
+            if chosen_pkg.pkg_type is None:
+                print(
+                    f"It is not known which package manager installed {chosen_pkg.name}, "
+                    "it can't be removed.",
+                )
+                continue
+
             chosen_auto_remove = self._input_ask_yes_no(
                 "Do you want to automatically remove dependencies of the package "
                 f"{chosen_pkg.name}? [y/N]",
             )
 
+            index = next(i for i, package in enumerate(details.packages) if package is chosen_pkg)
+            impact = details.impact(index, chosen_auto_remove)
+            if impact is None:
+                print(
+                    "What else the removal removes is not known, the package manager will ask "
+                    "for confirmation itself.",
+                )
+            else:
+                for note in iter_removal_notes(chosen_pkg, impact):
+                    print(note)
+
             if not self._input_ask_yes_no(
                 f"\nDo you really want to remove package {chosen_pkg.name} "
                 f"via {chosen_pkg.pkg_type}? [y/N]",
             ):
                 return
 
-            for pkg_manager in self._pkg_managers:
-                if pkg_manager.pkg_type == chosen_pkg.pkg_type:
-                    pkg_manager.remove_python_package(
-                        chosen_pkg.name,
-                        chosen_auto_remove,
-                    )
+            try:
+                self._queue_removal(
+                    removals,
+                    chosen_pkg,
+                    chosen_auto_remove,
+                    impact,
+                    removed_rpms,
+                )
+            except CalledProcessError as e:
+                print(f"Error: sudo refused, {chosen_pkg.name} is not removed: {e}")
+                return
+
+            remaining = [package for package in details.packages if package is not chosen_pkg]
+            # which copy python imports changes without the removed one, what else removal
+            # of the others removes changes with the queued removals
+            details = self._duplicate_details(
+                details.name,
+                remaining,
+                path_priority,
+                frozenset(removed_rpms),
+            )
+
+    def interactive_clean(self, path_priority: Optional[PathPriority] = None) -> None:
+        """
+        Go through the duplicates one by one and let the user choose copies to remove.
 
-            package_infos_copy.remove(chosen_pkg)
+        Confirmed removals are queued to run in the background and details of the next
+        duplicate are prefetched while the user decides about the current one, so nobody
+        waits for the package managers between questions. dnf doesn't ask again only for
+        removals whose whole impact is known and the user has seen it, the others run
+        in the foreground and dnf asks. The steps with their results are kept in
+        `removal_steps`.
 
-    def interactive_clean(self) -> None:
+        Args:
+            path_priority: `sys.path` of the interpreter, to show which copy python imports.
+        """
         pbar = tqdm(total=1)
         pbar.set_description("Getting duplication packages on your system...")
-        dupes = self.get_package_duplicates()
+        dupes = list(self.get_package_duplicates().items())
         pbar.update(1)
+        # rpm packages removed by the confirmed removals, impacts are computed without them
+        removed_rpms: set[str] = set()
+
+        with (
+            RemovalQueue(self._pkg_managers) as removals,
+            ThreadPoolExecutor(max_workers=1) as prefetch,
+        ):
+
+            def prefetch_details(i: int) -> Future[DuplicateDetails]:
+                name, packages = dupes[i]
+                return prefetch.submit(
+                    self._duplicate_details,
+                    name,
+                    packages,
+                    path_priority,
+                    frozenset(removed_rpms),
+                )
+
+            next_details = prefetch_details(0) if dupes else None
+            pbar_interactive = tqdm(range(len(dupes)))
+            for i in pbar_interactive:
+                details = next_details.result()  # type: ignore[union-attr]
+                if details.removed_rpms_before != removed_rpms:
+                    # removals confirmed meanwhile change what else removal of the copies
+                    # removes, the prefetched details are outdated
+                    details = self._duplicate_details(
+                        details.name,
+                        details.packages,
+                        path_priority,
+                        frozenset(removed_rpms),
+                    )
+
+                if i + 1 < len(dupes):
+                    next_details = prefetch_details(i + 1)
+
+                pbar_interactive.set_description(f"Cleaning {details.name}")
+                self._interactive_clean_step(details, removals, path_priority, removed_rpms)
+
+            if removals.pending():
+                tqdm.write(f"Waiting for {removals.pending()} queued removals to finish...")
 
-        pbar_interactive = tqdm(dupes.items())
-        for pkg_name, pkgs_infos in pbar_interactive:
-            pbar_interactive.set_description(f"Cleaning {pkg_name}")
-            self._interactive_clean_step(pkg_name, pkgs_infos)
+        self.removal_steps = removals.steps
 
     @staticmethod
     def _duplicates_for_pkg_type(
         pkg_type: PkgType,
         duplicates: dict[str, list[PackageInfo]],
-    ) -> set[str]:
-        result = set()
+    ) -> list[PackageInfo]:
+        result = []
         for _, pkgs in duplicates.items():
             for pkg in pkgs:
                 if pkg.pkg_type == pkg_type:
-                    result.add(pkg.package_name)
+                    result.append(pkg)
                     break
 
         return result
 
-    def clean(self, pkg_type: PkgType, auto_remove: bool) -> None:
+    def _removal_plan(
+        self,
+        keep_pkg_type: PkgType,
+        duplicates: dict[str, list[PackageInfo]],
+        auto_remove: bool,
+    ) -> RemovalPlan:
+        plan = RemovalPlan(auto_remove=auto_remove)
         for pkg_manager in self._pkg_managers:
-            if pkg_manager.pkg_type == pkg_type:
+            if pkg_manager.pkg_type == keep_pkg_type:
                 continue
 
-            pbar = tqdm(total=2)
-            pbar.set_description("Getting duplication packages on your system...")
-            dupes = self._duplicates_for_pkg_type(
-                pkg_manager.pkg_type,
-                self.get_package_duplicates(),
-            )
-            pbar.update(1)
-            pbar.set_description(
-                f"Removing duplicates for {pkg_manager.pkg_type.name}...",
+            packages = self._duplicates_for_pkg_type(pkg_manager.pkg_type, duplicates)
+            if packages:
+                plan.packages[pkg_manager.pkg_type] = packages
+
+        return plan
+
+    def _plan(
+        self,
+        pkg_type: Optional[PkgType],
+        auto_remove: bool,
+        policy: Optional[Policy],
+    ) -> RemovalPlan:
+        if policy is not None:
+            # duplicates are decided while the scan still runs
+            return policy.plan(self.iter_package_duplicates(), auto_remove)
+
+        if pkg_type is None:
+            raise ValueError("Package type to keep or a policy is required.")
+
+        return self._removal_plan(pkg_type, self.get_package_duplicates(), auto_remove)
+
+    def clean(
+        self,
+        pkg_type: Optional[PkgType],
+        auto_remove: bool,
+        policy: Optional[Policy] = None,
+        assume_yes: bool = False,
+    ) -> dict[str, list[PackageInfo]]:
+        """
+        Remove duplicates from all package managers except the one to keep, or those
+        the policy doesn't keep.
+
+        The system is scanned once, only package managers which removed something
+        are scanned again afterwards. Every package manager removes its packages by
+        a single command, all of them at once, see `execute_removal`. The steps with
+        their results are kept in `removal_steps`.
+
+        Args:
+            pkg_type: Package manager whose packages should be kept.
+            auto_remove: Whether to automatically remove dependencies of the packages.
+            policy: Policy deciding which copy of each duplicate is kept, instead of
+                the package type.
+            assume_yes: Whether the removals are confirmed already, dnf doesn't ask again.
+
+        Returns:
+            Duplicates which remained after the clean.
+        """
+        pbar = tqdm(total=2)
+        pbar.set_description("Getting duplication packages on your system...")
+        plan = self._plan(pkg_type, auto_remove, policy)
+        plan.assume_yes = assume_yes
+        pbar.update(1)
+        for package in plan.skipped:
+            tqdm.write(
+                f"Skipping {package.name} {package.version} in {package.location}, "
+                "it is not known which package manager installed it",
             )
-            pkg_manager.remove_python_packages(dupes, auto_remove)
-            pbar.update(1)
+
+        pbar.set_description("Removing duplicates...")
+        self.removal_steps = execute_removal(plan, self._pkg_managers)
+        pbar.update(1)
+        # even a failed step may have removed some of its packages
+        removed_from = {step.pkg_type for step in self.removal_steps}
+        self._scan(
+            [
+                pkg_manager
+                for pkg_manager in self._pkg_managers
+                if pkg_manager.pkg_type in removed_from
+            ],
+        )
+        return self._duplicates()
@@ -0,0 +1,63 @@
+"""
+Detection of files owned by more than one installed package.
+
+Name based duplicates are just a hint, real breakage happens when e.g. pip overwrites
+files owned by rpm, or two installs put the same module to the same place.
+"""
+
+import os
+from collections.abc import Iterable, Iterator
+
+from pyclean.cleaner.package_managers.base import PackageInfo
+from pyclean.constants import PkgType
+
+
+def iter_absolute_files(package: PackageInfo) -> Iterator[str]:
+    """
+    Stream normalized absolute paths of the package files.
+
+    RECORD of pip packages has paths relative to the package location, rpm and pipx
+    file lists are absolute already.
+    """
+    for path in package.files:
+        if not os.path.isabs(path):
+            if package.location is None:
+                continue
+
+            path = os.path.join(package.location, path)
+
+        yield os.path.normpath(path)
+
+
+class FileOwnershipIndex:
+    """
+    Inverted index from absolute file path to packages which own it.
+    """
+
+    def __init__(self, packages: Iterable[PackageInfo] = ()) -> None:
+        self._owners: dict[str, list[PackageInfo]] = {}
+        for package in packages:
+            self.add(package)
+
+    def add(self, package: PackageInfo) -> None:
+        for path in iter_absolute_files(package):
+            owners = self._owners.setdefault(path, [])
+            # RECORD may list the same file twice
+            if not owners or owners[-1] is not package:
+                owners.append(package)
+
+    def owners(self, path: str) -> list[PackageInfo]:
+        return self._owners.get(os.path.normpath(path), [])
+
+    def conflicts(self) -> dict[str, list[PackageInfo]]:
+        """
+        Get files owned by more than one package.
+
+        Files shared only by rpm packages are left out, rpm checks conflicts of its own
+        packages itself and its packages commonly share directories.
+        """
+        return {
+            path: owners
+            for path, owners in self._owners.items()
+            if len(owners) > 1 and any(owner.pkg_type != PkgType.rpm for owner in owners)
+        }
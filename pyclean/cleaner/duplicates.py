@@ -0,0 +1,122 @@
+from collections.abc import Callable, Iterable, Iterator
+from typing import Optional
+
+from pyclean.cleaner.package_managers.base import PackageInfo
+from pyclean.constants import PkgType
+from pyclean.helpers import canonicalize_name
+
+PackageKey = tuple[Optional[PkgType], Optional[str], str]
+
+
+def package_key(package: PackageInfo) -> PackageKey:
+    """
+    Identity of an installed package, the same package can be listed only once per
+    package manager, location and version.
+    """
+    return package.pkg_type, package.location, package.version
+
+
+class DuplicateIndex:
+    """
+    Packages of all package managers grouped by PEP 503 normalized name.
+
+    The index is updated per package, so rescanning a package manager touches only groups
+    of packages which were added or removed since the last scan.
+    """
+
+    def __init__(self) -> None:
+        self._groups: dict[str, list[PackageInfo]] = {}
+
+    def add(self, package: PackageInfo) -> str:
+        """
+        Add package to its group.
+
+        Returns:
+            Normalized name of the group.
+        """
+        name = canonicalize_name(package.name)
+        self._groups.setdefault(name, []).append(package)
+        return name
+
+    def remove(self, package: PackageInfo) -> None:
+        name = canonicalize_name(package.name)
+        group = self._groups.get(name, [])
+        # identity, equal packages from other locations have to stay
+        group[:] = [grouped for grouped in group if grouped is not package]
+        if not group:
+            self._groups.pop(name, None)
+
+    def replace(self, old: Iterable[PackageInfo], new: Iterable[PackageInfo]) -> None:
+        """
+        Replace packages from the previous scan of a package manager with the current ones.
+        """
+        old_ids = {id(package): package for package in old}
+        new_ids = {id(package): package for package in new}
+        for package_id, package in old_ids.items():
+            if package_id not in new_ids:
+                self.remove(package)
+
+        for package_id, package in new_ids.items():
+            if package_id not in old_ids:
+                self.add(package)
+
+    def group(
+        self,
+        name: str,
+        sort_key: Callable[[PackageInfo], int],
+    ) -> Optional[list[PackageInfo]]:
+        """
+        Get the group of packages if it is a duplicate.
+
+        Args:
+            name: Normalized name of the group.
+            sort_key: Order of packages within the group, e.g. order of package managers.
+
+        Returns:
+            Unique packages of the group or None if the name is provided only once.
+        """
+        group = self._groups.get(name, [])
+        if len(group) < 2:
+            return None
+
+        # maybe installed same version via e.g. pip to user-space and system-wide, but
+        # then location should be different
+        unique: dict[PackageKey, PackageInfo] = {}
+        for package in sorted(group, key=sort_key):
+            unique.setdefault(package_key(package), package)
+
+        if len(unique) < 2:
+            return None
+
+        return list(unique.values())
+
+    def iter_duplicates(
+        self,
+        sort_key: Callable[[PackageInfo], int],
+    ) -> Iterator[tuple[str, list[PackageInfo]]]:
+        """
+        Stream groups of packages with the same name provided more than once.
+
+        Yields:
+            Normalized name of the group and its unique packages.
+        """
+        for name in self._groups:
+            group = self.group(name, sort_key)
+            if group is not None:
+                yield name, group
+
+    def duplicates(
+        self,
+        sort_key: Callable[[PackageInfo], int],
+    ) -> dict[str, list[PackageInfo]]:
+        """
+        Get groups of packages with the same name provided more than once.
+
+        Args:
+            sort_key: Order of packages within a group, e.g. order of package managers.
+
+        Returns:
+            Groups keyed by the name of their first package, so `python3-PyYAML` from rpm
+            and `pyyaml` from pip end up in the same group.
+        """
+        return {group[0].name: group for _, group in self.iter_duplicates(sort_key)}
@@ -0,0 +1,274 @@
+"""
+Impact of a removal plan computed ahead of time, without dnf or pip.
+
+dnf removes every package which requires a removed one, so the rpm removal set is
+the closure over reverse dependencies of all installed rpm packages, read by a single
+query. File requires are resolved by the file lists of the packages. Rich dependencies,
+e.g. `(a or b)`, are not resolved, packages which have them are reported as unknown
+whenever they may be affected. pip removes only what it is asked for, distributions
+requiring a removed one are left broken unless another package manager still provides it.
+"""
+
+from collections import deque
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+from pyclean.cleaner.package_managers.base import PackageInfo
+from pyclean.cleaner.package_managers.dist_info import DistInfo
+from pyclean.cleaner.package_managers.rpmdb import RpmHeader
+from pyclean.cleaner.shadowing import ImportAnalysis
+from pyclean.helpers import canonicalize_name
+
+# requires satisfied by rpm itself, no package provides them
+_RPMLIB_PREFIX = "rpmlib("
+# everything else starting with a slash is provided by the file of that path
+_FILE_PREFIX = "/"
+_RICH_PREFIX = "("
+
+
+@dataclass
+class RemovalImpact:
+    # rpm packages dnf removes along with the requested ones -> removed capabilities they need
+    rpm_dependents: dict[str, list[str]] = field(default_factory=dict)
+    # rpm packages required only by removed ones, dnf removes them with --auto-remove
+    # if they were installed as dependencies, which only dnf knows
+    rpm_unneeded: list[str] = field(default_factory=list)
+    # rpm packages whose requires can't be resolved without dnf -> the requires,
+    # dnf may remove them too
+    rpm_unknown: dict[str, list[str]] = field(default_factory=dict)
+    # pip distributions left with a missing requirement -> the missing requirements
+    pip_broken: dict[str, list[str]] = field(default_factory=dict)
+
+    @property
+    def complete(self) -> bool:
+        """
+        Whether everything dnf removes along is known.
+        """
+        return not self.rpm_unknown
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "rpm_dependents": self.rpm_dependents,
+            "rpm_unneeded": self.rpm_unneeded,
+            "rpm_unknown": self.rpm_unknown,
+            "pip_broken": self.pip_broken,
+        }
+
+
+@dataclass
+class DuplicateDetails:
+    """
+    What the user needs to know to choose which copy of a duplicate to remove.
+    """
+
+    name: str
+    packages: list[PackageInfo]
+    # which of the copies python imports, None if unknown
+    imports: Optional[ImportAnalysis] = None
+    # impact of removing each of the copies alone, in the same order, empty if unknown
+    impacts: list[RemovalImpact] = field(default_factory=list)
+    # the same with auto-remove, it adds packages nothing else requires anymore
+    auto_remove_impacts: list[RemovalImpact] = field(default_factory=list)
+    # rpm packages removed by earlier removals, the impacts are computed without them
+    removed_rpms_before: frozenset[str] = frozenset()
+
+    def impact(self, index: int, auto_remove: bool) -> Optional[RemovalImpact]:
+        """
+        Impact of removing the copy at the index, None if it is not known.
+        """
+        impacts = self.auto_remove_impacts if auto_remove else self.impacts
+        return impacts[index] if impacts else None
+
+
+def _rich_capabilities(require: str) -> Iterator[str]:
+    """
+    Split the rich dependency to its words, capabilities included, e.g. `python3dist(six)`
+    from `(python3dist(six) or tool >= 1.0)`.
+    """
+    for word in require.split():
+        word = word.lstrip(_RICH_PREFIX)
+        # parentheses of the expression, those of the capability are balanced
+        while word.endswith(")") and word.count(")") > word.count("("):
+            word = word[:-1]
+
+        yield word
+
+
+class RpmDependencyGraph:
+    """
+    Requires and provides of all installed rpm packages, indexed both ways.
+    """
+
+    def __init__(self, headers: Iterable[RpmHeader]) -> None:
+        headers = list(headers)
+        self.requires: dict[str, set[str]] = {}
+        # capability -> packages providing it, every package provides its own name
+        # and the files other packages require
+        self._providers: dict[str, set[str]] = {}
+        # capability -> packages requiring it
+        self._requirers: dict[str, set[str]] = {}
+        # rich dependency -> packages requiring it
+        self._rich_requirers: dict[str, set[str]] = {}
+        for header in headers:
+            for require in header.requires:
+                if require.startswith(_RPMLIB_PREFIX):
+                    continue
+
+                requirers = self._rich_requirers if require.startswith(_RICH_PREFIX) else None
+                if requirers is None:
+                    self.requires.setdefault(header.name, set()).add(require)
+                    requirers = self._requirers
+
+                requirers.setdefault(require, set()).add(header.name)
+
+            self.requires.setdefault(header.name, set())
+            for capability in [header.name, *header.provides]:
+                self._providers.setdefault(capability, set()).add(header.name)
+
+        # only the required files matter, there are way too many of the others
+        required_files = {
+            require for require in self._requirers if require.startswith(_FILE_PREFIX)
+        }
+        for header in headers:
+            for path in required_files.intersection(header.files):
+                self._providers.setdefault(path, set()).add(header.name)
+
+        self._provides: dict[str, set[str]] = {}
+        for capability, providers in self._providers.items():
+            for provider in providers:
+                self._provides.setdefault(provider, set()).add(capability)
+
+    def _lost(self, require: str, removed: set[str]) -> bool:
+        # requires nothing installed provides can't be lost by the removal
+        providers = self._providers.get(require, set())
+        return bool(providers) and providers <= removed
+
+    def removal_closure(
+        self,
+        packages: Iterable[str],
+        removed_before: Iterable[str] = (),
+    ) -> dict[str, list[str]]:
+        """
+        Packages dnf removes together with the given ones, because they require them.
+
+        Args:
+            packages: Names of the removed packages.
+            removed_before: Names of packages removed already, e.g. by queued removals.
+
+        Returns:
+            Removed dependent packages and the lost capabilities they require, those
+            removed before are left out.
+        """
+        queue = deque(package for package in packages if package in self.requires)
+        removed = {*removed_before, *queue}
+        result: dict[str, list[str]] = {}
+        while queue:
+            package = queue.popleft()
+            for capability in self._provides.get(package, ()):
+                for requirer in self._requirers.get(capability, ()):
+                    if requirer in removed or not self._lost(capability, removed):
+                        continue
+
+                    removed.add(requirer)
+                    queue.append(requirer)
+                    result[requirer] = sorted(
+                        require
+                        for require in self.requires[requirer]
+                        if self._lost(require, removed)
+                    )
+
+        return result
+
+    def unneeded(self, removed: set[str], removed_before: Iterable[str] = ()) -> list[str]:
+        """
+        Packages required by the removed ones which nothing else requires anymore.
+
+        Args:
+            removed: Names of the removed packages, the dependents included.
+            removed_before: Names of packages removed already, e.g. by queued removals.
+        """
+        candidates = deque(removed)
+        removed = {*removed_before, *removed}
+        result = []
+        while candidates:
+            package = candidates.popleft()
+            for require in self.requires.get(package, ()):
+                for provider in self._providers.get(require, ()):
+                    if provider in removed:
+                        continue
+
+                    requirers = {
+                        requirer
+                        for capability in self._provides[provider]
+                        for requirer in self._requirers.get(capability, ())
+                    }
+                    if requirers <= removed | {provider}:
+                        removed.add(provider)
+                        candidates.append(provider)
+                        result.append(provider)
+
+        return sorted(result)
+
+    def unresolved(
+        self,
+        removed: set[str],
+        auto_remove: bool,
+        removed_before: Iterable[str] = (),
+    ) -> dict[str, list[str]]:
+        """
+        Packages whose rich dependencies may be affected by the removal, only dnf can
+        tell whether it removes them.
+
+        Args:
+            removed: Names of all the removed packages, the dependents included.
+            auto_remove: Whether dnf removes also packages nothing requires anymore.
+            removed_before: Names of packages removed already, e.g. by queued removals.
+
+        Returns:
+            Affected packages and their rich dependencies.
+        """
+        before = set(removed_before)
+        removed = removed | before
+        result: dict[str, list[str]] = {}
+        for require, requirers in sorted(self._rich_requirers.items()):
+            affected = any(
+                self._providers.get(capability, set()) & removed
+                for capability in _rich_capabilities(require)
+            )
+            for requirer in requirers - before:
+                # what the removed packages require through it may become unneeded
+                if (requirer in removed and auto_remove) or (requirer not in removed and affected):
+                    result.setdefault(requirer, []).append(require)
+
+        return result
+
+
+def pip_broken_requirements(
+    dists: Iterable[DistInfo],
+    removed: set[str],
+    remaining: set[str],
+) -> dict[str, list[str]]:
+    """
+    Find distributions which would be left with a requirement nothing provides.
+
+    Args:
+        dists: Installed distributions, the removed ones included.
+        removed: Canonical names of the removed distributions.
+        remaining: Canonical names of python packages which stay installed, by any
+            package manager.
+
+    Returns:
+        Distribution name and its requirements which would be missing.
+    """
+    missing_names = removed - remaining
+    result = {}
+    for dist in dists:
+        if canonicalize_name(dist.name) in missing_names:
+            continue
+
+        missing = [name for name in dist.requires if canonicalize_name(name) in missing_names]
+        if missing:
+            result[dist.name] = missing
+
+    return result
@@ -0,0 +1,158 @@
+"""
+Discovery of python interpreters and virtual environments installed on the system.
+
+Every interpreter is asked for its site directories once, by a single subprocess, and all
+of them are asked in parallel.
+"""
+
+import glob
+import json
+import os
+import re
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from subprocess import PIPE, SubprocessError, run
+from typing import Optional
+
+from tqdm import tqdm
+
+DEFAULT_INTERPRETER_GLOBS = ("/usr/bin/python3*", "/usr/local/bin/python3*")
+# interpreters queried at once, the queries mostly wait for the interpreters to start
+MAX_QUERY_WORKERS = 16
+
+# python3 or python3.12, not python3-config nor python3.12-config
+_INTERPRETER_NAME = re.compile(r"^python3(\.\d+)?$")
+
+# everything pyclean needs to know about the interpreter, in one go
+_QUERY_SCRIPT = """
+import json, site, sys, sysconfig
+site_dirs = list(site.getsitepackages())
+if site.ENABLE_USER_SITE:
+    site_dirs.append(site.getusersitepackages())
+print(json.dumps({
+    "version": "%d.%d" % sys.version_info[:2],
+    "is_venv": sys.prefix != sys.base_prefix,
+    "site_dirs": site_dirs,
+    "user_site": site.getusersitepackages() if site.ENABLE_USER_SITE else None,
+    "purelib": sysconfig.get_path("purelib"),
+    "platlib": sysconfig.get_path("platlib"),
+}))
+"""
+
+
+@dataclass
+class Interpreter:
+    path: str
+    version: str
+    is_venv: bool = False
+    # site directories of the interpreter, user site is among them if enabled
+    site_dirs: list[str] = field(default_factory=list)
+    user_site: Optional[str] = None
+
+    def scanned_site_dirs(self, system_clean: bool) -> list[str]:
+        """
+        Site directories to look for packages in.
+
+        Args:
+            system_clean: Whether to include system-wide directories of system interpreters,
+                user site and directories of virtual environments are always included.
+        """
+        if system_clean or self.is_venv:
+            return self.site_dirs
+
+        return [self.user_site] if self.user_site else []
+
+
+def query_interpreter(path: str) -> Optional[Interpreter]:
+    """
+    Ask the interpreter for its site directories.
+
+    Returns:
+        The interpreter or None if it can't be run.
+    """
+    try:
+        stdout = run(
+            # -E so PYTHONPATH and friends of the user running pyclean don't leak in
+            [path, "-E", "-c", _QUERY_SCRIPT],
+            stdout=PIPE,
+            check=True,
+            text=True,
+            timeout=30,
+        ).stdout
+        info = json.loads(stdout)
+    except (OSError, SubprocessError, ValueError) as e:
+        tqdm.write(f"Error: can't query interpreter {path}: {e}")
+        return None
+
+    site_dirs = [*info["site_dirs"], info["purelib"], info["platlib"]]
+    return Interpreter(
+        path=path,
+        version=info["version"],
+        is_venv=info["is_venv"],
+        # the order matters, see PathPriority, so only duplicates are dropped
+        site_dirs=list(dict.fromkeys(os.path.normpath(site_dir) for site_dir in site_dirs)),
+        user_site=os.path.normpath(info["user_site"]) if info["user_site"] else None,
+    )
+
+
+@dataclass
+class InterpreterDiscovery:
+    interpreter_globs: tuple[str, ...] = DEFAULT_INTERPRETER_GLOBS
+    # directories containing virtual environments, e.g. ~/.virtualenvs
+    venv_roots: tuple[str, ...] = ()
+
+    def _candidates(self) -> Iterator[tuple[str, str]]:
+        """
+        Yields:
+            Path to the interpreter and a key which is the same for the same interpreter.
+        """
+        for pattern in self.interpreter_globs:
+            for path in sorted(glob.glob(pattern)):
+                if _INTERPRETER_NAME.match(os.path.basename(path)):
+                    yield path, os.path.realpath(path)
+
+        for venv_root in self.venv_roots:
+            for path in sorted(glob.glob(os.path.join(venv_root, "*", "bin", "python"))):
+                # venv interpreters are symlinks to the system one, they differ by prefix
+                yield path, os.path.normpath(path)
+
+    def discover(self) -> list[Interpreter]:
+        """
+        Find interpreters and ask all of them for their site directories in parallel.
+
+        Interpreters which are symlinks to each other, like python3 and python3.12, are
+        queried just once.
+        """
+        seen = set()
+        candidates = []
+        for path, key in self._candidates():
+            if key not in seen and os.access(path, os.X_OK):
+                seen.add(key)
+                candidates.append(path)
+
+        if not candidates:
+            return []
+
+        with ThreadPoolExecutor(max_workers=min(len(candidates), MAX_QUERY_WORKERS)) as executor:
+            interpreters = list(executor.map(query_interpreter, candidates))
+
+        return [interpreter for interpreter in interpreters if interpreter is not None]
+
+    def cache_key(self) -> str:
+        return ",".join([*self.interpreter_globs, *self.venv_roots])
+
+
+def site_dirs_by_interpreter(
+    interpreters: Iterable[Interpreter],
+    system_clean: bool,
+) -> dict[str, str]:
+    """
+    Map site directories to the interpreter which owns them, the first one wins.
+    """
+    result: dict[str, str] = {}
+    for interpreter in interpreters:
+        for site_dir in interpreter.scanned_site_dirs(system_clean):
+            result.setdefault(site_dir, interpreter.path)
+
+    return result
@@ -1,11 +1,14 @@
 from abc import ABC, abstractmethod
-from dataclasses import dataclass
-from typing import Optional
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass, field
+from subprocess import run
+from typing import Optional, Union
 
+from pyclean.cleaner.package_managers.file_list import FileDigest, FileList
 from pyclean.constants import PkgType
 
 
-@dataclass
+@dataclass(slots=True)
 class PackageInfo:
     name: str
     # some package managers like rpm may have python3- prefix for libraries
@@ -13,32 +16,180 @@ class PackageInfo:
     package_name: str
     version: str
     location: Optional[str]
-    files: list[str]
+    # plain list of paths is turned into FileList, see __post_init__
+    files: Union[FileList, list[str]]
     pkg_type: Optional[PkgType] = None
+    # path to the python interpreter the package is installed for, if known
+    interpreter: Optional[str] = None
+
+    def __post_init__(self) -> None:
+        if not isinstance(self.files, FileList):
+            self.files = FileList(self.files)
+
+
+@dataclass
+class ScanSnapshot:
+    """
+    State of packages of a package manager as seen by its last scan.
+    """
+
+    # package key (e.g. dist-info directory) -> stamp which changes whenever the package does
+    stamps: dict[str, str] = field(default_factory=dict)
+    # package key -> python packages derived from it, empty for non-python packages
+    packages: dict[str, list[PackageInfo]] = field(default_factory=dict)
+
+    @classmethod
+    def from_packages(cls, packages: list[PackageInfo]) -> "ScanSnapshot":
+        """
+        Snapshot without per package stamps, it can't be updated incrementally.
+        """
+        return cls(packages={"": packages})
+
+    def all_packages(self) -> list[PackageInfo]:
+        return [package for packages in self.packages.values() for package in packages]
 
 
 class PackageManager(ABC):
-    def __init__(self, system_clean: bool) -> None:
+    def __init__(self, system_clean: bool, root: str = "/") -> None:
         self.system_clean = system_clean
+        # root directory of the scanned system, anything else than / is scanned offline
+        self.root = root
         self.pkg_type: PkgType = None  # type: ignore
+        # the last scan, next scan reprocesses only packages which changed since then
+        self.snapshot: Optional[ScanSnapshot] = None
+
+    def _iter_update_snapshot(
+        self,
+        stamps: dict[str, str],
+        derive: Callable[[list[str]], Iterator[tuple[str, list[PackageInfo]]]],
+    ) -> Iterator[tuple[str, list[PackageInfo]]]:
+        """
+        Update snapshot to the current stamps, reusing packages which did not change.
+
+        Packages of unchanged keys are yielded right away, the rest as soon as they are
+        derived. The snapshot is replaced only once the iterator is exhausted.
+
+        Args:
+            stamps: Current stamps of all packages.
+            derive: Creates python packages for the given added or changed package keys.
+
+        Yields:
+            Package key and python packages derived from it.
+        """
+        previous = self.snapshot or ScanSnapshot()
+        changed = {key for key, stamp in stamps.items() if previous.stamps.get(key) != stamp}
+        for key in stamps:
+            if key not in changed:
+                yield key, previous.packages.get(key, [])
+
+        derived: dict[str, list[PackageInfo]] = {}
+        if changed:
+            for key, packages in derive([key for key in stamps if key in changed]):
+                derived[key] = packages
+                yield key, packages
+
+        # keep the order of stamps, so the snapshot doesn't depend on what has changed
+        snapshot_packages = {
+            key: derived.get(key, []) if key in changed else previous.packages.get(key, [])
+            for key in stamps
+        }
+        self.snapshot = ScanSnapshot(stamps=stamps, packages=snapshot_packages)
+
+    def packages_from_snapshot(self, snapshot: ScanSnapshot) -> list[PackageInfo]:
+        """
+        Get python packages as `get_python_packages` would return them for the snapshot.
+        """
+        return snapshot.all_packages()
+
+    def cache_key(self) -> str:
+        """
+        Identification of the package manager and its configuration for the scan cache.
+        """
+        return f"{self.pkg_type.value}-{self.system_clean}-{self.root}"
 
     @abstractmethod
+    def iter_python_packages(self) -> Iterator[PackageInfo]:
+        """
+        Stream installed Python packages on the system via specific package manager,
+        each package is yielded as soon as it is processed.
+        """
+        ...
+
     def get_python_packages(self) -> list[PackageInfo]:
         """
         Get all installed Python packages on the system via specific package manager.
         """
-        ...
+        return list(self.iter_python_packages())
 
     @abstractmethod
-    def remove_python_packages(self, packages: set[str], auto_remove: bool) -> None:
+    def removal_command(
+        self,
+        packages: list[str],
+        auto_remove: bool,
+        assume_yes: bool = False,
+    ) -> list[str]:
+        """
+        Command removing all the packages at once, in a single transaction if the package
+        manager has them.
+
+        Args:
+            packages: Package names to remove.
+            auto_remove: Whether to automatically remove dependencies of the packages.
+            assume_yes: Whether the user has seen and confirmed everything the removal
+                does already, so the package manager must not ask again.
+        """
+        ...
+
+    def removal_batches(self, packages: list[PackageInfo]) -> list[list[PackageInfo]]:
+        """
+        Split the packages to batches removed by a single command each, all of them
+        at once by default.
+        """
+        return [packages]
+
+    def batch_removal_command(
+        self,
+        packages: list[PackageInfo],
+        auto_remove: bool,
+        assume_yes: bool = False,
+    ) -> Optional[list[str]]:
+        """
+        Command removing the batch of packages, see `removal_batches`.
+
+        Returns:
+            The command or None if the packages are removed without any command.
+        """
+        return self.removal_command(
+            sorted({package.package_name for package in packages}),
+            auto_remove,
+            assume_yes,
+        )
+
+    def rollback_command(self, packages: list[PackageInfo]) -> Optional[list[str]]:
+        """
+        Command installing the removed packages back in the same versions, None if the
+        package manager can't do that.
+        """
+        return None
+
+    def remove_python_packages(
+        self,
+        packages: set[str],
+        auto_remove: bool,
+        assume_yes: bool = False,
+    ) -> None:
         """
         Remove Python packages from the system via specific package manager.
 
         Args:
             packages: Set of package names to remove.
             auto_remove: Whether to automatically remove dependencies of the packages.
+            assume_yes: Whether the package manager must not ask for confirmation.
+
+        Raises:
+            CalledProcessError: If the removal command fails.
         """
-        ...
+        run(self.removal_command(sorted(packages), auto_remove, assume_yes), check=True)
 
     @abstractmethod
     def exists(self) -> bool:
@@ -47,6 +198,47 @@ class PackageManager(ABC):
         """
         ...
 
+    def fingerprint(self) -> Optional[str]:
+        """
+        Cheap fingerprint of the installed packages state, which changes whenever result
+        of `get_python_packages` may change. None if the results can't be cached.
+        """
+        return None
+
+    def file_digests(self, package: PackageInfo) -> dict[str, FileDigest]:
+        """
+        Get digests the package manager recorded for files of the package.
+
+        Returns:
+            Digests keyed by normalized absolute path, empty if the package manager
+            does not record any.
+        """
+        _ = package
+        return {}
+
+    def invalidate(self) -> None:
+        """
+        Drop anything cached from the previous scan, so the next scan sees current state.
+        """
+        # nothing is cached by default
+        return
+
+    def remove_packages(
+        self,
+        packages: list[PackageInfo],
+        auto_remove: bool,
+        assume_yes: bool = False,
+    ) -> None:
+        """
+        Remove the packages, package managers which can tell apart packages of the same
+        name, e.g. in different locations, use more than the name.
+        """
+        self.remove_python_packages(
+            {package.package_name for package in packages},
+            auto_remove,
+            assume_yes,
+        )
+
     def remove_python_package(self, package: str, auto_remove: bool) -> None:
         """
         Remove single Python package from the system via specific package manager.
@@ -0,0 +1,185 @@
+"""
+Lightweight reader of installed python distributions (`*.dist-info` directories).
+
+It replaces `pkg_resources` which is slow to import and sees only `sys.path` of the running
+interpreter. Everything is read lazily, RECORD is parsed only when file list is requested.
+"""
+
+import csv
+import os
+import re
+from collections.abc import Iterable, Iterator
+from functools import cached_property
+from typing import Optional
+
+from pyclean.helpers import canonicalize_name
+
+DIST_INFO_SUFFIX = ".dist-info"
+
+# distribution name at the start of a requirement, see PEP 508
+_REQUIREMENT_NAME = re.compile(r"[A-Za-z0-9](?:[A-Za-z0-9._-]*[A-Za-z0-9])?")
+
+
+class DistInfo:
+    """
+    Single installed distribution represented by its `*.dist-info` directory.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    def __repr__(self) -> str:
+        return f"DistInfo({self.path!r})"
+
+    @property
+    def location(self) -> str:
+        """
+        Directory the distribution is installed to, e.g. site-packages.
+        """
+        return os.path.dirname(self.path)
+
+    def _metadata_file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def has_metadata(self, name: str) -> bool:
+        return os.path.isfile(self._metadata_file(name))
+
+    @cached_property
+    def _metadata(self) -> dict[str, str]:
+        result: dict[str, str] = {}
+        with open(self._metadata_file("METADATA"), encoding="utf-8") as metadata_file:
+            for line in metadata_file:
+                # headers end with the first empty line, the rest is long description
+                if not line.strip():
+                    break
+
+                key, sep, value = line.partition(":")
+                if sep and key in ("Name", "Version"):
+                    result.setdefault(key, value.strip())
+
+        return result
+
+    @cached_property
+    def requires(self) -> list[str]:
+        """
+        Names of distributions this one requires, requirements of extras are left out.
+
+        Environment markers are not evaluated, such requirements are treated as required.
+        """
+        result = []
+        with open(self._metadata_file("METADATA"), encoding="utf-8") as metadata_file:
+            for line in metadata_file:
+                if not line.strip():
+                    break
+
+                key, sep, value = line.partition(":")
+                if not sep or key != "Requires-Dist":
+                    continue
+
+                requirement, _, marker = value.partition(";")
+                match = _REQUIREMENT_NAME.match(requirement.strip())
+                if match is not None and "extra" not in marker:
+                    result.append(match.group(0))
+
+        return result
+
+    @property
+    def name(self) -> str:
+        return self._metadata["Name"]
+
+    @property
+    def version(self) -> str:
+        return self._metadata["Version"]
+
+    @cached_property
+    def installer(self) -> Optional[str]:
+        """
+        Tool which installed the distribution, None if it did not leave INSTALLER file.
+        """
+        try:
+            with open(self._metadata_file("INSTALLER"), encoding="utf-8") as installer_file:
+                return installer_file.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def iter_record_entries(self) -> Iterator[tuple[str, str, str]]:
+        """
+        Stream RECORD rows, path relative to the distribution location, hash in
+        the `algorithm=urlsafe_b64_digest` form and size. Hash and size may be empty.
+        """
+        with open(self._metadata_file("RECORD"), encoding="utf-8", newline="") as record_file:
+            for row in csv.reader(record_file):
+                if row:
+                    path, hash_, size = [*row, "", ""][:3]
+                    yield path, hash_, size
+
+    def iter_record(self) -> Iterator[str]:
+        """
+        Stream paths listed in RECORD, relative to the distribution location.
+        """
+        for path, _, _ in self.iter_record_entries():
+            yield path
+
+    @cached_property
+    def files(self) -> list[str]:
+        return list(self.iter_record())
+
+    def iter_absolute_record(self) -> Iterator[str]:
+        """
+        Stream absolute paths of files listed in RECORD.
+        """
+        location = self.location
+        for path in self.iter_record():
+            yield os.path.normpath(os.path.join(location, path))
+
+    @property
+    def directory_name(self) -> str:
+        """
+        Distribution name as encoded in the `{name}-{version}.dist-info` directory name.
+        """
+        return os.path.basename(self.path)[: -len(DIST_INFO_SUFFIX)].rpartition("-")[0]
+
+
+def scan_site_packages(paths: Iterable[str]) -> Iterator[DistInfo]:
+    """
+    Find all distributions installed in the given site-packages directories.
+
+    Args:
+        paths: Directories to scan, missing directories and duplicates are skipped.
+    """
+    seen = set()
+    for path in paths:
+        real_path = os.path.realpath(path)
+        if real_path in seen:
+            continue
+
+        seen.add(real_path)
+        try:
+            entries = os.scandir(path)
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+
+        with entries:
+            for entry in entries:
+                if entry.name.endswith(DIST_INFO_SUFFIX) and entry.is_dir():
+                    yield DistInfo(entry.path)
+
+
+def find_distribution(paths: Iterable[str], name: str) -> Optional[DistInfo]:
+    """
+    Find distribution with the given name, in any PEP 503 spelling, in the site-packages
+    directories.
+    """
+    canonical_name = canonicalize_name(name)
+    dists = list(scan_site_packages(paths))
+    for dist in dists:
+        if canonicalize_name(dist.directory_name) == canonical_name:
+            return dist
+
+    # directories created by old installers may not follow the naming spec, only then
+    # it is worth reading METADATA of every distribution
+    for dist in dists:
+        if canonicalize_name(dist.name) == canonical_name:
+            return dist
+
+    return None
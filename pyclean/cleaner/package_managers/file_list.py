@@ -0,0 +1,158 @@
+"""
+Compact file lists of packages.
+
+System scans hold file lists of thousands of packages at once, so paths are not stored
+as full strings. They are split to directory and basename like rpm does in its headers,
+both interned, so every directory and common basename like `__init__.py` is stored only
+once for all the packages. Files of pip distributions are not stored at all, they are
+read from RECORD only when someone asks for them.
+
+File digests are here too, so installed files can be checked against what their package
+manager installed.
+"""
+
+import base64
+import binascii
+import os
+import sys
+from array import array
+from collections.abc import Iterable, Iterator
+from typing import Any, NamedTuple, Optional, Union
+
+from pyclean.cleaner.package_managers.dist_info import DistInfo
+
+FileListJson = Union[list[str], dict[str, Any]]
+
+
+class FileDigest(NamedTuple):
+    # name of the hashlib algorithm
+    algorithm: str
+    hexdigest: str
+
+
+def record_digests(dist: DistInfo) -> dict[str, FileDigest]:
+    """
+    Get digests of distribution files from its RECORD, keyed by normalized absolute path.
+    """
+    result = {}
+    for path, hash_, _ in dist.iter_record_entries():
+        algorithm, _, digest = hash_.partition("=")
+        # RECORD itself and e.g. compiled bytecode are listed without hash
+        if not digest:
+            continue
+
+        try:
+            # urlsafe base64 without padding, see PEP 376
+            raw_digest = base64.urlsafe_b64decode(digest + "=" * (-len(digest) % 4))
+        except binascii.Error:
+            continue
+
+        absolute_path = os.path.normpath(os.path.join(dist.location, path))
+        result[absolute_path] = FileDigest(algorithm, raw_digest.hex())
+
+    return result
+
+
+class FileList:
+    """
+    Immutable sequence of file paths of a package.
+    """
+
+    __slots__ = ("_absolute", "_basenames", "_count", "_dir_indexes", "_dirs", "_record")
+
+    def __init__(self, paths: Iterable[str] = ()) -> None:
+        dir_table: dict[str, int] = {}
+        self._dir_indexes = array("I")
+        basenames = []
+        for path in paths:
+            directory, basename = _split(path)
+            dir_index = dir_table.setdefault(sys.intern(directory), len(dir_table))
+            self._dir_indexes.append(dir_index)
+            basenames.append(sys.intern(basename))
+
+        self._dirs = tuple(dir_table)
+        self._basenames = tuple(basenames)
+        # RECORD of the distribution the files are read from on demand
+        self._record: Optional[str] = None
+        self._absolute = False
+        self._count: Optional[int] = len(self._basenames)
+
+    @classmethod
+    def from_record(cls, dist_info_path: str, absolute: bool = False) -> "FileList":
+        """
+        File list of a distribution which is read from its RECORD only when needed.
+
+        Args:
+            dist_info_path: Path to the `*.dist-info` directory.
+            absolute: Whether to make paths absolute, RECORD has them relative
+                to the distribution location.
+        """
+        file_list = cls()
+        file_list._record = dist_info_path
+        file_list._absolute = absolute
+        file_list._count = None
+        return file_list
+
+    def _iter_record(self) -> Iterator[str]:
+        assert self._record is not None
+        dist = DistInfo(self._record)
+        # removed in the meantime
+        if not dist.has_metadata("RECORD"):
+            return
+
+        yield from dist.iter_absolute_record() if self._absolute else dist.iter_record()
+
+    def __iter__(self) -> Iterator[str]:
+        if self._record is not None:
+            yield from self._iter_record()
+            return
+
+        for dir_index, basename in zip(self._dir_indexes, self._basenames, strict=True):
+            yield self._dirs[dir_index] + basename
+
+    def __len__(self) -> int:
+        if self._count is None:
+            # only counted, the paths themselves are not kept
+            self._count = sum(1 for _ in self._iter_record())
+
+        return self._count
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, (FileList, list, tuple)):
+            return list(self) == list(other)
+
+        return NotImplemented
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        if self._record is not None:
+            return f"FileList.from_record({self._record!r}, absolute={self._absolute})"
+
+        return f"FileList({list(self)!r})"
+
+    def to_json(self) -> FileListJson:
+        """
+        Serialize the file list, lazy file lists stay lazy.
+        """
+        if self._record is not None:
+            return {"record": self._record, "absolute": self._absolute}
+
+        return list(self)
+
+    @classmethod
+    def from_json(cls, data: FileListJson) -> "FileList":
+        if isinstance(data, dict):
+            return cls.from_record(data["record"], absolute=data["absolute"])
+
+        return cls(data)
+
+
+def _split(path: str) -> tuple[str, str]:
+    # keep the trailing slash in the directory, so joining is a plain concatenation,
+    # both rpm and RECORD use forward slashes
+    separator = path.rfind("/") + 1
+    return path[:separator], path[separator:]
@@ -1,102 +1,354 @@
+import glob
 import os
 import site
+import sys
+import sysconfig
+from collections.abc import Iterable, Iterator
 from subprocess import PIPE, run
 from typing import Optional
 
-import pkg_resources
 from tqdm import tqdm
 
+from pyclean.cleaner.conflicts import FileOwnershipIndex
+from pyclean.cleaner.interpreters import InterpreterDiscovery, site_dirs_by_interpreter
 from pyclean.cleaner.package_managers.base import PackageInfo, PackageManager
+from pyclean.cleaner.package_managers.dist_info import (
+    DistInfo,
+    find_distribution,
+    scan_site_packages,
+)
+from pyclean.cleaner.package_managers.file_list import FileDigest, FileList, record_digests
+from pyclean.cleaner.package_managers.rpm import Rpm
+from pyclean.cleaner.uninstall import NativeUninstaller, ProtectedPath, TrashSession
 from pyclean.constants import PkgType
+from pyclean.helpers import root_path, stat_fingerprint
+
+# not a path, so it never clashes with dist-info keys
+_RPM_STAMP_KEY = "rpm"
+
+# site directories looked for in a root directory, its interpreters can't be asked
+_ROOT_SYSTEM_SITE_GLOBS = (
+    "usr/lib/python3*/site-packages",
+    "usr/lib64/python3*/site-packages",
+    "usr/local/lib/python3*/site-packages",
+    "usr/local/lib64/python3*/site-packages",
+)
+_ROOT_USER_SITE_GLOBS = (
+    "root/.local/lib/python3*/site-packages",
+    "home/*/.local/lib/python3*/site-packages",
+)
 
 
 class Pip(PackageManager):
-    def __init__(self, system_clean: bool) -> None:
-        super().__init__(system_clean)
+    def __init__(
+        self,
+        system_clean: bool,
+        extra_paths: Iterable[str] = (),
+        rpm: Optional[Rpm] = None,
+        discovery: Optional[InterpreterDiscovery] = None,
+        root: str = "/",
+        trash: Optional[TrashSession] = None,
+    ) -> None:
+        super().__init__(system_clean, root)
         self.pkg_type = PkgType.pip
+        self.extra_paths = list(extra_paths)
+        # rpm package manager, if present on the system, its index is shared with pip
+        self.rpm = rpm
+        # without discovery only the interpreter running pyclean is looked at
+        self.discovery = discovery
+        # distributions are uninstalled natively to this trash session instead of by pip
+        self.trash = trash
+        # site directory -> interpreter it belongs to, discovered once per scan
+        self._site_dirs: Optional[dict[str, Optional[str]]] = None
+
+    def _root_site_dirs(self) -> dict[str, Optional[str]]:
+        patterns = list(_ROOT_USER_SITE_GLOBS)
+        if self.system_clean:
+            patterns.extend(_ROOT_SYSTEM_SITE_GLOBS)
+
+        site_dirs: dict[str, Optional[str]] = {}
+        for pattern in patterns:
+            for path in sorted(glob.glob(os.path.join(self.root, pattern))):
+                # e.g. python3.12, the interpreter is told by the directory name
+                python = os.path.basename(os.path.dirname(path))
+                site_dirs[os.path.normpath(path)] = root_path(self.root, f"/usr/bin/{python}")
+
+        return site_dirs
+
+    def _discover_site_dirs(self) -> dict[str, Optional[str]]:
+        site_dirs: dict[str, Optional[str]]
+        if self.root != "/":
+            site_dirs = self._root_site_dirs()
+        elif self.discovery is not None:
+            interpreters = self.discovery.discover()
+            site_dirs = dict(
+                site_dirs_by_interpreter(interpreters, self.system_clean),
+            )
+        else:
+            paths = [site.USER_SITE]
+            if self.system_clean:
+                paths.extend(site.getsitepackages())
+                paths.extend([sysconfig.get_path("purelib"), sysconfig.get_path("platlib")])
+
+            # USER_SITE is None when user site-packages are disabled
+            site_dirs = dict.fromkeys(
+                (os.path.normpath(path) for path in paths if path),
+                sys.executable,
+            )
+
+        for path in self.extra_paths:
+            site_dirs.setdefault(os.path.normpath(path), None)
+
+        return site_dirs
+
+    def _site_packages(self) -> list[str]:
+        if self._site_dirs is None:
+            self._site_dirs = self._discover_site_dirs()
+
+        return list(self._site_dirs)
+
+    def _interpreter(self, dist: DistInfo) -> Optional[str]:
+        if self._site_dirs is None:
+            return None
+
+        return self._site_dirs.get(os.path.normpath(dist.location))
 
     # pip sometimes don't know what installer installed system package eventhough it knows about it
     # and lists it. On RPMs systems this could be local rpm installation or Copr...
-    @staticmethod
-    def _package_has_different_installer(name: str, version: str) -> bool:
-        if run(["rpm", "--version"], stdout=PIPE).returncode != 0:
+    def _package_has_different_installer(self, dist: DistInfo) -> bool:
+        if self.rpm is None:
             return False
 
-        process = run(
-            ["rpm", "-q", "--queryformat", r"%{VERSION}\n", name],
-            stdout=PIPE,
-            check=True,
-            text=True,
+        rpm_index = self.rpm.index()
+        if rpm_index.owner(dist.path) is not None:
+            return True
+
+        return rpm_index.version(dist.name) == dist.version
+
+    def _process_pip_package(self, dist: DistInfo) -> Optional[PackageInfo]:
+        installer = dist.installer
+        if installer != PkgType.pip and installer in PkgType.__members__:
+            return None
+
+        if installer is None and self._package_has_different_installer(dist):
+            return None
+
+        return PackageInfo(
+            name=dist.name,
+            package_name=dist.name,
+            version=dist.version,
+            location=dist.location,
+            # RECORD is read only when the files are needed
+            files=FileList.from_record(dist.path),
+            pkg_type=PkgType.pip if installer else None,
+            interpreter=self._interpreter(dist),
         )
 
-        if process.returncode != 0:
-            return False
+    def file_digests(self, package: PackageInfo) -> dict[str, FileDigest]:
+        if package.location is None:
+            return {}
 
-        return process.stdout.strip() == version
+        dist = find_distribution([package.location], package.name)
+        if dist is None or not dist.has_metadata("RECORD"):
+            return {}
 
-    def _process_pip_package(
-        self,
-        dist: pkg_resources.Distribution,
-    ) -> Optional[PackageInfo]:
-        if dist.egg_info is None or dist.location is None:
-            raise ValueError("egg_info or location does not exist.")
-
-        path = os.path.join(dist.location, dist.egg_info, "RECORD")
-        with open(path) as record_file:
-            package_files = [line.split(",")[0] for line in record_file]
-
-            installer = None
-            if dist.has_metadata("INSTALLER"):
-                with open(f"{dist.egg_info}/INSTALLER") as file:
-                    installer = file.read().strip()
-
-            if installer != PkgType.pip and installer in PkgType:
-                return None
-
-            if installer is None and self._package_has_different_installer(
-                dist.project_name,
-                dist.version,
-            ):
-                return None
-
-            return PackageInfo(
-                name=dist.project_name,
-                package_name=dist.project_name,
-                version=dist.version,
-                location=dist.location,
-                files=package_files,
-                pkg_type=PkgType.pip if installer else None,
-            )
+        return record_digests(dist)
 
-    def get_python_packages(self) -> list[PackageInfo]:
-        result = []
-        for dist in tqdm(pkg_resources.working_set, desc="Processing pip packages"):
-            tqdm.write(f"Processing pip package: {dist.project_name}")
+    def cache_key(self) -> str:
+        key = f"{super().cache_key()}-{','.join(self.extra_paths)}"
+        if self.discovery is not None:
+            key += f"-{self.discovery.cache_key()}"
 
-            if not self.system_clean and dist.location != site.USER_SITE:
-                continue
+        return key
+
+    def invalidate(self) -> None:
+        # interpreters and venvs may come and go between scans
+        self._site_dirs = None
+
+    def fingerprint(self) -> Optional[str]:
+        # installing or removing a distribution changes mtime of its site-packages
+        fingerprint = stat_fingerprint(self._site_packages())
+        if self.rpm is None:
+            return fingerprint
 
-            if not dist.has_metadata("RECORD"):
+        # results depend on rpm too, see _package_has_different_installer
+        rpm_fingerprint = self.rpm.fingerprint()
+        if rpm_fingerprint is None:
+            return None
+
+        return f"{fingerprint}\n{rpm_fingerprint}"
+
+    def _derive_packages(
+        self,
+        dists: dict[str, DistInfo],
+        keys: list[str],
+    ) -> Iterator[tuple[str, list[PackageInfo]]]:
+        for key in tqdm(keys, desc="Processing pip packages"):
+            dist = dists.get(key)
+            if dist is None or not dist.has_metadata("RECORD"):
+                yield key, []
                 continue
 
+            tqdm.write(f"Processing pip package: {dist.name}")
             package = self._process_pip_package(dist)
-            if package:
-                result.append(package)
+            yield key, [package] if package else []
 
-        return result
+    def iter_distributions(self) -> Iterator[DistInfo]:
+        """
+        Stream all distributions in the scanned site directories, whoever installed them.
+        """
+        yield from scan_site_packages(self._site_packages())
 
-    def remove_python_packages(self, packages: set[str], auto_remove: bool) -> None:
-        for package in tqdm(packages, desc="Removing pip packages"):
-            tqdm.write(f"Removing pip package: {package}")
-            cmd = ["pip", "uninstall"]
-            if self.system_clean and os.geteuid() != 0:
-                raise PermissionError(
-                    "You need to be root to remove system packages system-wide.",
-                )
+    def iter_python_packages(self) -> Iterator[PackageInfo]:
+        dists = {dist.path: dist for dist in scan_site_packages(self._site_packages())}
+        # pip writes all the metadata files on install, so dist-info mtime changes
+        stamps = {path: str(os.stat(path).st_mtime_ns) for path in dists}
+        if self.rpm is not None:
+            # packages without INSTALLER are checked against rpm, so all of them have to
+            # be reprocessed when rpm changes or when we can't tell whether it did
+            rpm_stamp = self.rpm.fingerprint()
+            previous = self.snapshot.stamps.get(_RPM_STAMP_KEY) if self.snapshot else None
+            if rpm_stamp is None or rpm_stamp != previous:
+                self.snapshot = None
 
-            run([*cmd, package], check=True)
+            stamps[_RPM_STAMP_KEY] = rpm_stamp or ""
+
+        for _, packages in self._iter_update_snapshot(
+            stamps,
+            lambda keys: self._derive_packages(dists, keys),
+        ):
+            yield from packages
+
+    @staticmethod
+    def _pip_command(interpreter: Optional[str], *args: str) -> list[str]:
+        # pip of the interpreter the packages are installed for, the first pip on PATH
+        # may see another copy of the same name or none at all
+        return [interpreter or sys.executable, "-m", "pip", *args]
+
+    def removal_command(
+        self,
+        packages: list[str],
+        auto_remove: bool,
+        assume_yes: bool = False,
+    ) -> list[str]:
+        _ = auto_remove, assume_yes
+        # one interpreter start for all the packages, pyclean asks for confirmation itself
+        return self._pip_command(None, "uninstall", "--yes", *packages)
+
+    def removal_batches(self, packages: list[PackageInfo]) -> list[list[PackageInfo]]:
+        by_interpreter: dict[Optional[str], list[PackageInfo]] = {}
+        for package in packages:
+            by_interpreter.setdefault(package.interpreter, []).append(package)
+
+        return list(by_interpreter.values())
+
+    def batch_removal_command(
+        self,
+        packages: list[PackageInfo],
+        auto_remove: bool,
+        assume_yes: bool = False,
+    ) -> Optional[list[str]]:
+        _ = auto_remove, assume_yes
+        if self.trash is not None:
+            return None
+
+        names = sorted({package.package_name for package in packages})
+        return self._pip_command(packages[0].interpreter, "uninstall", "--yes", *names)
+
+    def rollback_command(self, packages: list[PackageInfo]) -> Optional[list[str]]:
+        if self.trash is not None:
+            return ["pyclean", "undo", self.trash.session_id]
+
+        return self._pip_command(
+            packages[0].interpreter,
+            "install",
+            *(f"{pkg.package_name}=={pkg.version}" for pkg in packages),
+        )
+
+    def _check_permissions(self) -> None:
+        if self.system_clean and os.geteuid() != 0:
+            raise PermissionError(
+                "You need to be root to remove system packages system-wide.",
+            )
+
+    def remove_python_packages(
+        self,
+        packages: set[str],
+        auto_remove: bool,
+        assume_yes: bool = False,
+    ) -> None:
+        self._check_permissions()
+        tqdm.write(f"Removing pip packages: {', '.join(sorted(packages))}")
+        super().remove_python_packages(packages, auto_remove, assume_yes)
+
+    def _owned_by_rpm(self) -> ProtectedPath:
+        if self.rpm is None:
+            return lambda _: False
+
+        # any file of any rpm package, e.g. scripts in /usr/bin or shared data directories
+        index = FileOwnershipIndex(self.rpm.iter_all_packages())
+        return lambda path: bool(index.owners(path))
+
+    def remove_packages(
+        self,
+        packages: list[PackageInfo],
+        auto_remove: bool,
+        assume_yes: bool = False,
+    ) -> None:
+        if self.trash is None:
+            self._check_permissions()
+            for batch in self.removal_batches(packages):
+                command = self.batch_removal_command(batch, auto_remove, assume_yes)
+                assert command is not None
+                tqdm.write(f"Removing pip packages: {' '.join(command)}")
+                run(command, check=True)
+
+            self._check_removed(packages)
+            return
+
+        self._check_permissions()
+        uninstaller = NativeUninstaller(self.trash, is_protected=self._owned_by_rpm())
+        errors = []
+        # the exact distribution, not just any of the same name
+        for package in tqdm(packages, desc="Uninstalling pip packages"):
+            dist = None
+            if package.location is not None:
+                dist = find_distribution([package.location], package.name)
+
+            if dist is None:
+                errors.append(f"{package.name} not found in {package.location}")
+                continue
+
+            tqdm.write(f"Uninstalling pip package: {dist.name} from {dist.location}")
+            try:
+                uninstaller.uninstall(dist)
+            except OSError as e:
+                errors.append(str(e))
+
+        if errors:
+            raise RuntimeError("; ".join(errors))
+
+    @staticmethod
+    def _check_removed(packages: list[PackageInfo]) -> None:
+        """
+        Raises:
+            RuntimeError: If some of the packages are still installed, pip exits with 0
+                even if it removes nothing.
+        """
+        left = [
+            f"{package.name} in {package.location}"
+            for package in packages
+            if package.location is not None
+            and find_distribution([package.location], package.name) is not None
+        ]
+        if left:
+            raise RuntimeError(f"pip didn't remove {', '.join(left)}")
 
     def exists(self) -> bool:
+        if self.root != "/":
+            # pip of this machine is not needed to read what is installed in the root
+            return bool(self._root_site_dirs())
+
         possible_bins = ["pip", "pip3"]
         for binary in possible_bins:
             if run(["which", binary], stdout=PIPE).returncode == 0:
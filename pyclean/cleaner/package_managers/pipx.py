@@ -1,4 +1,8 @@
+import glob
 import json
+import os
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from subprocess import PIPE, run
 from typing import Optional
@@ -6,88 +10,211 @@ from typing import Optional
 from tqdm import tqdm
 
 from pyclean.cleaner.package_managers.base import PackageInfo, PackageManager
+from pyclean.cleaner.package_managers.dist_info import DistInfo, find_distribution
+from pyclean.cleaner.package_managers.file_list import FileDigest, FileList, record_digests
 from pyclean.constants import PkgType
+from pyclean.helpers import root_path, stat_fingerprint
+
+PIPX_METADATA_FILE = "pipx_metadata.json"
+# versions of pipx_metadata.json layout this module understands
+KNOWN_PIPX_METADATA_VERSIONS = {"0.1", "0.2", "0.3", "0.4", "0.5"}
+# pipx homes looked for in a root directory, current and legacy user ones and the global one
+_ROOT_PIPX_HOME_GLOBS = (
+    "root/.local/share/pipx",
+    "root/.local/pipx",
+    "home/*/.local/share/pipx",
+    "home/*/.local/pipx",
+    "opt/pipx",
+)
 
 
 class Pipx(PackageManager):
-    def __init__(self, system_clean: bool) -> None:
-        super().__init__(system_clean)
+    def __init__(self, system_clean: bool, root: str = "/") -> None:
+        super().__init__(system_clean, root)
         self.pkg_type = PkgType.pipx
 
     def _pipx_location(self, pkg: dict) -> Optional[Path]:
         # just best effort, it may not work for all cases
         try:
-            return Path(pkg["app_paths"][0]["__Path__"]).parent.parent
+            app_path = pkg["app_paths"][0]["__Path__"]
+            return Path(root_path(self.root, app_path)).parent.parent
         except (IndexError, KeyError) as e:
             print(f"Error: {e}")
             return None
 
-    def _pipx_files(self, metadata: dict, pkg_name: str, location: Path) -> list[str]:
-        # this is just best effort, it may not work for all cases
+    @staticmethod
+    def _pipx_dist(pkg_name: str, location: Path) -> Optional[DistInfo]:
+        site_packages = [str(path) for path in location.glob("lib/python*/site-packages")]
+        dist = find_distribution(site_packages, pkg_name)
+        if dist is None or not dist.has_metadata("RECORD"):
+            tqdm.write(f"Error: can't find RECORD of {pkg_name} in {location}")
+            return None
+
+        return dist
+
+    def _pipx_files(self, pkg_name: str, location: Path) -> FileList:
+        # files are taken from RECORD of the main package, so they are exact
+        dist = self._pipx_dist(pkg_name, location)
+        if dist is None:
+            return FileList()
+
+        return FileList.from_record(dist.path, absolute=True)
+
+    def file_digests(self, package: PackageInfo) -> dict[str, FileDigest]:
+        if package.location is None:
+            return {}
+
+        dist = self._pipx_dist(package.name, Path(package.location))
+        return record_digests(dist) if dist is not None else {}
+
+    @staticmethod
+    def _pipx_home() -> Path:
+        if "PIPX_HOME" in os.environ:
+            return Path(os.environ["PIPX_HOME"])
+
+        # pipx < 1.3 default, newer pipx still uses it when it exists
+        legacy_home = Path.home() / ".local" / "pipx"
+        if legacy_home.is_dir():
+            return legacy_home
+
+        data_home = os.environ.get("XDG_DATA_HOME") or Path.home() / ".local" / "share"
+        return Path(data_home) / "pipx"
+
+    @staticmethod
+    def _read_metadata(path: Path) -> Optional[dict]:
         try:
-            lib = location / "lib"
-            python_lib_name = Path(metadata["source_interpreter"]["__Path__"]).name
-            guessed_lib_path = lib / python_lib_name
-            if guessed_lib_path.exists():
-                return [
-                    str(path)
-                    for path in (guessed_lib_path / "site-packages" / pkg_name).rglob(
-                        "*.py",
-                    )
-                ]
-
-            for dir_name in lib.iterdir():
-                if dir_name.is_dir() and dir_name.name.startswith("python"):
-                    return [
-                        str(path)
-                        for path in (dir_name / "site-packages" / pkg_name).rglob(
-                            "*.py",
-                        )
-                    ]
-
-            return []
-        except (IndexError, KeyError) as e:
-            print(f"Error: {e}")
-            return []
+            with open(path) as metadata_file:
+                return json.load(metadata_file)
+        except (OSError, json.JSONDecodeError) as e:
+            tqdm.write(f"Error: can't read {path}: {e}")
+            return None
+
+    def _pipx_homes(self) -> list[Path]:
+        if self.root == "/":
+            return [self._pipx_home()]
+
+        return [
+            Path(path)
+            for pattern in _ROOT_PIPX_HOME_GLOBS
+            for path in sorted(glob.glob(os.path.join(self.root, pattern)))
+        ]
+
+    def _metadata_paths(self) -> list[Path]:
+        return [
+            path
+            for home in self._pipx_homes()
+            for path in sorted((home / "venvs").glob(f"*/{PIPX_METADATA_FILE}"))
+        ]
+
+    def _venvs_from_metadata(self, metadata_paths: list[Path]) -> Optional[dict[str, dict]]:
+        """
+        Read metadata of pipx venvs directly from their pipx_metadata.json files.
 
-    def get_python_packages(self) -> list[PackageInfo]:
-        result = []
+        Returns:
+            The same structure as `venvs` in `pipx list --json` output, keyed by the venv
+            directory, or None if some metadata file has format this module does not know.
+        """
+        with ThreadPoolExecutor() as executor:
+            all_metadata = list(executor.map(self._read_metadata, metadata_paths))
+
+        result = {}
+        for path, metadata in zip(metadata_paths, all_metadata, strict=True):
+            if metadata is None:
+                continue
+
+            if metadata.get("pipx_metadata_version") not in KNOWN_PIPX_METADATA_VERSIONS:
+                return None
+
+            result[str(path.parent)] = {"metadata": metadata}
+
+        return result
+
+    @staticmethod
+    def _venvs_from_cli() -> dict[str, dict]:
         process_stdout = run(
             ["pipx", "list", "--json"],
             stdout=PIPE,
             check=True,
             text=True,
         ).stdout.strip()
-        pipx_list_json = json.loads(process_stdout)
-        venvs = pipx_list_json["venvs"]
-        for _, pkg in tqdm(venvs.items(), desc="Processing pipx packages"):
-            metadata = pkg["metadata"]
-            pkg = metadata["main_package"]
-            pkg_name = pkg["package"]
-
-            tqdm.write(f"Processing pipx package: {pkg_name}")
-
-            location = self._pipx_location(pkg)
-            files = []
-            if location is not None:
-                files = self._pipx_files(metadata, pkg_name, location)
-
-            result.append(
-                PackageInfo(
-                    name=pkg_name,
-                    package_name=pkg_name,
-                    version=pkg["package_version"],
-                    location=str(location),
-                    files=files,
-                    pkg_type=PkgType.pipx,
-                ),
-            )
+        return json.loads(process_stdout)["venvs"]
 
-        return result
+    def fingerprint(self) -> Optional[str]:
+        venvs = [home / "venvs" for home in self._pipx_homes()]
+        return stat_fingerprint([*venvs, *self._metadata_paths()])
+
+    def _process_pipx_package(self, venv: dict) -> PackageInfo:
+        metadata = venv["metadata"]
+        pkg = metadata["main_package"]
+        pkg_name = pkg["package"]
+
+        tqdm.write(f"Processing pipx package: {pkg_name}")
 
-    def remove_python_packages(self, packages: set[str], auto_remove: bool) -> None:
-        _ = auto_remove
-        run(["pipx", "uninstall", *packages])
+        location = self._pipx_location(pkg)
+        files = FileList()
+        if location is not None:
+            files = self._pipx_files(pkg_name, location)
+
+        return PackageInfo(
+            name=pkg_name,
+            package_name=pkg_name,
+            version=pkg["package_version"],
+            location=str(location),
+            files=files,
+            pkg_type=PkgType.pipx,
+            # every pipx package has a venv of its own
+            interpreter=str(location / "bin" / "python") if location is not None else None,
+        )
+
+    def _derive_packages(
+        self,
+        venvs: dict[str, dict],
+        keys: list[str],
+    ) -> Iterator[tuple[str, list[PackageInfo]]]:
+        for key in tqdm(keys, desc="Processing pipx packages"):
+            yield key, [self._process_pipx_package(venvs[key])] if key in venvs else []
+
+    def iter_python_packages(self) -> Iterator[PackageInfo]:
+        # only venvs whose metadata changed since the last scan are read again
+        stamps = {str(path.parent): stat_fingerprint([path]) for path in self._metadata_paths()}
+        previous = self.snapshot.stamps if self.snapshot else {}
+        changed = [key for key, stamp in stamps.items() if previous.get(key) != stamp]
+        # read all the changed metadata before anything is yielded, so the fallback
+        # never yields the same package twice
+        venvs = self._venvs_from_metadata([Path(key) / PIPX_METADATA_FILE for key in changed])
+        if venvs is not None:
+            for _, packages in self._iter_update_snapshot(
+                stamps,
+                lambda keys: self._derive_packages(venvs, keys),
+            ):
+                yield from packages
+
+            return
+
+        self.snapshot = None
+        if self.root != "/":
+            # pipx of this machine knows nothing about the root
+            raise RuntimeError(f"Unknown pipx metadata format in {self.root}")
+
+        tqdm.write("Unknown pipx metadata format, falling back to pipx list")
+        for venv in tqdm(self._venvs_from_cli().values(), desc="Processing pipx packages"):
+            yield self._process_pipx_package(venv)
+
+    def removal_command(
+        self,
+        packages: list[str],
+        auto_remove: bool,
+        assume_yes: bool = False,
+    ) -> list[str]:
+        # pipx doesn't ask
+        _ = auto_remove, assume_yes
+        return ["pipx", "uninstall", *packages]
+
+    def rollback_command(self, packages: list[PackageInfo]) -> Optional[list[str]]:
+        return ["pipx", "install", *(f"{pkg.package_name}=={pkg.version}" for pkg in packages)]
 
     def exists(self) -> bool:
+        if self.root != "/":
+            return bool(self._pipx_homes())
+
         return run(["which", "pipx"], stdout=PIPE).returncode == 0
@@ -1,63 +1,264 @@
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from subprocess import PIPE, run
+import os
+import re
+from collections.abc import Iterable, Iterator
+from subprocess import PIPE, Popen, run
+from threading import Lock
 from typing import Optional
 
 from tqdm import tqdm
 
-from pyclean.cleaner.package_managers.base import PackageInfo, PackageManager
-from pyclean.constants import PkgType
+from pyclean.cleaner.package_managers.base import PackageInfo, PackageManager, ScanSnapshot
+from pyclean.cleaner.package_managers.dist_info import DIST_INFO_SUFFIX
+from pyclean.cleaner.package_managers.file_list import FileDigest, FileList
+from pyclean.cleaner.package_managers.rpmdb import (
+    RPM_DIGEST_ALGORITHMS,
+    RPMDB_PATHS,
+    RpmHeader,
+    find_rpmdb,
+    iter_rpmdb_headers,
+)
+from pyclean.constants import PkgType, RpmBackend
+from pyclean.helpers import canonicalize_name, root_path, stat_fingerprint
+
+# every line of the bulk query output starts with a marker telling what the line carries,
+# array tags are expanded one value per line so the stream can be parsed line by line
+_PKG_MARKER = "@@PKG"
+_REQUIRE_MARKER = "@@REQ"
+_PROVIDE_MARKER = "@@PRV"
+_FILE_MARKER = "@@FILE"
+_DIGEST_ALGORITHM_MARKER = "@@ALGO"
+# file digest followed by the file name, digest is empty for anything but regular files
+_DIGEST_MARKER = "@@DIG"
+
+# name, version, key and stamp, see RpmHeader
+_STAMP_QUERY_FORMAT = (
+    rf"{_PKG_MARKER} %{{NAME}} %{{VERSION}} %{{NAME}}-%{{VERSION}}-%{{RELEASE}}.%{{ARCH}} "
+    r"%{INSTALLTIME}:%{SHA1HEADER}\n"
+)
+_METADATA_QUERY_FORMAT = (
+    rf"{_STAMP_QUERY_FORMAT}"
+    rf"[{_REQUIRE_MARKER} %{{REQUIRENAME}}\n]"
+    rf"[{_PROVIDE_MARKER} %{{PROVIDENAME}}\n]"
+)
+_FILES_QUERY_FORMAT = rf"{_STAMP_QUERY_FORMAT}[{_FILE_MARKER} %{{FILENAMES}}\n]"
+# files are needed to resolve file requires, e.g. /usr/bin/python3
+_DEPENDENCIES_QUERY_FORMAT = rf"{_METADATA_QUERY_FORMAT}[{_FILE_MARKER} %{{FILENAMES}}\n]"
+_DIGESTS_QUERY_FORMAT = (
+    rf"{_STAMP_QUERY_FORMAT}"
+    rf"{_DIGEST_ALGORITHM_MARKER} %{{FILEDIGESTALGO}}\n"
+    rf"[{_DIGEST_MARKER} %{{FILEDIGESTS}} %{{FILENAMES}}\n]"
+)
+
+# rpm prints this for tags which are missing in the header
+_RPM_NONE = "(none)"
+
+# how many package names to pass to a single rpm -q call, to stay far from ARG_MAX
+_QUERY_BATCH = 1000
+
+# python3dist(requests) or python3.12dist(requests), extras metapackages are skipped
+_PYTHON_DIST_PROVIDE = re.compile(r"^python3(?:\.\d+)?dist\((?P<name>[^()\[\]]+)\)$")
+
+
+def parse_rpm_query(lines: Iterable[str]) -> Iterator[RpmHeader]:
+    """
+    Parse output of the bulk rpm query incrementally.
+
+    Args:
+        lines: Lines of `rpm --queryformat` output produced with one of the query formats
+            in this module.
+
+    Yields:
+        Header of each package as soon as all of its lines were read.
+    """
+    header: Optional[RpmHeader] = None
+    for raw_line in lines:
+        line = raw_line.rstrip("\n")
+        marker, _, value = line.partition(" ")
+        if marker == _PKG_MARKER:
+            if header is not None:
+                yield header
+
+            name, version, key, stamp = value.split()
+            header = RpmHeader(name=name, version=version, key=key, stamp=stamp)
+        elif header is None or value == _RPM_NONE:
+            continue
+        elif marker == _REQUIRE_MARKER:
+            header.requires.append(value)
+        elif marker == _PROVIDE_MARKER:
+            header.provides.append(value)
+        elif marker == _FILE_MARKER:
+            header.files.append(value)
+        elif marker == _DIGEST_ALGORITHM_MARKER:
+            header.digest_algorithm = int(value)
+        elif marker == _DIGEST_MARKER:
+            digest, _, path = value.partition(" ")
+            if path != _RPM_NONE:
+                header.files.append(path)
+                header.digests.append(digest)
+
+    if header is not None:
+        yield header
+
+
+class PythonDistIndex:
+    """
+    Index of `python3dist()` provides of installed rpm packages.
+
+    It answers whether an rpm package is a python distribution and what is its name
+    on PyPI without looking at the package files.
+    """
+
+    def __init__(self, headers: Iterable[RpmHeader] = ()) -> None:
+        self._dist_by_package: dict[str, str] = {}
+        for header in headers:
+            self.add(header)
+
+    def add(self, header: RpmHeader) -> None:
+        for provide in header.provides:
+            match = _PYTHON_DIST_PROVIDE.match(provide)
+            if match:
+                self._dist_by_package.setdefault(header.name, match.group("name"))
+                return
+
+    def __contains__(self, package: str) -> bool:
+        return package in self._dist_by_package
+
+    def dist_name(self, package: str) -> Optional[str]:
+        """
+        Get PyPI name of the rpm package or None if it does not provide python3dist().
+        """
+        return self._dist_by_package.get(package)
+
+
+class RpmIndex:
+    """
+    Snapshot of installed rpm packages built once per scan and shared with other package
+    managers, so their questions about rpm are dictionary lookups instead of rpm calls.
+    """
+
+    def __init__(self, headers: list[RpmHeader], python_packages: list[PackageInfo]) -> None:
+        # stamps of all installed packages, without requires, provides and files
+        self.headers = headers
+        self.python_packages = python_packages
+
+        self._versions: dict[str, str] = {}
+        for header in headers:
+            self._versions.setdefault(header.name, header.version)
+
+        for package in python_packages:
+            self._versions.setdefault(canonicalize_name(package.name), package.version)
+
+        # only distribution metadata directories are ever looked up, see Pip
+        self._owners = {
+            path: package.package_name
+            for package in python_packages
+            for path in map(os.path.normpath, package.files)
+            if path.endswith(DIST_INFO_SUFFIX)
+        }
+
+    def version(self, name: str) -> Optional[str]:
+        """
+        Get version of installed rpm package by its rpm name or by its python package name.
+        """
+        return self._versions.get(name) or self._versions.get(canonicalize_name(name))
+
+    def owner(self, path: str) -> Optional[str]:
+        """
+        Get name of the python rpm package which owns the `*.dist-info` directory.
+        """
+        return self._owners.get(os.path.normpath(path))
 
 
 class Rpm(PackageManager):
-    def __init__(self, system_clean: bool) -> None:
-        super().__init__(system_clean)
+    def __init__(
+        self,
+        system_clean: bool,
+        backend: RpmBackend = RpmBackend.cli,
+        root: str = "/",
+    ) -> None:
+        super().__init__(system_clean, root)
         self.pkg_type = PkgType.rpm
+        self.backend = backend
+        self._index: Optional[RpmIndex] = None
+        self._index_lock = Lock()
 
-    @staticmethod
-    def _get_rpm_package_files(name: str) -> list[str]:
-        files_process = run(["rpm", "-ql", name], stdout=PIPE, check=True, text=True)
-        return files_process.stdout.strip().split("\n")
-
-    @classmethod
-    def _check_python_package_and_get_files(cls, name: str) -> Optional[list[str]]:
-        if name.startswith(("python-", "python3-")):
-            return cls._get_rpm_package_files(name)
-
-        requires = (
-            run(
-                ["rpm", "-qR", name],
-                stdout=PIPE,
-                check=True,
-                text=True,
+    def _run_query(self, args: list[str], query_format: str) -> Iterator[RpmHeader]:
+        with Popen(
+            ["rpm", "--root", self.root, "--queryformat", query_format, *args],
+            stdout=PIPE,
+            text=True,
+        ) as process:
+            assert process.stdout is not None
+            yield from parse_rpm_query(process.stdout)
+
+        if process.returncode != 0:
+            raise RuntimeError(f"rpm query failed with exit code {process.returncode}")
+
+    def _query(self, query_format: str, names: Optional[list[str]] = None) -> Iterator[RpmHeader]:
+        # single rpm process for all packages instead of rpm -qR and rpm -ql per package
+        if names is None:
+            yield from self._run_query(["-qa"], query_format)
+            return
+
+        for i in range(0, len(names), _QUERY_BATCH):
+            yield from self._run_query(["-q", *names[i : i + _QUERY_BATCH]], query_format)
+
+    def _iter_rpm_stamps(self) -> Iterator[RpmHeader]:
+        """
+        Get name, version, key and stamp of all installed packages.
+        """
+        if self.backend == RpmBackend.sqlite:
+            yield from iter_rpmdb_headers(self.root, with_metadata=False, with_files=False)
+            return
+
+        yield from self._query(_STAMP_QUERY_FORMAT)
+
+    def _iter_headers(self, headers: list[RpmHeader], with_files: bool) -> Iterator[RpmHeader]:
+        """
+        Stream requires and provides, or file lists, of the given packages.
+        """
+        keys = {header.key for header in headers}
+        if self.backend == RpmBackend.sqlite:
+            yield from iter_rpmdb_headers(
+                self.root,
+                with_metadata=not with_files,
+                with_files=with_files,
+                keys=keys,
             )
-            .stdout.strip()
-            .split("\n")
-        )
-        for req in requires:
-            # looking for python binary as dependency
-            if req.endswith(("python", "python3")):
-                return cls._get_rpm_package_files(name)
+            return
 
-        files = cls._get_rpm_package_files(name)
-        for file in files:
-            if not file.endswith((".py", ".pyc", ".pyo")):
-                return None
+        query_format = _FILES_QUERY_FORMAT if with_files else _METADATA_QUERY_FORMAT
+        names = sorted({header.name for header in headers})
+        # querying everything at once is cheaper than passing thousands of names
+        all_packages = not with_files and self.snapshot is None
+        for header in self._query(query_format, None if all_packages else names):
+            if header.key in keys:
+                yield header
 
-        return files
+    @staticmethod
+    def _is_python_package(header: RpmHeader, dist_index: PythonDistIndex) -> bool:
+        if header.name in dist_index:
+            return True
 
-    def _process_rpm_package(self, package: str) -> Optional[PackageInfo]:
-        tqdm.write(f"Processing rpm package: {package}")
+        if header.name.startswith(("python-", "python3-")):
+            return True
 
-        name, version = package.split()
-        files = self._check_python_package_and_get_files(name)
-        if files is None:
-            return None
+        # looking for python binary as dependency
+        return any(req.endswith(("python", "python3")) for req in header.requires)
 
-        package_name = name
-        if name.startswith(("python-", "python3-")):
+    @staticmethod
+    def _process_rpm_package(
+        header: RpmHeader,
+        dist_index: PythonDistIndex,
+        root: str = "/",
+    ) -> PackageInfo:
+        name = dist_index.dist_name(header.name) or header.name
+        if name == header.name and name.startswith(("python-", "python3-")):
             parts = name.split("-")
             name = "-".join(parts[1:])
 
+        # paths on this machine, so they match files of the other package managers
+        files = [root_path(root, path) for path in header.files]
         location = None
         if files:
             # get basename of the first file, wild guess since that may not be true
@@ -65,18 +266,18 @@ class Rpm(PackageManager):
 
         return PackageInfo(
             name=name,
-            package_name=package_name,
-            version=version,
+            package_name=header.name,
+            version=header.version,
             location=location,
-            files=files,
+            files=FileList(files),
             pkg_type=PkgType.rpm,
         )
 
     @staticmethod
     def _without_duplicates(packages: list[PackageInfo]) -> list[PackageInfo]:
-        pkg_name_d: dict[str, list[PackageInfo]] = {pkg.name: [] for pkg in packages}
+        pkg_name_d: dict[str, list[PackageInfo]] = {}
         for package in packages:
-            pkg_name_d[package.name].append(package)
+            pkg_name_d.setdefault(canonicalize_name(package.name), []).append(package)
 
         result = []
         for _, pkgs in pkg_name_d.items():
@@ -87,7 +288,7 @@ class Rpm(PackageManager):
 
             # dupe, let's keep the binary package preferably without python3- prefix
             for pkg in pkgs:
-                if pkg.package_name == pkg.name:
+                if canonicalize_name(pkg.package_name) == canonicalize_name(pkg.name):
                     result.append(pkg)
                     break
             else:
@@ -96,46 +297,220 @@ class Rpm(PackageManager):
 
         return result
 
-    def get_python_packages(self) -> list[PackageInfo]:
-        process = run(
-            ["rpm", "-qa", "--queryformat", r"%{NAME} %{VERSION}\n"],
-            stdout=PIPE,
-            check=True,
-            text=True,
-        )
-        packages = process.stdout.strip().split("\n")
-        parsed_packages = []
-
-        with ThreadPoolExecutor() as executor:
-            futures = {
-                executor.submit(
-                    self._process_rpm_package,
-                    package,
-                ): package
-                for package in packages
-            }
-
-            for future in tqdm(
-                as_completed(futures),
-                total=len(futures),
-                desc="Processing rpm packages",
-            ):
-                package = future.result()
-                if package:
-                    parsed_packages.append(package)
+    def _iter_derive_packages(
+        self,
+        python_headers: dict[str, RpmHeader],
+        dist_index: PythonDistIndex,
+    ) -> Iterator[tuple[str, list[PackageInfo]]]:
+        # only python packages ever get their file lists, each package is done as soon
+        # as its files are read
+        missing = dict(python_headers)
+        for header in tqdm(
+            self._iter_headers(list(python_headers.values()), with_files=True),
+            desc="Processing rpm packages",
+            total=len(python_headers),
+        ):
+            tqdm.write(f"Processing rpm package: {header.name}")
+            missing.pop(header.key, None)
+            yield header.key, [self._process_rpm_package(header, dist_index, self.root)]
+
+        for key, header in missing.items():
+            yield key, [self._process_rpm_package(header, dist_index, self.root)]
+
+    def _iter_build_index(self) -> Iterator[PackageInfo]:
+        """
+        Scan the rpm database, yield python packages as they are processed and build
+        the index once all of them are done.
+        """
+        headers = list(tqdm(self._iter_rpm_stamps(), desc="Querying rpm packages"))
+        stamps = {header.key: header.stamp for header in headers}
+        previous = self.snapshot or ScanSnapshot()
+        # only packages installed or changed since the last scan are processed
+        changed = [header for header in headers if previous.stamps.get(header.key) != header.stamp]
+        metadata = list(self._iter_headers(changed, with_files=False)) if changed else []
+        dist_index = PythonDistIndex(metadata)
+        python_headers = {
+            header.key: header for header in metadata if self._is_python_package(header, dist_index)
+        }
+
+        # names are known before the file lists, so the packages to keep are decided
+        # upfront and each of them can be yielded as soon as its files are read
+        changed_keys = {header.key for header in changed}
+        candidates: list[tuple[str, PackageInfo]] = []
+        for key in stamps:
+            if key in python_headers:
+                packages = [self._process_rpm_package(python_headers[key], dist_index, self.root)]
+            elif key not in changed_keys:
+                packages = previous.packages.get(key, [])
+            else:
+                continue
+
+            candidates.extend((key, package) for package in packages)
+
+        key_by_package = {id(package): key for key, package in candidates}
+        kept_keys = {
+            key_by_package[id(package)]
+            for package in self._without_duplicates([package for _, package in candidates])
+        }
+        for key, packages in self._iter_update_snapshot(
+            stamps,
+            lambda _: self._iter_derive_packages(python_headers, dist_index),
+        ):
+            if key in kept_keys:
+                yield from packages
+
+        assert self.snapshot is not None
+        self._index = RpmIndex(headers, self.snapshot.all_packages())
+
+    def index(self) -> RpmIndex:
+        """
+        Get index of installed rpm packages, the rpm database is scanned only once
+        until the index is invalidated.
+        """
+        with self._index_lock:
+            if self._index is None:
+                for _ in self._iter_build_index():
+                    pass
+
+            assert self._index is not None
+            return self._index
+
+    def iter_dependency_headers(self) -> Iterator[RpmHeader]:
+        """
+        Stream requires, provides and file lists of all installed packages, by a single query.
+        """
+        if self.backend == RpmBackend.sqlite:
+            yield from iter_rpmdb_headers(self.root, with_metadata=True, with_files=True)
+            return
+
+        yield from self._query(_DEPENDENCIES_QUERY_FORMAT)
+
+    def iter_all_packages(self) -> Iterator[PackageInfo]:
+        """
+        Stream all installed packages, python or not, with their files, by a single query.
+        """
+        if self.backend == RpmBackend.sqlite:
+            headers = iter_rpmdb_headers(self.root, with_metadata=False, with_files=True)
+        else:
+            headers = self._query(_FILES_QUERY_FORMAT)
+
+        dist_index = PythonDistIndex()
+        for header in headers:
+            yield self._process_rpm_package(header, dist_index, self.root)
+
+    def _iter_digest_headers(self, headers: list[RpmHeader]) -> Iterator[RpmHeader]:
+        keys = {header.key for header in headers}
+        if self.backend == RpmBackend.sqlite:
+            yield from iter_rpmdb_headers(
+                self.root,
+                with_metadata=False,
+                keys=keys,
+                with_digests=True,
+            )
+            return
+
+        names = sorted({header.name for header in headers})
+        for header in self._query(_DIGESTS_QUERY_FORMAT, names):
+            if header.key in keys:
+                yield header
 
+    def file_digests(self, package: PackageInfo) -> dict[str, FileDigest]:
+        headers = [header for header in self.index().headers if header.name == package.package_name]
+        result = {}
+        for header in self._iter_digest_headers(headers):
+            algorithm = RPM_DIGEST_ALGORITHMS.get(header.digest_algorithm)
+            if algorithm is None or len(header.digests) != len(header.files):
+                tqdm.write(f"Error: can't read file digests of rpm package {header.name}")
+                continue
+
+            for path, digest in zip(header.files, header.digests, strict=True):
+                if digest:
+                    result[os.path.normpath(root_path(self.root, path))] = FileDigest(
+                        algorithm,
+                        digest,
+                    )
+
+        return result
+
+    def fingerprint(self) -> Optional[str]:
+        try:
+            rpmdb = find_rpmdb(self.root)
+        except FileNotFoundError:
+            # some other rpmdb format, we don't know what to watch
+            return None
+
+        return stat_fingerprint([rpmdb])
+
+    def invalidate(self) -> None:
+        with self._index_lock:
+            self._index = None
+
+    def packages_from_snapshot(self, snapshot: ScanSnapshot) -> list[PackageInfo]:
         # rpm may have python3- or python- prefix for the same package for python3 and 2 support
         # or it is just a library and python binary has the same name without prefix.
         # I trust rpm enough that it won't install same package twice to the system
         # so in case of dupes, let's just keep the binary package
-        return self._without_duplicates(parsed_packages)
+        return self._without_duplicates(snapshot.all_packages())
+
+    def iter_python_packages(self) -> Iterator[PackageInfo]:
+        with self._index_lock:
+            if self._index is None:
+                # pip waits for the index meanwhile, see Pip._package_has_different_installer
+                yield from self._iter_build_index()
+                return
 
-    def remove_python_packages(self, packages: set[str], auto_remove: bool) -> None:
+            index = self._index
+
+        yield from self._without_duplicates(index.python_packages)
+
+    def removal_command(
+        self,
+        packages: list[str],
+        auto_remove: bool,
+        assume_yes: bool = False,
+    ) -> list[str]:
+        # single dnf transaction, either all of the packages are removed or none
         cmd = ["sudo", "dnf", "remove"]
+        if assume_yes:
+            cmd.append("--assumeyes")
+
         if not auto_remove:
             cmd.append("--noautoremove")
 
-        run(cmd + list(packages))
+        return [*cmd, *packages]
+
+    def authorize(self) -> None:
+        """
+        Let sudo ask for the password now, in the foreground, so dnf queued to run in the
+        background doesn't have to ask for it while the terminal is used for something else.
+
+        Raises:
+            CalledProcessError: If sudo refused.
+        """
+        if os.geteuid() != 0:
+            run(["sudo", "--validate"], check=True)
+
+    def rollback_command(self, packages: list[PackageInfo]) -> Optional[list[str]]:
+        return [
+            "sudo",
+            "dnf",
+            "install",
+            *(f"{package.package_name}-{package.version}" for package in packages),
+        ]
 
     def exists(self) -> bool:
+        if self.backend == RpmBackend.sqlite:
+            try:
+                find_rpmdb(self.root)
+            except FileNotFoundError:
+                return False
+
+            return True
+
+        if self.root != "/" and not any(
+            os.path.isdir(os.path.join(self.root, os.path.dirname(path))) for path in RPMDB_PATHS
+        ):
+            # rpm of this machine is of no use for a root without rpm database
+            return False
+
         return run(["which", "rpm"], stdout=PIPE).returncode == 0
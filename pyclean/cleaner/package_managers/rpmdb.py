@@ -0,0 +1,247 @@
+"""
+Reader of the sqlite rpm database which does not need the rpm binary at all.
+
+Only the small part of the rpm header format needed by pyclean is implemented, see
+https://rpm-software-management.github.io/rpm/manual/format_header.html
+"""
+
+import sqlite3
+import struct
+from collections.abc import Container, Iterator
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional, Union, cast
+
+RPMDB_PATHS = ["usr/lib/sysimage/rpm/rpmdb.sqlite", "var/lib/rpm/rpmdb.sqlite"]
+
+# rpm tags, see rpmtag.h
+RPMTAG_SHA1HEADER = 269
+RPMTAG_NAME = 1000
+RPMTAG_VERSION = 1001
+RPMTAG_RELEASE = 1002
+RPMTAG_INSTALLTIME = 1008
+RPMTAG_ARCH = 1022
+RPMTAG_OLDFILENAMES = 1027
+RPMTAG_FILEDIGESTS = 1035
+RPMTAG_PROVIDENAME = 1047
+RPMTAG_REQUIRENAME = 1049
+RPMTAG_DIRINDEXES = 1116
+RPMTAG_BASENAMES = 1117
+RPMTAG_DIRNAMES = 1118
+RPMTAG_FILEDIGESTALGO = 5011
+
+# rpm tag types, see rpmtag.h
+RPM_INT32_TYPE = 4
+RPM_STRING_TYPE = 6
+RPM_STRING_ARRAY_TYPE = 8
+RPM_I18NSTRING_TYPE = 9
+
+STAMP_TAGS = frozenset(
+    {
+        RPMTAG_NAME,
+        RPMTAG_VERSION,
+        RPMTAG_RELEASE,
+        RPMTAG_ARCH,
+        RPMTAG_INSTALLTIME,
+        RPMTAG_SHA1HEADER,
+    },
+)
+METADATA_TAGS = frozenset({RPMTAG_PROVIDENAME, RPMTAG_REQUIRENAME})
+FILE_TAGS = frozenset({RPMTAG_OLDFILENAMES, RPMTAG_DIRINDEXES, RPMTAG_BASENAMES, RPMTAG_DIRNAMES})
+DIGEST_TAGS = frozenset({RPMTAG_FILEDIGESTS, RPMTAG_FILEDIGESTALGO})
+
+# PGP hash algorithm ids used by FILEDIGESTALGO, packages without the tag use md5
+RPM_DIGEST_ALGORITHMS = {1: "md5", 2: "sha1", 8: "sha256", 9: "sha384", 10: "sha512", 11: "sha224"}
+RPM_DEFAULT_DIGEST_ALGORITHM = 1
+
+_HEADER_INTRO = struct.Struct(">II")
+_INDEX_ENTRY = struct.Struct(">iIiI")
+
+TagValue = Union[str, list[str], list[int]]
+
+
+@dataclass
+class RpmHeader:
+    """
+    Subset of rpm header needed to decide whether the package is a python package.
+    """
+
+    name: str
+    version: str
+    # name-version-release.arch, unique among installed packages
+    key: str = ""
+    # changes whenever the package is (re)installed
+    stamp: str = ""
+    requires: list[str] = field(default_factory=list)
+    provides: list[str] = field(default_factory=list)
+    files: list[str] = field(default_factory=list)
+    # hex digests of regular files, in the same order as files, empty for the rest
+    digests: list[str] = field(default_factory=list)
+    digest_algorithm: int = RPM_DEFAULT_DIGEST_ALGORITHM
+
+
+def _read_strings(data: bytes, offset: int, count: int) -> list[str]:
+    result = []
+    for _ in range(count):
+        end = data.index(b"\0", offset)
+        result.append(data[offset:end].decode("utf-8", errors="surrogateescape"))
+        offset = end + 1
+
+    return result
+
+
+def parse_header_blob(
+    blob: bytes,
+    tags: Container[int] = STAMP_TAGS | METADATA_TAGS | FILE_TAGS | DIGEST_TAGS,
+) -> dict[int, TagValue]:
+    """
+    Decode tags pyclean cares about from header blob stored in rpmdb.
+
+    Args:
+        blob: Header without the lead magic, as stored in the `Packages` table.
+        tags: Tags to decode, the rest of the header is skipped.
+
+    Returns:
+        Mapping of rpm tag to its decoded value.
+    """
+    if len(blob) < _HEADER_INTRO.size:
+        raise ValueError("Header blob is too short.")
+
+    index_length, data_length = _HEADER_INTRO.unpack_from(blob)
+    data_start = _HEADER_INTRO.size + index_length * _INDEX_ENTRY.size
+    if data_start + data_length > len(blob):
+        raise ValueError("Header blob is truncated.")
+
+    data = blob[data_start : data_start + data_length]
+    result: dict[int, TagValue] = {}
+    for i in range(index_length):
+        tag, tag_type, offset, count = _INDEX_ENTRY.unpack_from(
+            blob,
+            _HEADER_INTRO.size + i * _INDEX_ENTRY.size,
+        )
+        if tag not in tags or offset < 0:
+            continue
+
+        if tag_type in (RPM_STRING_TYPE, RPM_I18NSTRING_TYPE):
+            result[tag] = _read_strings(data, offset, 1)[0]
+        elif tag_type == RPM_STRING_ARRAY_TYPE:
+            result[tag] = _read_strings(data, offset, count)
+        elif tag_type == RPM_INT32_TYPE:
+            result[tag] = list(struct.unpack_from(f">{count}i", data, offset))
+
+    return result
+
+
+def _header_files(tags: dict[int, TagValue]) -> list[str]:
+    if RPMTAG_BASENAMES not in tags:
+        return cast(list[str], tags.get(RPMTAG_OLDFILENAMES, []))
+
+    basenames = cast(list[str], tags[RPMTAG_BASENAMES])
+    dirnames = cast(list[str], tags.get(RPMTAG_DIRNAMES, []))
+    dirindexes = cast(list[int], tags.get(RPMTAG_DIRINDEXES, []))
+    return [
+        f"{dirnames[dir_index]}{basename}"
+        for basename, dir_index in zip(basenames, dirindexes, strict=True)
+    ]
+
+
+def _string_tag(tags: dict[int, TagValue], tag: int) -> str:
+    # the same placeholder rpm --queryformat prints for missing tags
+    return str(tags.get(tag, "(none)"))
+
+
+def header_from_blob(
+    blob: bytes,
+    with_metadata: bool = True,
+    with_files: bool = True,
+    with_digests: bool = False,
+) -> RpmHeader:
+    """
+    Create `RpmHeader` from rpmdb header blob.
+
+    Args:
+        blob: Header blob from the `Packages` table.
+        with_metadata: Whether to decode requires and provides.
+        with_files: Whether to decode file list too, it is the most expensive part.
+        with_digests: Whether to decode digests of the files.
+    """
+    wanted_tags = set(STAMP_TAGS)
+    if with_metadata:
+        wanted_tags |= METADATA_TAGS
+
+    if with_files:
+        wanted_tags |= FILE_TAGS
+
+    if with_digests:
+        wanted_tags |= DIGEST_TAGS
+
+    tags = parse_header_blob(blob, wanted_tags)
+    install_time = cast(list[int], tags.get(RPMTAG_INSTALLTIME, [0]))[0]
+    name = _string_tag(tags, RPMTAG_NAME)
+    version = _string_tag(tags, RPMTAG_VERSION)
+    release = _string_tag(tags, RPMTAG_RELEASE)
+    return RpmHeader(
+        name=name,
+        version=version,
+        key=f"{name}-{version}-{release}.{_string_tag(tags, RPMTAG_ARCH)}",
+        stamp=f"{install_time}:{_string_tag(tags, RPMTAG_SHA1HEADER)}",
+        requires=cast(list[str], tags.get(RPMTAG_REQUIRENAME, [])),
+        provides=cast(list[str], tags.get(RPMTAG_PROVIDENAME, [])),
+        files=_header_files(tags),
+        digests=cast(list[str], tags.get(RPMTAG_FILEDIGESTS, [])),
+        digest_algorithm=cast(
+            list[int],
+            tags.get(RPMTAG_FILEDIGESTALGO, [RPM_DEFAULT_DIGEST_ALGORITHM]),
+        )[0],
+    )
+
+
+def find_rpmdb(root: str = "/") -> Path:
+    """
+    Find the sqlite rpm database under the given root directory.
+
+    Raises:
+        FileNotFoundError: If there is no sqlite rpmdb in the root.
+    """
+    for rpmdb_path in RPMDB_PATHS:
+        path = Path(root) / rpmdb_path
+        if path.is_file():
+            return path
+
+    raise FileNotFoundError(f"No sqlite rpm database found in {root}")
+
+
+def _iter_rpmdb_blobs(root: str) -> Iterator[bytes]:
+    # read only, so we never take a write lock on the live database
+    connection = sqlite3.connect(f"{find_rpmdb(root).as_uri()}?mode=ro", uri=True)
+    try:
+        for (blob,) in connection.execute("SELECT blob FROM Packages"):
+            yield blob
+    finally:
+        connection.close()
+
+
+def iter_rpmdb_headers(
+    root: str = "/",
+    with_metadata: bool = True,
+    with_files: bool = True,
+    keys: Optional[Container[str]] = None,
+    with_digests: bool = False,
+) -> Iterator[RpmHeader]:
+    """
+    Read headers of installed packages directly from the sqlite rpmdb.
+
+    Args:
+        root: Root directory of the system whose rpmdb should be read.
+        with_metadata: Whether to decode requires and provides of the packages.
+        with_files: Whether to decode file lists of the packages.
+        keys: Read only packages with these keys, all packages by default.
+        with_digests: Whether to decode digests of the package files.
+    """
+    for blob in _iter_rpmdb_blobs(root):
+        if keys is not None:
+            header = header_from_blob(blob, with_metadata=False, with_files=False)
+            if header.key not in keys:
+                continue
+
+        yield header_from_blob(blob, with_metadata, with_files, with_digests)
@@ -0,0 +1,203 @@
+"""
+Declarative policy deciding which copy of each duplicate to keep, for unattended cleans.
+
+The policy is a TOML file, e.g.:
+
+    # packages in these directories are never removed
+    protect = ["/usr"]
+    auto_remove = false
+
+    # the first rule matching the name of a duplicate decides
+    [[rule]]
+    names = ["requests", "urllib3"]
+    keep = "rpm"
+
+    [[rule]]
+    keep = "newest"
+
+Rule keeps copies of a package manager (rpm, pip or pipx), the copies of the newest
+version (newest) or all of them (all). Rule keeping a package manager which has no copy
+of the duplicate doesn't match it, the next rule decides. Duplicates no rule matches are
+left alone.
+"""
+
+import os
+import re
+import tomllib
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from fnmatch import fnmatchcase
+from pathlib import Path
+from typing import Any, Optional, Union
+
+from pyclean.cleaner.package_managers.base import PackageInfo
+from pyclean.cleaner.removal import RemovalPlan
+from pyclean.constants import PkgType
+from pyclean.helpers import canonicalize_name
+
+KEEP_NEWEST = "newest"
+KEEP_ALL = "all"
+
+_VERSION_PART = re.compile(r"\d+|[a-z]+")
+
+
+def version_key(version: str) -> tuple[tuple[int, Union[int, str]], ...]:
+    """
+    Sort key of a version, numeric parts compare as numbers, e.g. 1.10 > 1.9.
+
+    It is not full PEP 440 nor rpm version comparison, but good enough to tell copies
+    of the same package apart.
+    """
+    # end of the version sorts after letters and before numbers, so 1.0rc1 < 1.0 < 1.0.1
+    return (
+        *(
+            (2, int(part)) if part.isdigit() else (0, part)
+            for part in _VERSION_PART.findall(version.lower())
+        ),
+        (1, 0),
+    )
+
+
+@dataclass
+class PolicyRule:
+    # package manager whose copies are kept, or KEEP_NEWEST or KEEP_ALL
+    keep: str
+    # glob patterns of canonical names of duplicates the rule applies to, all if empty
+    names: list[str] = field(default_factory=list)
+
+    def matches(self, name: str) -> bool:
+        return not self.names or any(fnmatchcase(name, pattern) for pattern in self.names)
+
+    def kept(self, packages: list[PackageInfo]) -> list[PackageInfo]:
+        """
+        Copies of the duplicate which the rule keeps, none if the rule can't decide.
+        """
+        if self.keep == KEEP_ALL:
+            return packages
+
+        if self.keep == KEEP_NEWEST:
+            newest = max(version_key(package.version) for package in packages)
+            return [package for package in packages if version_key(package.version) == newest]
+
+        return [package for package in packages if package.pkg_type == self.keep]
+
+
+@dataclass
+class Policy:
+    rules: list[PolicyRule] = field(default_factory=list)
+    # directories whose packages are never removed
+    protect: list[str] = field(default_factory=list)
+    auto_remove: bool = False
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "Policy":
+        """
+        Raises:
+            ValueError: If the policy is not valid.
+        """
+        unknown = set(data) - {"rule", "protect", "auto_remove"}
+        if unknown:
+            raise ValueError(f"Unknown policy keys: {', '.join(sorted(unknown))}")
+
+        keep_choices = [*PkgType.__members__, KEEP_NEWEST, KEEP_ALL]
+        rules = []
+        for i, rule in enumerate(data.get("rule", []), start=1):
+            if rule.get("keep") not in keep_choices:
+                raise ValueError(f"Rule {i} has to keep one of: {', '.join(keep_choices)}")
+
+            unknown = set(rule) - {"keep", "names"}
+            if unknown:
+                raise ValueError(f"Rule {i} has unknown keys: {', '.join(sorted(unknown))}")
+
+            names = [canonicalize_name(pattern) for pattern in rule.get("names", [])]
+            rules.append(PolicyRule(keep=rule["keep"], names=names))
+
+        return cls(
+            rules=rules,
+            protect=[os.path.normpath(path) for path in data.get("protect", [])],
+            auto_remove=bool(data.get("auto_remove", False)),
+        )
+
+    @classmethod
+    def load(cls, path: Path) -> "Policy":
+        """
+        Raises:
+            ValueError: If the policy file is not valid TOML or not a valid policy.
+        """
+        with open(path, "rb") as policy_file:
+            return cls.from_dict(tomllib.load(policy_file))
+
+    def is_protected(self, package: PackageInfo) -> bool:
+        # only rpm packages without any files have no location, there is nothing to protect
+        if package.location is None:
+            return False
+
+        location = os.path.normpath(package.location)
+        return any(
+            location == path or location.startswith(path.rstrip(os.sep) + os.sep)
+            for path in self.protect
+        )
+
+    def rule_for(self, name: str, packages: list[PackageInfo]) -> Optional[PolicyRule]:
+        name = canonicalize_name(name)
+        for rule in self.rules:
+            if rule.matches(name) and rule.kept(packages):
+                return rule
+
+        return None
+
+    def _not_kept(self, name: str, packages: list[PackageInfo]) -> list[PackageInfo]:
+        rule = self.rule_for(name, packages)
+        if rule is None:
+            return []
+
+        kept = rule.kept(packages)
+        # package managers remove packages by name, it would be up to them which copy goes
+        kept_names = {(package.pkg_type, package.package_name) for package in kept}
+        return [
+            package
+            for package in packages
+            if (package.pkg_type, package.package_name) not in kept_names
+            and not self.is_protected(package)
+        ]
+
+    def removed(self, name: str, packages: list[PackageInfo]) -> list[PackageInfo]:
+        """
+        Copies of the duplicate to remove, those not kept by the first matching rule
+        and not protected.
+
+        Copies installed by an unknown tool, e.g. pip packages without INSTALLER, are
+        left out, no package manager can remove them, `plan` reports them as skipped.
+        """
+        return [package for package in self._not_kept(name, packages) if package.pkg_type]
+
+    def plan(
+        self,
+        duplicates: Iterable[tuple[str, str, list[PackageInfo]]],
+        auto_remove: bool = False,
+    ) -> RemovalPlan:
+        """
+        Decide all duplicates in a single pass, they may be streamed while being scanned.
+
+        Args:
+            duplicates: Normalized name, name and copies of each duplicate.
+            auto_remove: Whether to remove dependencies too, even if the policy doesn't.
+
+        Returns:
+            Plan removing everything the policy doesn't keep, by all package managers at once.
+            Copies installed by an unknown tool are in its `skipped` packages.
+        """
+        plan = RemovalPlan(auto_remove=auto_remove or self.auto_remove)
+        # a duplicate streamed again, because more of its copies were found, is decided again
+        not_kept: dict[str, list[PackageInfo]] = {}
+        for key, name, packages in duplicates:
+            not_kept[key] = self._not_kept(name, packages)
+
+        for packages in not_kept.values():
+            for package in packages:
+                if package.pkg_type is None:
+                    plan.skipped.append(package)
+                else:
+                    plan.packages.setdefault(package.pkg_type, []).append(package)
+
+        return plan
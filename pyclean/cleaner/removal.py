@@ -0,0 +1,249 @@
+"""
+Execution of removal plans.
+
+Every package manager removes all of its packages by a single batched command, pip by
+one command per interpreter the packages are installed for. Package managers are
+independent of each other so their commands run concurrently. Each step records its
+result and the command which would install the packages back. Removals confirmed one
+by one, in interactive mode, are queued to run in the background.
+"""
+
+import json
+import time
+from collections.abc import Iterable
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from subprocess import CalledProcessError
+from typing import Optional
+
+from tqdm import tqdm
+
+from pyclean.cleaner.package_managers.base import PackageInfo, PackageManager
+from pyclean.constants import PkgType, StepKind
+
+
+@dataclass
+class RemovalStep:
+    pkg_type: PkgType
+    packages: list[PackageInfo]
+    # what the step runs, for the record, the package manager is the one who runs it,
+    # None if the packages are uninstalled natively, without any command
+    command: Optional[list[str]]
+    # command installing the removed packages back, if the package manager can do that
+    rollback: Optional[list[str]] = None
+    # exit code of the command, None if it did not run or did not finish
+    returncode: Optional[int] = None
+    error: Optional[str] = None
+    duration: float = 0.0
+
+    @property
+    def succeeded(self) -> bool:
+        return self.returncode == 0
+
+    @property
+    def kind(self) -> StepKind:
+        return StepKind.native_uninstall if self.command is None else StepKind.command
+
+    def describe(self) -> str:
+        if self.command is None:
+            names = " ".join(package.package_name for package in self.packages)
+            return f"native uninstall of {names}"
+
+        return " ".join(self.command)
+
+    def to_dict(self) -> dict:
+        return {
+            "pkg_type": self.pkg_type.value,
+            "kind": self.kind.value,
+            # not the whole packages, file lists are of no use for the record
+            "packages": [
+                {"package_name": package.package_name, "version": package.version}
+                for package in self.packages
+            ],
+            "command": self.command,
+            "rollback": self.rollback,
+            "returncode": self.returncode,
+            "error": self.error,
+            "duration": self.duration,
+        }
+
+
+def _package_to_dict(package: PackageInfo) -> dict:
+    return {
+        "package_name": package.package_name,
+        "version": package.version,
+        "location": package.location,
+    }
+
+
+@dataclass
+class RemovalPlan:
+    auto_remove: bool = False
+    # the user has seen and confirmed everything the plan removes, even what package
+    # managers remove along, so they must not ask again
+    assume_yes: bool = False
+    # package manager -> its packages to remove
+    packages: dict[PkgType, list[PackageInfo]] = field(default_factory=dict)
+    # packages which should go, but it is not known which package manager installed them
+    skipped: list[PackageInfo] = field(default_factory=list)
+
+    def to_dict(self) -> dict:
+        return {
+            "auto_remove": self.auto_remove,
+            "packages": {
+                pkg_type.value: [_package_to_dict(package) for package in packages]
+                for pkg_type, packages in self.packages.items()
+            },
+            "skipped": [_package_to_dict(package) for package in self.skipped],
+        }
+
+    def steps(self, pkg_managers: Iterable[PackageManager]) -> list[RemovalStep]:
+        """
+        Single batched step per package manager which has something to remove, or per
+        batch of its packages, see `PackageManager.removal_batches`.
+        """
+        steps: list[RemovalStep] = []
+        for pkg_manager in pkg_managers:
+            packages = self.packages.get(pkg_manager.pkg_type)
+            if not packages:
+                continue
+
+            steps.extend(
+                RemovalStep(
+                    pkg_type=pkg_manager.pkg_type,
+                    packages=batch,
+                    command=pkg_manager.batch_removal_command(
+                        batch,
+                        self.auto_remove,
+                        self.assume_yes,
+                    ),
+                    rollback=pkg_manager.rollback_command(batch),
+                )
+                for batch in pkg_manager.removal_batches(packages)
+            )
+
+        return steps
+
+
+def _run_step(step: RemovalStep, pkg_manager: PackageManager, plan: RemovalPlan) -> None:
+    start = time.monotonic()
+    try:
+        pkg_manager.remove_packages(step.packages, plan.auto_remove, plan.assume_yes)
+        step.returncode = 0
+    except CalledProcessError as e:
+        step.returncode = e.returncode
+        step.error = str(e)
+    except Exception as e:
+        # e.g. missing permissions, the other package managers carry on
+        step.error = str(e)
+    finally:
+        step.duration = time.monotonic() - start
+
+
+def execute_removal(
+    plan: RemovalPlan,
+    pkg_managers: Iterable[PackageManager],
+) -> list[RemovalStep]:
+    """
+    Run the removal plan, package managers concurrently, each batch by a single command.
+
+    Failure of one package manager doesn't stop the others, it is recorded in its step.
+
+    Returns:
+        Steps of the plan with their results.
+    """
+    pkg_managers = list(pkg_managers)
+    by_type = {pkg_manager.pkg_type: pkg_manager for pkg_manager in pkg_managers}
+    steps = plan.steps(pkg_managers)
+    if not steps:
+        return steps
+
+    with ThreadPoolExecutor(max_workers=len(steps)) as executor:
+        for step in steps:
+            tqdm.write(f"Removing {step.pkg_type.name} packages: {step.describe()}")
+            executor.submit(_run_step, step, by_type[step.pkg_type], plan)
+
+    return steps
+
+
+class RemovalQueue:
+    """
+    Runs queued removals in the background, one after another in the order they were
+    queued, package managers like dnf hold a lock anyway.
+
+    Leaving the context waits for the queued removals to finish.
+    """
+
+    def __init__(self, pkg_managers: Iterable[PackageManager]) -> None:
+        self._pkg_managers = list(pkg_managers)
+        self._by_type = {pkg_manager.pkg_type: pkg_manager for pkg_manager in self._pkg_managers}
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._futures: list[Future] = []
+        # queued steps, their results are filled in once they finish
+        self.steps: list[RemovalStep] = []
+
+    def __enter__(self) -> "RemovalQueue":
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        self.close()
+
+    def submit(self, plan: RemovalPlan) -> list[RemovalStep]:
+        """
+        Queue the removal plan and return right away.
+
+        Returns:
+            Queued steps of the plan, they are finished once `close` returns.
+        """
+        steps = plan.steps(self._pkg_managers)
+        for step in steps:
+            tqdm.write(f"Queued removal of {step.pkg_type.name} packages: {step.describe()}")
+            self.steps.append(step)
+            self._futures.append(
+                self._executor.submit(_run_step, step, self._by_type[step.pkg_type], plan),
+            )
+
+        return steps
+
+    def run(self, plan: RemovalPlan) -> list[RemovalStep]:
+        """
+        Run the removal plan in the foreground once the queued removals are finished,
+        e.g. when the package manager has to ask the user itself.
+
+        Returns:
+            Finished steps of the plan.
+        """
+        wait(self._futures)
+        steps = plan.steps(self._pkg_managers)
+        for step in steps:
+            tqdm.write(f"Removing {step.pkg_type.name} packages: {step.describe()}")
+            self.steps.append(step)
+            _run_step(step, self._by_type[step.pkg_type], plan)
+
+        return steps
+
+    def pending(self) -> int:
+        return sum(not future.done() for future in self._futures)
+
+    def close(self) -> list[RemovalStep]:
+        """
+        Wait for all of the queued removals to finish.
+        """
+        self._executor.shutdown(wait=True)
+        return self.steps
+
+
+def write_journal(steps: list[RemovalStep], directory: Path) -> Path:
+    """
+    Record the executed steps, so what was removed can be installed back later.
+
+    Returns:
+        Path to the journal file.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"removal-{time.time_ns()}.json"
+    with open(path, "w") as journal_file:
+        json.dump([step.to_dict() for step in steps], journal_file, indent=2)
+
+    return path
@@ -0,0 +1,142 @@
+"""
+Offline scanning of root directories, e.g. unpacked container images or chroots.
+
+Nothing in the roots is run, their rpm database, site-packages and pipx venvs are just
+read. Every root is scanned by its own process and gets a report of its own.
+"""
+
+import os
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+from pyclean.cleaner.cache import ScanCache
+from pyclean.cleaner.cleaner import Cleaner
+from pyclean.constants import OutputFormat, RpmBackend
+from pyclean.helpers import canonicalize_name, write_duplicates
+
+
+@dataclass
+class RootReport:
+    root: str
+    report_path: str
+    duplicates: int = 0
+    # package manager -> error it failed with
+    errors: dict[str, str] = field(default_factory=dict)
+    # the root couldn't be scanned or its report written, there is no report then
+    error: Optional[str] = None
+
+
+# suffixes of report files in the output formats
+_REPORT_SUFFIXES = {
+    OutputFormat.text: "txt",
+    OutputFormat.json: "json",
+    OutputFormat.ndjson: "ndjson",
+}
+
+
+def report_name(root: str, output_format: OutputFormat = OutputFormat.text) -> str:
+    """
+    Name of the report file of the root, unique for different roots.
+    """
+    name = os.path.normpath(os.path.abspath(root)).strip("/").replace("/", "_")
+    return f"{name or 'root'}.{_REPORT_SUFFIXES[output_format]}"
+
+
+def scan_root(
+    root: str,
+    report_path: str,
+    system_clean: bool,
+    rpm_backend: RpmBackend = RpmBackend.cli,
+    use_cache: bool = True,
+    refresh_cache: bool = False,
+    verbose: bool = False,
+    output_format: OutputFormat = OutputFormat.text,
+) -> RootReport:
+    """
+    Find duplicate packages in the root and write them to the report file.
+    """
+    cleaner = Cleaner(
+        system_clean=system_clean,
+        rpm_backend=rpm_backend,
+        cache=ScanCache() if use_cache else None,
+        refresh_cache=refresh_cache,
+        root=root,
+    )
+    duplicates = cleaner.get_package_duplicates()
+    report = RootReport(
+        root=root,
+        report_path=report_path,
+        duplicates=len(duplicates),
+        errors={pkg_type.name: str(error) for pkg_type, error in cleaner.scan_errors.items()},
+    )
+    with open(report_path, "w") as report_file:
+        if output_format == OutputFormat.text:
+            report_file.write(f"Root: {root}\n")
+            for pkg_type, error in report.errors.items():
+                report_file.write(f"Error: scan of {pkg_type} packages failed: {error}\n")
+
+        write_duplicates(
+            report_file,
+            # interpreters of the root can't be asked for sys.path, so imports are unknown
+            ((canonicalize_name(name), name, dupes, None) for name, dupes in duplicates.items()),
+            output_format,
+            verbose,
+        )
+
+    return report
+
+
+def scan_roots(
+    roots: Iterable[str],
+    report_dir: str,
+    system_clean: bool,
+    rpm_backend: RpmBackend = RpmBackend.cli,
+    use_cache: bool = True,
+    refresh_cache: bool = False,
+    verbose: bool = False,
+    output_format: OutputFormat = OutputFormat.text,
+    jobs: Optional[int] = None,
+) -> Iterator[RootReport]:
+    """
+    Scan the roots in a pool of processes, one report file per root in the report directory.
+
+    Yields:
+        Report of each root as soon as its scan is done, failure of one root doesn't stop
+        the others, it is recorded in its report.
+    """
+    roots = list(dict.fromkeys(roots))
+    if not roots:
+        return
+
+    Path(report_dir).mkdir(parents=True, exist_ok=True)
+    jobs = jobs or min(len(roots), os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = {
+            executor.submit(
+                scan_root,
+                root,
+                os.path.join(report_dir, report_name(root, output_format)),
+                system_clean,
+                rpm_backend,
+                use_cache,
+                refresh_cache,
+                verbose,
+                output_format,
+            ): root
+            for root in roots
+        }
+        for future in as_completed(futures):
+            root = futures[future]
+            try:
+                report = future.result()
+            except Exception as e:
+                report = RootReport(
+                    root=root,
+                    report_path=os.path.join(report_dir, report_name(root, output_format)),
+                    error=str(e),
+                )
+
+            yield report
@@ -0,0 +1,178 @@
+"""
+Analysis of which copy of a duplicate package python actually imports.
+
+Nothing is imported, import names of the packages are derived from their file lists and
+the winning copy is the one found first on `sys.path` of the target interpreter.
+"""
+
+import json
+import os
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+from subprocess import PIPE, run
+from typing import Optional
+
+from pyclean.cleaner.conflicts import iter_absolute_files
+from pyclean.cleaner.package_managers.base import PackageInfo
+
+# suffixes of top-level files python can import
+_MODULE_SUFFIXES = (".py", ".pyc", ".so", ".pyd")
+# top-level directories which are never import packages
+_NOT_PACKAGE_SUFFIXES = (".dist-info", ".egg-info", ".data")
+
+
+def interpreter_sys_path(python: str = "python3") -> list[str]:
+    """
+    Get `sys.path` of the interpreter, it is started just once.
+
+    The current working directory entry is left out, it depends on where the interpreter
+    is started from, not on the installation.
+    """
+    stdout = run(
+        [python, "-c", "import json, sys; print(json.dumps(sys.path))"],
+        stdout=PIPE,
+        check=True,
+        text=True,
+    ).stdout
+    return [path for path in json.loads(stdout) if path]
+
+
+class PathPriority:
+    """
+    Precomputed index of `sys.path` entries and their priority, the lower the sooner
+    python looks into the entry.
+    """
+
+    def __init__(self, sys_path: Iterable[str]) -> None:
+        self._priority: dict[str, int] = {}
+        for priority, entry in enumerate(sys_path):
+            # both spellings of symlinked entries, the first occurrence wins like in python
+            for path in (os.path.normpath(entry), os.path.realpath(entry)):
+                self._priority.setdefault(path, priority)
+
+        # directory -> sys.path entry it is in and its top-level name there
+        self._resolved: dict[str, Optional[tuple[str, str]]] = {}
+
+    def priority(self, entry: str) -> Optional[int]:
+        return self._priority.get(entry)
+
+    def _resolve_directory(self, directory: str) -> Optional[tuple[str, str]]:
+        if directory in self._resolved:
+            return self._resolved[directory]
+
+        parent, name = os.path.split(directory)
+        result: Optional[tuple[str, str]] = None
+        if parent in self._priority:
+            result = parent, name
+        elif parent != directory:
+            parent_result = self._resolve_directory(parent)
+            if parent_result is not None:
+                result = parent_result
+
+        self._resolved[directory] = result
+        return result
+
+    def top_level(self, path: str) -> Optional[tuple[str, str]]:
+        """
+        Find the `sys.path` entry the file is importable from and its import name.
+
+        Args:
+            path: Normalized absolute path to a file.
+
+        Returns:
+            Entry and the top-level import name, or None if the file is not importable.
+        """
+        directory, basename = os.path.split(path)
+        if directory in self._priority:
+            if not basename.endswith(_MODULE_SUFFIXES):
+                return None
+
+            return directory, basename.split(".")[0]
+
+        # results for directories are memoized, so every file costs a dict lookup
+        resolved = self._resolve_directory(directory)
+        if resolved is None:
+            return None
+
+        entry, name = resolved
+        if name == "__pycache__" or name.endswith(_NOT_PACKAGE_SUFFIXES):
+            return None
+
+        return entry, name
+
+
+def iter_import_locations(
+    package: PackageInfo,
+    path_priority: PathPriority,
+) -> Iterator[tuple[str, str]]:
+    """
+    Stream top-level import names of the package with the `sys.path` entries they are
+    imported from, each of them once.
+    """
+    seen = set()
+    for path in iter_absolute_files(package):
+        top_level = path_priority.top_level(path)
+        if top_level is not None and top_level not in seen:
+            seen.add(top_level)
+            yield top_level[1], top_level[0]
+
+
+@dataclass
+class ImportAnalysis:
+    packages: list[PackageInfo]
+    # import name -> index of the package whose copy python imports, None if more copies
+    # are in the same directory and the one installed last overwrote the others
+    winners: dict[str, Optional[int]] = field(default_factory=dict)
+    # import names provided by each of the packages
+    names: list[set[str]] = field(default_factory=list)
+
+    def status(self, index: int) -> str:
+        """
+        Whether python imports the copy of the package at the index: `yes`, `no`,
+        `partly` for some of its import names, `?` if it can't be told and `-` if the
+        package provides nothing importable.
+        """
+        names = self.names[index]
+        if not names:
+            return "-"
+
+        winners = [self.winners[name] for name in names]
+        if all(winner == index for winner in winners):
+            return "yes"
+
+        if index in winners:
+            return "partly"
+
+        if None in winners:
+            return "?"
+
+        return "no"
+
+
+def analyze_imports(packages: list[PackageInfo], path_priority: PathPriority) -> ImportAnalysis:
+    """
+    Find out which copy of the duplicate packages python imports.
+
+    Args:
+        packages: Duplicate packages of the same name.
+        path_priority: Index of `sys.path` of the target interpreter.
+    """
+    analysis = ImportAnalysis(packages)
+    # import name -> (priority, index of the package), the best seen so far
+    best: dict[str, tuple[int, Optional[int]]] = {}
+    for index, package in enumerate(packages):
+        names = set()
+        for name, entry in iter_import_locations(package, path_priority):
+            names.add(name)
+            priority = path_priority.priority(entry)
+            assert priority is not None
+            if name not in best or priority < best[name][0]:
+                best[name] = priority, index
+            elif priority == best[name][0] and best[name][1] != index:
+                # copies in the same directory, the files are of whoever installed last
+                best[name] = priority, None
+
+        analysis.names.append(names)
+
+    analysis.winners = {name: index for name, (_, index) in best.items()}
+    return analysis
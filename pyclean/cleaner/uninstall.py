@@ -0,0 +1,198 @@
+"""
+Native uninstall of pip distributions, without spawning pip.
+
+Files listed in RECORD are moved to a trash session instead of being deleted, so the
+uninstall can be undone. Nothing owned by rpm is ever touched.
+"""
+
+import glob
+import json
+import os
+import shutil
+import time
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+from pyclean.cleaner.package_managers.dist_info import DistInfo
+
+MANIFEST_FILE = "manifest.json"
+
+# absolute path -> whether it must not be touched, e.g. it is owned by rpm
+ProtectedPath = Callable[[str], bool]
+
+
+def default_trash_dir() -> Path:
+    data_home = os.environ.get("XDG_DATA_HOME") or Path.home() / ".local" / "share"
+    return Path(data_home) / "pyclean" / "trash"
+
+
+def iter_uninstall_paths(dist: DistInfo) -> Iterator[str]:
+    """
+    Stream files of the distribution to remove, each of them once.
+
+    Those are files listed in RECORD, bytecode python compiled from them and anything else
+    left in the dist-info directory, like pip does.
+    """
+    seen = set()
+
+    def new(path: str) -> bool:
+        if path in seen:
+            return False
+
+        seen.add(path)
+        return True
+
+    for path in dist.iter_absolute_record():
+        if new(path):
+            yield path
+
+        if path.endswith(".py"):
+            directory, basename = os.path.split(path)
+            pattern = os.path.join(directory, "__pycache__", f"{glob.escape(basename[:-3])}.*.pyc")
+            for pyc in sorted(glob.glob(pattern)):
+                if new(pyc):
+                    yield pyc
+
+    for directory, _, files in os.walk(dist.path):
+        for file in sorted(files):
+            path = os.path.join(directory, file)
+            if new(path):
+                yield path
+
+
+@dataclass
+class TrashSession:
+    """
+    Files moved away by a single uninstall run, they can be moved back by `restore`.
+    """
+
+    directory: Path
+    # original path -> path in the trash
+    moved: dict[str, str] = field(default_factory=dict)
+
+    @property
+    def session_id(self) -> str:
+        return self.directory.name
+
+    @classmethod
+    def create(cls, trash_dir: Optional[Path] = None) -> "TrashSession":
+        trash_dir = trash_dir if trash_dir is not None else default_trash_dir()
+        return cls(trash_dir / str(time.time_ns()))
+
+    @classmethod
+    def load(cls, directory: Path) -> "TrashSession":
+        with open(directory / MANIFEST_FILE) as manifest_file:
+            return cls(directory, json.load(manifest_file))
+
+    def _save(self) -> None:
+        with open(self.directory / MANIFEST_FILE, "w") as manifest_file:
+            json.dump(self.moved, manifest_file, indent=2)
+
+    def move(self, paths: list[str]) -> None:
+        """
+        Move the files to the trash, the manifest is saved even if it fails half way.
+        """
+        (self.directory / "files").mkdir(parents=True, exist_ok=True)
+        try:
+            for path in paths:
+                trashed = str(self.directory / "files" / path.lstrip("/"))
+                os.makedirs(os.path.dirname(trashed), exist_ok=True)
+                # different filesystem than the trash is copied and deleted
+                shutil.move(path, trashed)
+                self.moved[path] = trashed
+        finally:
+            self._save()
+
+    def restore(self) -> list[str]:
+        """
+        Move the files back where they were.
+
+        Returns:
+            Paths which were not restored, because something else is there now.
+        """
+        conflicts = []
+        try:
+            for path, trashed in list(self.moved.items()):
+                if os.path.lexists(path):
+                    conflicts.append(path)
+                    continue
+
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                shutil.move(trashed, path)
+                del self.moved[path]
+        finally:
+            # what is left can be restored later, once the conflicts are resolved
+            if self.moved:
+                self._save()
+            else:
+                shutil.rmtree(self.directory)
+
+        return conflicts
+
+
+def latest_session(trash_dir: Optional[Path] = None) -> Optional[TrashSession]:
+    trash_dir = trash_dir if trash_dir is not None else default_trash_dir()
+    sessions = sorted(
+        (path for path in trash_dir.glob("*") if (path / MANIFEST_FILE).is_file()),
+        key=lambda path: int(path.name) if path.name.isdigit() else 0,
+    )
+    return TrashSession.load(sessions[-1]) if sessions else None
+
+
+def _prune_empty_directories(paths: list[str], stop: str, is_protected: ProtectedPath) -> None:
+    # deepest first, so a directory is empty once its empty subdirectories are gone
+    directories = {os.path.dirname(path) for path in paths}
+    for directory in sorted(directories, key=lambda path: path.count(os.sep), reverse=True):
+        while directory.startswith(stop + os.sep) and not is_protected(directory):
+            try:
+                os.rmdir(directory)
+            except OSError:
+                # not empty or already gone
+                break
+
+            directory = os.path.dirname(directory)
+
+
+class NativeUninstaller:
+    """
+    Uninstaller of pip distributions which moves their files to the trash.
+    """
+
+    def __init__(
+        self,
+        session: TrashSession,
+        is_protected: ProtectedPath = lambda _: False,
+    ) -> None:
+        self.session = session
+        self.is_protected = is_protected
+
+    def uninstall(self, dist: DistInfo) -> list[str]:
+        """
+        Move files of the distribution to the trash and prune directories left empty.
+
+        Raises:
+            PermissionError: If any of the files is protected, nothing is touched then.
+
+        Returns:
+            The moved files.
+        """
+        paths = [path for path in iter_uninstall_paths(dist) if os.path.lexists(path)]
+        protected = [path for path in paths if self.is_protected(path)]
+        if protected:
+            raise PermissionError(
+                f"Refusing to uninstall {dist.name}, its files are protected, e.g. owned by rpm: "
+                f"{', '.join(protected[:5])}",
+            )
+
+        # checked upfront, so the distribution is never left half uninstalled
+        read_only = [path for path in paths if not os.access(os.path.dirname(path), os.W_OK)]
+        if read_only:
+            raise PermissionError(
+                f"Can't uninstall {dist.name}, no write access to: {', '.join(read_only[:5])}",
+            )
+
+        self.session.move(paths)
+        _prune_empty_directories(paths, os.path.normpath(dist.location), self.is_protected)
+        return paths
@@ -0,0 +1,170 @@
+"""
+Verification of installed files against digests recorded by their package managers.
+
+When two package managers install the same files, the one which installed last wins
+and the other one is left with a broken installation. Hashing the files on disk tells
+whose copy is actually there.
+"""
+
+import hashlib
+import mmap
+import os
+from collections.abc import Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Optional
+
+from pyclean.cleaner.package_managers.base import PackageInfo
+from pyclean.cleaner.package_managers.file_list import FileDigest
+
+# files hashed by a single task, so the pool is not flooded by tiny tasks
+HASH_BATCH_SIZE = 64
+# niceness of the hashing processes, verification must not slow down the machine
+WORKER_NICENESS = 10
+
+HashRequest = tuple[str, str]
+
+
+def default_jobs() -> int:
+    return min(4, os.cpu_count() or 1)
+
+
+def hash_file(path: str, algorithm: str) -> Optional[str]:
+    """
+    Hash the file without copying its content to python memory.
+
+    Returns:
+        Hex digest of the file or None if it can't be read, e.g. it doesn't exist.
+    """
+    digest = hashlib.new(algorithm)
+    try:
+        with open(path, "rb") as file:
+            # empty file can't be mapped
+            if os.fstat(file.fileno()).st_size:
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    digest.update(mapped)
+    except (OSError, ValueError):
+        return None
+
+    return digest.hexdigest()
+
+
+def _hash_batch(batch: list[HashRequest]) -> list[Optional[str]]:
+    return [hash_file(path, algorithm) for path, algorithm in batch]
+
+
+def _lower_priority() -> None:
+    os.nice(WORKER_NICENESS)
+
+
+def _batches(requests: Iterable[HashRequest]) -> Iterator[list[HashRequest]]:
+    batch = []
+    for request in requests:
+        batch.append(request)
+        if len(batch) == HASH_BATCH_SIZE:
+            yield batch
+            batch = []
+
+    if batch:
+        yield batch
+
+
+def hash_files(
+    requests: Iterable[HashRequest],
+    jobs: Optional[int] = None,
+    max_in_flight: Optional[int] = None,
+) -> dict[HashRequest, Optional[str]]:
+    """
+    Hash files in a pool of low priority processes.
+
+    Args:
+        requests: Paths to hash with the hashlib algorithm to use.
+        jobs: Number of hashing processes.
+        max_in_flight: Maximum number of batches submitted at once, it bounds both
+            the memory and the I/O pressure. Twice the number of jobs by default.
+
+    Returns:
+        Hex digest, or None if the file can't be read, of each request.
+    """
+    jobs = jobs or default_jobs()
+    max_in_flight = max_in_flight or 2 * jobs
+    result: dict[HashRequest, Optional[str]] = {}
+    pending: dict[Future, list[HashRequest]] = {}
+
+    def collect(done: Iterable[Future]) -> None:
+        for future in done:
+            batch = pending.pop(future)
+            result.update(zip(batch, future.result(), strict=True))
+
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_lower_priority) as executor:
+        for batch in _batches(requests):
+            if len(pending) >= max_in_flight:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+
+            pending[executor.submit(_hash_batch, batch)] = batch
+
+        collect(list(pending))
+
+    return result
+
+
+@dataclass
+class PackageVerification:
+    package: PackageInfo
+    # files matching the recorded digest
+    verified: int = 0
+    missing: list[str] = field(default_factory=list)
+    # modified file -> package whose copy of the file is on the disk, if known
+    modified: dict[str, Optional[PackageInfo]] = field(default_factory=dict)
+
+
+def verify_packages(
+    packages: list[tuple[PackageInfo, dict[str, FileDigest]]],
+    jobs: Optional[int] = None,
+    max_in_flight: Optional[int] = None,
+) -> list[PackageVerification]:
+    """
+    Check files of the packages against digests recorded by their package managers.
+
+    Every file is hashed once per digest algorithm, no matter how many packages own it.
+
+    Args:
+        packages: Packages with digests of their files, see `PackageManager.file_digests`.
+        jobs: Number of hashing processes.
+        max_in_flight: Maximum number of hashing tasks submitted at once.
+
+    Returns:
+        Result for each package, in the same order.
+    """
+    owners: dict[str, list[tuple[PackageInfo, FileDigest]]] = {}
+    for package, digests in packages:
+        for path, digest in digests.items():
+            owners.setdefault(path, []).append((package, digest))
+
+    requests = {(path, digest.algorithm) for path in owners for _, digest in owners[path]}
+    hashes = hash_files(sorted(requests), jobs=jobs, max_in_flight=max_in_flight)
+
+    result = []
+    for package, digests in packages:
+        verification = PackageVerification(package)
+        for path, digest in digests.items():
+            on_disk = hashes[(path, digest.algorithm)]
+            if on_disk is None:
+                verification.missing.append(path)
+            elif on_disk == digest.hexdigest:
+                verification.verified += 1
+            else:
+                # the first other owner whose digest matches, installed the file last
+                verification.modified[path] = next(
+                    (
+                        owner
+                        for owner, owner_digest in owners[path]
+                        if hashes[(path, owner_digest.algorithm)] == owner_digest.hexdigest
+                    ),
+                    None,
+                )
+
+        result.append(verification)
+
+    return result
@@ -1,18 +1,39 @@
+import json
+import sys
 import time
+from contextlib import nullcontext, redirect_stdout
 from dataclasses import dataclass
+from pathlib import Path
+from subprocess import CalledProcessError
 from typing import Any, Optional
 
 import click
 from click import Context, pass_context
 
+from pyclean.cleaner.cache import ScanCache, default_cache_dir
 from pyclean.cleaner.cleaner import Cleaner
-from pyclean.constants import PkgType
-from pyclean.helpers import dupe_table
+from pyclean.cleaner.interpreters import InterpreterDiscovery
+from pyclean.cleaner.package_managers.base import PackageInfo
+from pyclean.cleaner.policy import Policy
+from pyclean.cleaner.removal import write_journal
+from pyclean.cleaner.roots import scan_roots
+from pyclean.cleaner.shadowing import PathPriority, analyze_imports, interpreter_sys_path
+from pyclean.cleaner.uninstall import TrashSession, default_trash_dir, latest_session
+from pyclean.constants import OutputFormat, PkgType, RpmBackend
+from pyclean.helpers import (
+    OUTPUT_SCHEMA_VERSION,
+    conflict_table,
+    plan_report,
+    verify_table,
+    write_duplicates,
+)
 
 
 @dataclass
 class Obj:
     cleaner: Cleaner
+    # needed to scan other roots the same way, see show --root
+    rpm_backend: RpmBackend = RpmBackend.cli
 
 
 def _get_context_settings() -> dict[str, Any]:
@@ -27,12 +48,114 @@ def _get_context_settings() -> dict[str, Any]:
     default=False,
     help="Look for packages in the whole system.",
 )
+@click.option(
+    "--rpm-backend",
+    type=click.Choice(RpmBackend.__members__),
+    default=RpmBackend.cli,
+    show_default=True,
+    help="Query rpm packages via rpm binary or by reading the sqlite rpmdb directly.",
+)
+@click.option(
+    "--site-packages",
+    multiple=True,
+    type=click.Path(exists=True, file_okay=False),
+    help="Additional site-packages directory to look for pip packages in, can be repeated.",
+)
+@click.option(
+    "--discover/--no-discover",
+    default=True,
+    show_default=True,
+    help="Look for pip packages of all python3 interpreters in /usr/bin and /usr/local/bin, "
+    "not only of the one running pyclean.",
+)
+@click.option(
+    "--venv-root",
+    multiple=True,
+    type=click.Path(exists=True, file_okay=False),
+    help="Directory with virtual environments to look for pip packages in, can be repeated.",
+)
+@click.option(
+    "--no-cache",
+    is_flag=True,
+    default=False,
+    help="Don't read nor store scan results in the cache.",
+)
+@click.option(
+    "--refresh",
+    is_flag=True,
+    default=False,
+    help="Ignore cached scan results and scan everything again.",
+)
 @pass_context
-def entry_point(ctx: Context, system: bool) -> None:
+def entry_point(
+    ctx: Context,
+    system: bool,
+    rpm_backend: str,
+    site_packages: tuple[str, ...],
+    discover: bool,
+    venv_root: tuple[str, ...],
+    no_cache: bool,
+    refresh: bool,
+) -> None:
     """
     Tool to identify/remove packages installed both as rpm and pip.
     """
-    ctx.obj = Obj(cleaner=Cleaner(system_clean=system))
+    ctx.obj = Obj(
+        cleaner=Cleaner(
+            system_clean=system,
+            rpm_backend=RpmBackend(rpm_backend),
+            site_packages=site_packages,
+            cache=None if no_cache else ScanCache(),
+            refresh_cache=refresh,
+            discovery=InterpreterDiscovery(venv_roots=venv_root) if discover else None,
+        ),
+        rpm_backend=RpmBackend(rpm_backend),
+    )
+
+
+def _print_plan(
+    cleaner: Cleaner,
+    package_type: Optional[PkgType],
+    auto_remove: bool,
+    policy: Optional[Policy],
+    output_format: OutputFormat,
+) -> None:
+    # keep stdout parseable, progress bars and warnings go to stderr
+    redirect = redirect_stdout(sys.stderr) if output_format != OutputFormat.text else nullcontext()
+    with redirect:
+        removal_plan, impact = cleaner.plan_clean(package_type, auto_remove, policy)
+
+    if output_format == OutputFormat.text:
+        print(plan_report(removal_plan, impact))
+        return
+
+    json.dump(
+        {
+            "schema": OUTPUT_SCHEMA_VERSION,
+            "keep": package_type.value if package_type is not None else None,
+            **removal_plan.to_dict(),
+            "impact": impact.to_dict(),
+        },
+        sys.stdout,
+        indent=2,
+    )
+    sys.stdout.write("\n")
+
+
+def _path_priority(python: str) -> Optional[PathPriority]:
+    try:
+        return PathPriority(interpreter_sys_path(python))
+    except (OSError, CalledProcessError, ValueError) as e:
+        print(f"Error: can't get sys.path of {python}, imports won't be analyzed: {e}")
+        return None
+
+
+def _confirm(message: str, yes: bool) -> bool:
+    if yes:
+        return True
+
+    print(f"{message} [y/N]")
+    return input().lower() == "y"
 
 
 @entry_point.command("clean")
@@ -44,6 +167,13 @@ def entry_point(ctx: Context, system: bool) -> None:
     show_default=True,
     help="Keep python packages from this desired package manager.",
 )
+@click.option(
+    "--policy",
+    "policy_file",
+    type=click.Path(exists=True, dir_okay=False),
+    default=None,
+    help="TOML policy deciding which copy of each duplicate to keep, instead of package type.",
+)
 @click.option(
     "--auto-remove",
     is_flag=True,
@@ -57,12 +187,54 @@ def entry_point(ctx: Context, system: bool) -> None:
     default=False,
     help="Choose package duplicates to remove in the process and confirm deletion.",
 )
+@click.option(
+    "-y",
+    "--yes",
+    is_flag=True,
+    default=False,
+    help="Don't ask for any confirmation, for unattended runs.",
+)
+@click.option(
+    "--python",
+    default="python3",
+    show_default=True,
+    help="Interpreter whose sys.path decides which copy of a duplicate gets imported, "
+    "shown in interactive mode.",
+)
+@click.option(
+    "--native-uninstall",
+    is_flag=True,
+    default=False,
+    help="Uninstall pip packages by moving files from their RECORD to the trash instead of "
+    "running pip, it can be undone by pyclean undo.",
+)
+@click.option(
+    "--plan",
+    is_flag=True,
+    default=False,
+    help="Only show what would be removed, including rpm packages requiring the removed ones "
+    "and pip packages left with missing requirements, nothing is removed.",
+)
+@click.option(
+    "--format",
+    "output_format",
+    type=click.Choice([OutputFormat.text, OutputFormat.json]),
+    default=OutputFormat.text,
+    show_default=True,
+    help="Output format of the plan, only with --plan.",
+)
 @pass_context
 def clean(
     ctx: Context,
     package_type: Optional[PkgType],
+    policy_file: Optional[str],
     auto_remove: bool,
     interactive: bool,
+    yes: bool,
+    python: str,
+    native_uninstall: bool,
+    plan: bool,
+    output_format: str,
 ) -> None:
     """
     Remove duplicate packages that are present as pip and rpm package.
@@ -70,26 +242,62 @@ def clean(
     Or run in interactive mode, where you will choose clean type and confirm deletion on
     each package. Clean is not recommended for running for system clean, as manual
     inspection might be needed.
+
+    With a policy, which copy to keep is decided for each duplicate by its rules and all
+    of them are removed at once, with --yes without any prompt.
     """
+    if output_format != OutputFormat.text and not plan:
+        raise click.UsageError("--format applies only to the plan, use it with --plan.")
+
+    policy = None
+    if policy_file is not None:
+        if interactive or package_type is not None:
+            raise click.UsageError(
+                "Policy can't be combined with package type or interactive mode.",
+            )
+
+        try:
+            policy = Policy.load(Path(policy_file))
+        except ValueError as e:
+            raise click.BadParameter(str(e), param_hint="--policy") from e
+
     if interactive and (auto_remove or package_type is not None):
         print(
             "Interactive mode is enabled, auto-remove and package type options will be ignored.",
         )
 
-    if not interactive and package_type is None:
-        print("You have to specify package type when not running in interactive mode.")
+    if not interactive and package_type is None and policy is None:
+        print("You have to specify package type or policy when not running in interactive mode.")
         return
 
-    if ctx.obj.cleaner.system_clean:
-        print(
-            "System clean is enabled, this operation may remove system packages."
-            "Please make sure you know what you are doing."
-            "Do you want to continue? [y/N]",
-        )
-        if input().lower() != "y":
+    if plan:
+        if interactive:
+            print("Interactive clean can't be planned.")
             return
 
-    if package_type in [PkgType.pip, PkgType.pipx] and ctx.obj.cleaner.system_clean:
+        package_type = PkgType(package_type) if package_type is not None else None
+        _print_plan(
+            ctx.obj.cleaner,
+            package_type,
+            auto_remove,
+            policy,
+            OutputFormat(output_format),
+        )
+        return
+
+    if native_uninstall:
+        trash = ctx.obj.cleaner.enable_native_uninstall()
+        print(f"pip packages are moved to {trash.directory}, undo by: pyclean undo")
+
+    if ctx.obj.cleaner.system_clean and not _confirm(
+        "System clean is enabled, this operation may remove system packages."
+        "Please make sure you know what you are doing."
+        "Do you want to continue?",
+        yes,
+    ):
+        return
+
+    if package_type in [PkgType.pip, PkgType.pipx] and ctx.obj.cleaner.system_clean and not yes:
         print(
             "You are about to remove python packages, this operation may remove system packages "
             "this will probably require running this script as root, which is not recommended."
@@ -103,19 +311,36 @@ def clean(
         # to give them a chance to cancel :D
         time.sleep(3)
 
-    if package_type == PkgType.rpm:
-        print(
-            "You are about to remove rpm packages, this operation may remove system packages "
-            "and requires manual confirmation for removal or manual intervention."
-            "Do you want to continue? [y/N]",
-        )
-        if input().lower() != "y":
-            return
+    if (package_type == PkgType.rpm or policy is not None) and not _confirm(
+        "You are about to remove rpm packages, this operation may remove system packages "
+        "and requires manual confirmation for removal or manual intervention."
+        "Do you want to continue?",
+        yes,
+    ):
+        return
 
     if interactive:
-        ctx.obj.cleaner.interactive_clean()
+        ctx.obj.cleaner.interactive_clean(_path_priority(python))
     else:
-        ctx.obj.cleaner.clean(package_type, auto_remove, interactive)
+        package_type = PkgType(package_type) if package_type is not None else None
+        # dnf would ask for confirmation of its transaction otherwise
+        ctx.obj.cleaner.clean(package_type, auto_remove, policy, assume_yes=yes)
+
+    steps = ctx.obj.cleaner.removal_steps
+    if not steps:
+        return
+
+    for step in steps:
+        status = "done" if step.succeeded else f"failed: {step.error}"
+        print(f"Removal of {len(step.packages)} {step.pkg_type.name} packages {status}")
+        if step.rollback is not None:
+            print(f"  To install them back: {' '.join(step.rollback)}")
+
+    journal = write_journal(steps, default_cache_dir() / "removals")
+    print(f"Removal steps were recorded to {journal}")
+    if not all(step.succeeded for step in steps):
+        # unattended runs find out by the exit code
+        ctx.exit(1)
 
 
 @entry_point.command("show")
@@ -127,13 +352,199 @@ def clean(
     default=False,
     help="Show more details about package location.",
 )
+@click.option(
+    "--python",
+    default="python3",
+    show_default=True,
+    help="Interpreter whose sys.path decides which copy of a duplicate gets imported.",
+)
+@click.option(
+    "--root",
+    "roots",
+    multiple=True,
+    type=click.Path(exists=True, file_okay=False),
+    help="Scan this root directory, e.g. unpacked container image, offline instead of the "
+    "running system, can be repeated.",
+)
+@click.option(
+    "--report-dir",
+    type=click.Path(file_okay=False),
+    default=".",
+    show_default=True,
+    help="Directory to write one report per scanned root to.",
+)
+@click.option(
+    "-j",
+    "--jobs",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Number of roots scanned at once, number of CPUs by default.",
+)
+@click.option(
+    "--format",
+    "output_format",
+    type=click.Choice(OutputFormat.__members__),
+    default=OutputFormat.text,
+    show_default=True,
+    help="Output format, ndjson writes one duplicate per line as soon as it is found.",
+)
 @pass_context
-def show(ctx: Context, verbose: bool) -> None:
+def show(
+    ctx: Context,
+    verbose: bool,
+    python: str,
+    roots: tuple[str, ...],
+    report_dir: str,
+    jobs: Optional[int],
+    output_format: str,
+) -> None:
     """
     Show duplicite packages both as rpm and python packages.
+
+    Duplicates are shown as soon as they are found, a duplicate which gains another
+    provider later in the scan is shown again in full. With --root, the roots are scanned
+    in parallel and their duplicates are written to reports instead.
+
+    JSON and NDJSON outputs list files of the packages only with --verbose, progress and
+    errors go to stderr, so stdout can be parsed.
+    """
+    if roots:
+        cleaner = ctx.obj.cleaner
+        failed = False
+        for report in scan_roots(
+            roots,
+            report_dir,
+            system_clean=cleaner.system_clean,
+            rpm_backend=ctx.obj.rpm_backend,
+            use_cache=cleaner.cache is not None,
+            refresh_cache=cleaner.refresh_cache,
+            verbose=verbose,
+            output_format=OutputFormat(output_format),
+            jobs=jobs,
+        ):
+            if report.error is not None:
+                failed = True
+                print(f"Error: scan of {report.root} failed: {report.error}")
+                continue
+
+            print(f"{report.root}: {report.duplicates} duplicates, see {report.report_path}")
+            for pkg_type, error in report.errors.items():
+                print(f"Error: scan of {pkg_type} packages in {report.root} failed: {error}")
+
+        if failed:
+            # the reports of the other roots are written all the same
+            ctx.exit(1)
+
+        return
+
+    output = sys.stdout
+    # anything else than the duplicates, progress of package managers included, would
+    # break the machine-readable output
+    with redirect_stdout(sys.stderr) if output_format != OutputFormat.text else nullcontext():
+        path_priority = _path_priority(python)
+        write_duplicates(
+            output,
+            (
+                (
+                    key,
+                    pkg_name,
+                    dupe,
+                    analyze_imports(dupe, path_priority) if path_priority is not None else None,
+                )
+                for key, pkg_name, dupe in ctx.obj.cleaner.iter_package_duplicates()
+            ),
+            OutputFormat(output_format),
+            verbose,
+        )
+
+
+@entry_point.command("conflicts")
+@click.option(
+    "-v",
+    "--verbose",
+    is_flag=True,
+    show_default=True,
+    default=False,
+    help="Show the conflicting files.",
+)
+@pass_context
+def conflicts(ctx: Context, verbose: bool) -> None:
+    """
+    Show files owned by more than one package, e.g. rpm files overwritten by pip.
+    """
+    # packages which own the same files usually conflict in many of them
+    paths_by_owners: dict[tuple[int, ...], tuple[list[PackageInfo], list[str]]] = {}
+    for path, owners in ctx.obj.cleaner.get_file_conflicts().items():
+        key = tuple(id(owner) for owner in owners)
+        paths_by_owners.setdefault(key, (owners, []))[1].append(path)
+
+    for owners, paths in paths_by_owners.values():
+        print(conflict_table(owners, paths, verbose))
+
+
+@entry_point.command("verify")
+@click.option(
+    "-j",
+    "--jobs",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Number of processes hashing the files, at most 4 by default.",
+)
+@click.option(
+    "--max-in-flight",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Maximum number of hashing tasks queued at once, twice the jobs by default.",
+)
+@click.option(
+    "-v",
+    "--verbose",
+    is_flag=True,
+    show_default=True,
+    default=False,
+    help="Show the modified and missing files.",
+)
+@pass_context
+def verify(ctx: Context, jobs: Optional[int], max_in_flight: Optional[int], verbose: bool) -> None:
+    """
+    Check files of duplicite packages against digests from RECORD and rpm database.
+
+    It shows which installer's copy of the files is actually on the disk. Files are hashed
+    by low priority processes, so it is safe to run on busy machines.
+    """
+    verifications = ctx.obj.cleaner.verify_duplicates(jobs=jobs, max_in_flight=max_in_flight)
+    for pkg_name, package_verifications in verifications.items():
+        print(verify_table(pkg_name, package_verifications, verbose))
+
+
+@entry_point.command("undo")
+@click.argument("session", required=False)
+def undo(session: Optional[str]) -> None:
+    """
+    Restore pip packages uninstalled by clean --native-uninstall.
+
+    The last session is restored unless another one is given.
     """
-    for pkg_name, dupe in ctx.obj.cleaner.get_package_duplicates().items():
-        print(dupe_table(pkg_name, dupe, verbose))
+    try:
+        trash = (
+            latest_session()
+            if session is None
+            else TrashSession.load(default_trash_dir() / session)
+        )
+    except OSError as e:
+        print(f"Error: can't read trash session {session}: {e}")
+        return
+
+    if trash is None:
+        print("Nothing to undo.")
+        return
+
+    total = len(trash.moved)
+    conflicts = trash.restore()
+    for path in conflicts:
+        print(f"Error: can't restore {path}, something else is there now")
+
+    print(f"Restored {total - len(conflicts)} of {total} files of session {trash.session_id}")
 
 
 if __name__ == "__main__":
@@ -5,3 +5,26 @@ class PkgType(StrEnum):
     pip = "pip"
     rpm = "rpm"
     pipx = "pipx"
+
+
+class RpmBackend(StrEnum):
+    # spawn the rpm binary
+    cli = "cli"
+    # read the sqlite rpmdb directly
+    sqlite = "sqlite"
+
+
+class StepKind(StrEnum):
+    # the package manager runs the removal command
+    command = "command"
+    # pyclean moves files of the packages to the trash itself
+    native_uninstall = "native-uninstall"
+
+
+class OutputFormat(StrEnum):
+    # fixed-width tables for humans
+    text = "text"
+    # single JSON document once everything is scanned
+    json = "json"
+    # one JSON document per line, written as soon as a duplicate is found
+    ndjson = "ndjson"
@@ -1,18 +1,391 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING
+import json
+import os
+import re
+from collections.abc import Iterable, Iterator
+from typing import TYPE_CHECKING, Any, Optional, TextIO, Union
+
+from pyclean.constants import OutputFormat
 
 if TYPE_CHECKING:
     from pyclean.cleaner.cleaner import PackageInfo
+    from pyclean.cleaner.impact import DuplicateDetails, RemovalImpact
+    from pyclean.cleaner.removal import RemovalPlan
+    from pyclean.cleaner.shadowing import ImportAnalysis
+    from pyclean.cleaner.verify import PackageVerification
+
+# bump whenever a field of the JSON output is removed or changes its meaning
+OUTPUT_SCHEMA_VERSION = 1
+
+
+def canonicalize_name(name: str) -> str:
+    """
+    Normalize python distribution name as described in PEP 503.
+    """
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def stat_fingerprint(paths: Iterable[Union[str, os.PathLike]]) -> str:
+    """
+    Cheap fingerprint of files or directories based on their mtime and size.
+    """
+    parts = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            parts.append(f"{path}:missing")
+            continue
+
+        parts.append(f"{path}:{stat.st_mtime_ns}:{stat.st_size}")
+
+    return "\n".join(parts)
+
+
+def root_path(root: str, path: str) -> str:
+    """
+    Get path on this machine of an absolute path inside the root directory, e.g. of
+    an unpacked container image.
+    """
+    if root == "/":
+        return path
+
+    return os.path.join(root, path.lstrip("/"))
+
+
+def iter_dupe_table(
+    name: str,
+    package_dupes: list[PackageInfo],
+    verbose: bool = False,
+    imports: Optional[ImportAnalysis] = None,
+) -> Iterator[str]:
+    """
+    Stream lines of a table with duplicite packages, see `dupe_table`.
+    """
+    table_delimiter = "    | " + "-" * 124 + " |"
+    main_delimiter = "=" * 132
+    yield main_delimiter
+    yield ""
+    yield f" Name: {name}"
+    yield " Duplicities found:"
+    yield "    | {:<46} {:<20} {:<15} {:<15} {:<15} {:<8} |".format(
+        "Location",
+        "Package full name",
+        "Version",
+        "Installer",
+        "Files count",
+        "Imported",
+    )
+    yield table_delimiter
+    for i, dupe in enumerate(package_dupes):
+        installer_type = dupe.pkg_type.name if dupe.pkg_type else "unknown"
+        imported = imports.status(i) if imports is not None else "-"
+        yield (
+            f" {i + 1}. | {dupe.location: <46} {dupe.package_name: <20} {dupe.version: <15} "
+            f"{installer_type: <15} {len(dupe.files): <15} {imported: <8} |"
+        )
+        if not verbose:
+            continue
+
+        if dupe.interpreter is not None:
+            yield f"  | {f'Interpreter: {dupe.interpreter}':<121} |"
+
+        if imports is not None and imports.names[i]:
+            import_names = ", ".join(sorted(imports.names[i]))
+            yield f"  | {f'Import names: {import_names}':<121} |"
+
+        yield "  | Files:" + " " * 115 + " |"
+        for file in dupe.files:
+            yield f"  |   {file:<119} |"
+
+        yield table_delimiter
+
+    yield ""
+    yield main_delimiter
 
 
 def dupe_table(
     name: str,
     package_dupes: list[PackageInfo],
     verbose: bool = False,
+    imports: Optional[ImportAnalysis] = None,
 ) -> str:
     """
     Create a table with duplicite packages.
+
+    Args:
+        name: Name of the duplicite package.
+        package_dupes: Packages providing the name.
+        verbose: Whether to list files of the packages.
+        imports: Which of the copies python imports, see `analyze_imports`.
+    """
+    return "\n".join(iter_dupe_table(name, package_dupes, verbose, imports))
+
+
+def iter_impact_notes(details: DuplicateDetails) -> Iterator[str]:
+    """
+    Stream what else removal of each copy of the duplicate removes or breaks.
+    """
+    if not details.impacts:
+        yield " What else removal of the packages removes is not known."
+        return
+
+    for i, impact in enumerate(details.impacts):
+        if impact.rpm_dependents:
+            dependents = ", ".join(sorted(impact.rpm_dependents))
+            yield f" Removal of {i + 1}. removes also rpm packages requiring it: {dependents}"
+
+        unneeded = details.auto_remove_impacts[i].rpm_unneeded
+        if unneeded:
+            yield (
+                f" Removal of {i + 1}. with auto-remove may remove also rpm packages nothing "
+                f"else requires: {', '.join(unneeded)}"
+            )
+
+        unknown = details.auto_remove_impacts[i].rpm_unknown
+        if unknown:
+            yield (
+                f" Removal of {i + 1}. may remove also rpm packages with rich dependencies, "
+                f"only dnf can tell: {', '.join(sorted(unknown))}"
+            )
+
+        if impact.pip_broken:
+            broken = ", ".join(sorted(impact.pip_broken))
+            yield f" Removal of {i + 1}. leaves pip packages with missing requirements: {broken}"
+
+
+def iter_removal_notes(package: PackageInfo, impact: RemovalImpact) -> Iterator[str]:
+    """
+    Stream everything removal of the package removes, together with what its package
+    manager removes along, and what it breaks.
+    """
+    removed = [package.package_name, *sorted(impact.rpm_dependents), *impact.rpm_unneeded]
+    pkg_type = package.pkg_type.name if package.pkg_type else "unknown"
+    yield f" {len(removed)} {pkg_type} packages will be removed: {', '.join(removed)}"
+    if impact.rpm_unknown:
+        yield (
+            " dnf may remove also rpm packages with rich dependencies, it asks for confirmation "
+            f"itself: {', '.join(sorted(impact.rpm_unknown))}"
+        )
+
+    if impact.pip_broken:
+        broken = ", ".join(sorted(impact.pip_broken))
+        yield f" pip packages left with missing requirements: {broken}"
+
+
+def package_record(
+    package: PackageInfo,
+    with_files: bool = False,
+    imported: Optional[str] = None,
+) -> dict[str, Any]:
+    """
+    Describe the package for the JSON output.
+
+    Args:
+        package: The package.
+        with_files: Whether to list files of the package.
+        imported: Whether python imports this copy, see `ImportAnalysis.status`.
+    """
+    record: dict[str, Any] = {
+        "manager": package.pkg_type.value if package.pkg_type else None,
+        "name": package.name,
+        "package_name": package.package_name,
+        "version": package.version,
+        "location": package.location,
+        "interpreter": package.interpreter,
+        "file_count": len(package.files),
+        "imported": imported,
+    }
+    if with_files:
+        record["files"] = list(package.files)
+
+    return record
+
+
+def dupe_record(
+    key: str,
+    name: str,
+    package_dupes: list[PackageInfo],
+    with_files: bool = False,
+    imports: Optional[ImportAnalysis] = None,
+) -> dict[str, Any]:
+    """
+    Describe the duplicate for the JSON output, the JSON counterpart of `dupe_table`.
+
+    Args:
+        key: Normalized name, it identifies the duplicate even if its name changes when
+            it shows up again.
+        name: Name of the first package of the duplicate.
+        package_dupes: Packages providing the name.
+        with_files: Whether to list files of the packages.
+        imports: Which of the copies python imports, see `analyze_imports`.
+    """
+    return {
+        "schema": OUTPUT_SCHEMA_VERSION,
+        "key": key,
+        "name": name,
+        "packages": [
+            package_record(
+                package,
+                with_files,
+                imports.status(i) if imports is not None else None,
+            )
+            for i, package in enumerate(package_dupes)
+        ],
+    }
+
+
+def write_duplicates(
+    file: TextIO,
+    duplicates: Iterable[tuple[str, str, list[PackageInfo], Optional[ImportAnalysis]]],
+    output_format: OutputFormat = OutputFormat.text,
+    verbose: bool = False,
+) -> None:
+    """
+    Write duplicates in the output format as they come.
+
+    Duplicates may come more than once, when they gain another provider later in the scan.
+    Text and NDJSON outputs show them again, the later one supersedes the earlier one with
+    the same `key`, JSON output keeps just the last one.
+
+    Args:
+        file: Where to write to.
+        duplicates: Normalized name, name, packages and import analysis, if any, of each
+            duplicate.
+        output_format: The output format.
+        verbose: Whether to list files of the packages.
+    """
+    if output_format == OutputFormat.json:
+        records = {
+            key: dupe_record(key, name, dupes, verbose, imports)
+            for key, name, dupes, imports in duplicates
+        }
+        json.dump({"schema": OUTPUT_SCHEMA_VERSION, "duplicates": list(records.values())}, file)
+        file.write("\n")
+        return
+
+    for key, name, dupes, imports in duplicates:
+        if output_format == OutputFormat.ndjson:
+            file.write(json.dumps(dupe_record(key, name, dupes, verbose, imports)) + "\n")
+        else:
+            for line in iter_dupe_table(name, dupes, verbose, imports):
+                file.write(line + "\n")
+
+        # whoever reads the output sees the duplicate right away
+        file.flush()
+
+
+def plan_report(plan: RemovalPlan, impact: RemovalImpact) -> str:
+    """
+    Describe what clean would remove and what else would be removed or broken by that.
+    """
+    main_delimiter = "=" * 132
+    lines = [main_delimiter, ""]
+    if not plan.packages:
+        lines.append(" Nothing to remove.")
+
+    if plan.skipped:
+        lines.append(
+            f" Skip {len(plan.skipped)} packages, it is not known which package manager "
+            "installed them:",
+        )
+        lines.extend(
+            f"   {package.package_name} {package.version} ({package.location})"
+            for package in plan.skipped
+        )
+
+    for pkg_type, packages in plan.packages.items():
+        lines.append(f" Remove {len(packages)} {pkg_type.name} packages:")
+        lines.extend(
+            f"   {package.package_name} {package.version} ({package.location})"
+            for package in packages
+        )
+
+    if impact.rpm_dependents:
+        lines.append(f" dnf removes also {len(impact.rpm_dependents)} rpm packages requiring them:")
+        lines.extend(
+            f"   {package} (requires {', '.join(requires)})"
+            for package, requires in sorted(impact.rpm_dependents.items())
+        )
+
+    if impact.rpm_unneeded:
+        lines.append(
+            f" dnf may remove also {len(impact.rpm_unneeded)} rpm packages nothing else requires, "
+            "if they were installed as dependencies:",
+        )
+        lines.extend(f"   {package}" for package in impact.rpm_unneeded)
+
+    if impact.rpm_unknown:
+        lines.append(
+            f" It is not known whether dnf removes also {len(impact.rpm_unknown)} rpm packages "
+            "with rich dependencies, only dnf can resolve them:",
+        )
+        lines.extend(
+            f"   {package} (requires {', '.join(requires)})"
+            for package, requires in sorted(impact.rpm_unknown.items())
+        )
+
+    if impact.pip_broken:
+        lines.append(f" {len(impact.pip_broken)} pip packages would miss their requirements:")
+        lines.extend(
+            f"   {package} (requires {', '.join(requires)})"
+            for package, requires in sorted(impact.pip_broken.items())
+        )
+
+    lines.append("")
+    lines.append(main_delimiter)
+    return "\n".join(lines)
+
+
+def conflict_table(
+    owners: list[PackageInfo],
+    paths: list[str],
+    verbose: bool = False,
+) -> str:
+    """
+    Create a table with packages which own the same files.
+    """
+    table_delimiter = "    | " + "-" * 124 + " |"
+    main_delimiter = "=" * 132
+    table = [
+        main_delimiter,
+        "",
+        f" Conflicting files: {len(paths)}",
+        " Owned by:",
+        "    | {:<55} {:<20} {:<15} {:<31} |".format(
+            "Location",
+            "Package full name",
+            "Version",
+            "Installer",
+        ),
+        table_delimiter,
+    ]
+    for i, owner in enumerate(owners):
+        installer_type = owner.pkg_type.name if owner.pkg_type else "unknown"
+        table.append(
+            f" {i + 1}. | {owner.location!s: <55} {owner.package_name: <20} "
+            f"{owner.version: <15} {installer_type: <31} |",
+        )
+
+    if verbose:
+        table.append(table_delimiter)
+        table.append("  | Files:" + " " * 115 + " |")
+        for path in paths:
+            table.append(f"  |   {path:<119} |")
+
+    table.append("")
+    table.append(main_delimiter)
+    return "\n".join(table)
+
+
+def verify_table(
+    name: str,
+    verifications: list[PackageVerification],
+    verbose: bool = False,
+) -> str:
+    """
+    Create a table with results of verification of duplicite packages files.
     """
     table_delimiter = "    | " + "-" * 124 + " |"
     main_delimiter = "=" * 132
@@ -20,28 +393,40 @@ def dupe_table(
         main_delimiter,
         "",
         f" Name: {name}",
-        " Duplicities found:",
-        "    | {:<55} {:<20} {:<15} {:<15} {:<15} |".format(
+        " Files on disk:",
+        "    | {:<47} {:<20} {:<15} {:<10} {:<10} {:<9} {:<9} |".format(
             "Location",
             "Package full name",
             "Version",
             "Installer",
-            "Files count",
+            "Verified",
+            "Modified",
+            "Missing",
         ),
         table_delimiter,
     ]
-    for i, dupe in enumerate(package_dupes):
-        installer_type = dupe.pkg_type.name if dupe.pkg_type else "unknown"
+    for i, verification in enumerate(verifications):
+        pkg = verification.package
+        installer_type = pkg.pkg_type.name if pkg.pkg_type else "unknown"
         table.append(
-            f" {i + 1}. | {dupe.location: <55} {dupe.package_name: <20} {dupe.version: <15} "
-            f"{installer_type: <15} {len(dupe.files): <15} |",
+            f" {i + 1}. | {pkg.location!s: <47} {pkg.package_name: <20} {pkg.version: <15} "
+            f"{installer_type: <10} {verification.verified: <10} "
+            f"{len(verification.modified): <9} {len(verification.missing): <9} |",
         )
         if not verbose:
             continue
 
-        table.append("  | Files:" + " " * 115 + " |")
-        for file in dupe.files:
-            table.append(f"  |   {file:<119} |")
+        for path, owner in verification.modified.items():
+            if owner is None:
+                copy_of = "unknown"
+            else:
+                owner_type = owner.pkg_type.name if owner.pkg_type else "unknown"
+                copy_of = f"{owner_type} {owner.package_name} {owner.version}"
+
+            table.append(f"  |   {f'{path} (copy of: {copy_of})':<119} |")
+
+        for path in verification.missing:
+            table.append(f"  |   {f'{path} (missing)':<119} |")
 
         table.append(table_delimiter)
 
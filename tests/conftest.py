@@ -64,6 +64,28 @@ package_b_pipx = PackageInfo(
 )
 
 
+def install_dist(site_packages, name, version, installer=None, record=True):
+    """
+    Create minimal *.dist-info directory of a distribution in the site-packages.
+    """
+    dist_info = site_packages / f"{name}-{version}.dist-info"
+    dist_info.mkdir(parents=True)
+    (dist_info / "METADATA").write_text(
+        f"Metadata-Version: 2.1\nName: {name}\nVersion: {version}\n\nName: not a header\n",
+    )
+    if installer is not None:
+        (dist_info / "INSTALLER").write_text(f"{installer}\n")
+
+    if record:
+        (dist_info / "RECORD").write_text(
+            f"{name}/__init__.py,sha256=abc,10\n"
+            f'"{name}/with,comma.py",sha256=def,20\n'
+            f"{name}-{version}.dist-info/RECORD,,\n",
+        )
+
+    return dist_info
+
+
 @pytest.fixture
 def user_cleaner():
     return Cleaner(system_clean=False)
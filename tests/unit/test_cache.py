@@ -0,0 +1,74 @@
+from unittest.mock import patch
+
+from pyclean.cleaner.cache import ScanCache
+from pyclean.cleaner.cleaner import Cleaner
+from pyclean.cleaner.package_managers.base import ScanSnapshot
+from pyclean.cleaner.package_managers.pip import Pip
+from pyclean.cleaner.package_managers.pipx import Pipx
+from pyclean.cleaner.package_managers.rpm import Rpm
+from tests.conftest import package_a_pip, package_a_rpm, package_b_pip
+
+
+def test_store_and_load(tmp_path):
+    cache = ScanCache(tmp_path)
+    snapshot = ScanSnapshot(
+        stamps={"a": "1", "b": "2", "c": "3"},
+        packages={"a": [package_a_pip], "b": [package_b_pip], "c": []},
+    )
+    cache.store("pip-False", "fingerprint", snapshot)
+
+    entry = cache.load("pip-False")
+    assert entry.fingerprint == "fingerprint"
+    assert entry.snapshot == snapshot
+    assert cache.load("rpm-False") is None
+
+
+def test_evict(tmp_path):
+    cache = ScanCache(tmp_path)
+    cache.store("old", "fingerprint", ScanSnapshot.from_packages([package_a_rpm]))
+    entry_size = next(tmp_path.glob("*.json")).stat().st_size
+    cache.max_size = entry_size + 1
+    cache.store("new", "fingerprint", ScanSnapshot.from_packages([package_a_rpm]))
+
+    assert cache.load("old") is None
+    assert cache.load("new").snapshot.all_packages() == [package_a_rpm]
+
+
+@patch.object(Pipx, "iter_python_packages", return_value=[])
+@patch.object(Pip, "iter_python_packages", return_value=[package_a_pip])
+@patch.object(Rpm, "iter_python_packages", return_value=[package_a_rpm])
+@patch.object(Pipx, "fingerprint", return_value=None)
+@patch.object(Pip, "fingerprint", return_value="pip")
+@patch.object(Rpm, "fingerprint", return_value="rpm")
+def test_cleaner_uses_cache(_, __, ___, mock_rpm, mock_pip, mock_pipx, tmp_path):
+    cleaner = Cleaner(system_clean=False, cache=ScanCache(tmp_path))
+    expected = {"package_a": [package_a_rpm, package_a_pip]}
+    assert cleaner.get_package_duplicates() == expected
+    assert cleaner.get_package_duplicates() == expected
+
+    assert mock_rpm.call_count == 1
+    assert mock_pip.call_count == 1
+    # no fingerprint, can't be cached
+    assert mock_pipx.call_count == 2
+
+    cleaner.refresh_cache = True
+    assert cleaner.get_package_duplicates() == expected
+    assert mock_rpm.call_count == 2
+
+
+def test_stale_cache_entry_seeds_incremental_scan(tmp_path):
+    cache = ScanCache(tmp_path)
+    snapshot = ScanSnapshot(stamps={"a": "1"}, packages={"a": [package_a_pip]})
+    pip = Pip(system_clean=False)
+    cache.store(pip.cache_key(), "old fingerprint", snapshot)
+    cleaner = Cleaner(system_clean=False, cache=cache)
+
+    with (
+        patch.object(Pip, "fingerprint", return_value="new fingerprint"),
+        patch.object(Pip, "iter_python_packages", return_value=[package_a_pip]),
+    ):
+        list(cleaner._iter_python_packages(pip))
+
+    # the package manager reprocesses only what changed since the cached scan
+    assert pip.snapshot == snapshot
+    assert cache.load(pip.cache_key()).fingerprint == "new fingerprint"
@@ -1,3 +1,5 @@
+import sys
+from threading import Event
 from unittest.mock import MagicMock, patch
 
 import pytest
@@ -6,6 +8,7 @@ from pyclean.cleaner.package_managers.base import PackageInfo
 from pyclean.cleaner.package_managers.pip import Pip
 from pyclean.cleaner.package_managers.pipx import Pipx
 from pyclean.cleaner.package_managers.rpm import Rpm
+from pyclean.cleaner.package_managers.rpmdb import RpmHeader
 from pyclean.constants import PkgType
 from tests.conftest import (
     package_a_pip,
@@ -73,9 +76,9 @@ from tests.conftest import (
         ),
     ],
 )
-@patch.object(Rpm, "get_python_packages")
-@patch.object(Pip, "get_python_packages")
-@patch.object(Pipx, "get_python_packages")
+@patch.object(Rpm, "iter_python_packages")
+@patch.object(Pip, "iter_python_packages")
+@patch.object(Pipx, "iter_python_packages")
 def test_get_package_duplicates(
     mock_pipx,
     mock_pip,
@@ -95,11 +98,11 @@ def test_get_package_duplicates(
     assert duplicates == expected
 
 
-@patch.object(Rpm, "get_python_packages")
+@patch.object(Rpm, "iter_python_packages")
 @patch.object(Rpm, "remove_python_packages")
-@patch.object(Pip, "get_python_packages")
-@patch.object(Pip, "remove_python_packages")
-@patch.object(Pipx, "get_python_packages")
+@patch.object(Pip, "iter_python_packages")
+@patch("pyclean.cleaner.package_managers.pip.run")
+@patch.object(Pipx, "iter_python_packages")
 @patch.object(Pipx, "remove_python_packages")
 def test_clean(
     mock_pipx_remove,
@@ -119,17 +122,26 @@ def test_clean(
     mock_pipx_remove.return_value = MagicMock()
 
     user_cleaner.clean(PkgType.rpm, False)
-    mock_rpm_remove.assert_called_once_with({package_a_rpm.package_name}, False)
-    mock_pip_remove.assert_not_called()
-    mock_pipx_remove.assert_not_called()
+    # rpm is the package manager to keep, duplicates are removed from the others
+    mock_rpm_remove.assert_not_called()
+    mock_pip_remove.assert_called_once_with(
+        [sys.executable, "-m", "pip", "uninstall", "--yes", package_a_pip.package_name],
+        check=True,
+    )
+    mock_pipx_remove.assert_called_once_with({package_a_pipx.package_name}, False, False)
+    # the system is scanned once, afterwards only the changed package managers
+    assert mock_rpm_get.call_count == 1
+    assert mock_pip_get.call_count == 2
+    assert mock_pipx_get.call_count == 2
 
 
 @patch("builtins.input", side_effect=["2", "y", "y"])
-@patch.object(Rpm, "get_python_packages")
+@patch.object(Pip, "iter_distributions", return_value=[])
+@patch.object(Rpm, "iter_python_packages")
 @patch.object(Rpm, "remove_python_packages")
-@patch.object(Pip, "get_python_packages")
-@patch.object(Pip, "remove_python_packages")
-@patch.object(Pipx, "get_python_packages")
+@patch.object(Pip, "iter_python_packages")
+@patch("pyclean.cleaner.package_managers.pip.run")
+@patch.object(Pipx, "iter_python_packages")
 @patch.object(Pipx, "remove_python_packages")
 def test_clean_interactive(
     mock_pipx_remove,
@@ -138,6 +150,7 @@ def test_clean_interactive(
     mock_pip_get,
     mock_rpm_remove,
     mock_rpm_get,
+    mock_distributions,
     mock_input,
     user_cleaner,
 ):
@@ -153,5 +166,172 @@ def test_clean_interactive(
 
     mock_rpm_remove.assert_not_called()
     # pip is second in the package_manager list so this should be second package
-    mock_pip_remove.assert_called_once_with({package_a_pip.package_name}, True)
+    mock_pip_remove.assert_called_once_with(
+        [sys.executable, "-m", "pip", "uninstall", "--yes", package_a_pip.package_name],
+        check=True,
+    )
     mock_pipx_remove.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    "headers, assume_yes",
+    [
+        pytest.param([], True, id="impact shown"),
+        pytest.param(RuntimeError("rpm database is locked"), False, id="impact unknown"),
+        pytest.param(
+            [
+                RpmHeader(name="python3-package_a", version="1.0", provides=["python3dist(a)"]),
+                RpmHeader(name="tool", version="1.0", requires=["(python3dist(a) or b)"]),
+            ],
+            False,
+            id="rich dependency",
+        ),
+    ],
+)
+@patch("builtins.input", side_effect=["1", "y", "y"])
+@patch.object(Pip, "iter_distributions", return_value=[])
+@patch.object(Rpm, "iter_dependency_headers")
+@patch.object(Rpm, "authorize")
+@patch.object(Rpm, "iter_python_packages", return_value=[package_a_rpm])
+@patch.object(Rpm, "remove_python_packages")
+@patch.object(Pip, "iter_python_packages", return_value=[package_a_pip])
+@patch.object(Pipx, "iter_python_packages", return_value=[])
+def test_clean_interactive_rpm(
+    mock_pipx_get,
+    mock_pip_get,
+    mock_rpm_remove,
+    mock_rpm_get,
+    mock_authorize,
+    mock_headers,
+    mock_distributions,
+    mock_input,
+    headers,
+    assume_yes,
+    user_cleaner,
+):
+    mock_headers.side_effect = headers if isinstance(headers, Exception) else lambda: iter(headers)
+
+    user_cleaner.interactive_clean()
+
+    # dnf asks itself, in the foreground, unless the user has seen everything it removes
+    mock_rpm_remove.assert_called_once_with({package_a_rpm.package_name}, True, assume_yes)
+    assert mock_authorize.called == assume_yes
+
+
+@patch("builtins.input", side_effect=["1", "n", "y", "1", "n", "y"])
+@patch.object(Pip, "iter_distributions", return_value=[])
+@patch.object(Rpm, "iter_dependency_headers")
+@patch.object(Rpm, "authorize")
+@patch.object(Rpm, "iter_python_packages", return_value=[package_a_rpm, package_b_rpm])
+@patch.object(Rpm, "remove_python_packages")
+@patch.object(Pip, "iter_python_packages", return_value=[package_a_pip, package_b_pip])
+@patch.object(Pipx, "iter_python_packages", return_value=[])
+def test_clean_interactive_impact_of_queued_removals(
+    mock_pipx_get,
+    mock_pip_get,
+    mock_rpm_remove,
+    mock_rpm_get,
+    mock_authorize,
+    mock_headers,
+    mock_distributions,
+    mock_input,
+    user_cleaner,
+    capsys,
+):
+    # tool needs just one of the packages, it goes with the second removal
+    mock_headers.side_effect = lambda: iter(
+        [
+            RpmHeader(name="python3-package_a", version="1.0", provides=["cap"]),
+            RpmHeader(name="python3-package_b", version="1.0", provides=["cap"]),
+            RpmHeader(name="tool", version="1.0", requires=["cap"]),
+        ],
+    )
+
+    user_cleaner.interactive_clean()
+
+    out = capsys.readouterr().out
+    assert " 1 rpm packages will be removed: python3-package_a\n" in out
+    assert " 2 rpm packages will be removed: python3-package_b, tool\n" in out
+
+
+@patch.object(Rpm, "iter_python_packages")
+@patch.object(Pip, "iter_python_packages")
+@patch.object(Pipx, "iter_python_packages")
+def test_get_package_duplicates_failing_manager(mock_pipx, mock_pip, mock_rpm, user_cleaner):
+    mock_rpm.side_effect = RuntimeError("rpm query failed")
+    mock_pip.return_value = [package_a_pip]
+    mock_pipx.return_value = [package_a_pipx]
+
+    duplicates = user_cleaner.get_package_duplicates()
+
+    assert duplicates == {"package_a": [package_a_pip, package_a_pipx]}
+    assert list(user_cleaner.scan_errors) == [PkgType.rpm]
+
+
+@patch.object(Rpm, "iter_python_packages")
+@patch.object(Pip, "iter_python_packages")
+@patch.object(Pipx, "iter_python_packages")
+def test_iter_package_duplicates_streams(mock_pipx, mock_pip, mock_rpm, user_cleaner):
+    rpm_done = Event()
+
+    def slow_rpm_packages():
+        yield package_a_rpm
+        # the rest of the rpm database takes a while
+        assert rpm_done.wait(timeout=10)
+        yield package_b_rpm
+
+    def slow_pipx_packages():
+        assert rpm_done.wait(timeout=10)
+        yield package_a_pipx
+
+    mock_rpm.side_effect = slow_rpm_packages
+    mock_pip.return_value = [package_a_pip, package_b_pip]
+    mock_pipx.side_effect = slow_pipx_packages
+
+    duplicates = user_cleaner.iter_package_duplicates()
+    # the second provider is enough, rpm is still scanning
+    assert next(duplicates) == ("package-a", "package_a", [package_a_rpm, package_a_pip])
+    rpm_done.set()
+
+    assert sorted(duplicates, key=lambda duplicate: len(duplicate[2])) == [
+        ("package-b", "package_b", [package_b_rpm, package_b_pip]),
+        # yielded again once all of its providers are known
+        ("package-a", "package_a", [package_a_rpm, package_a_pip, package_a_pipx]),
+    ]
+
+
+@patch.object(Rpm, "iter_python_packages")
+@patch.object(Rpm, "remove_python_packages")
+@patch.object(Pip, "iter_python_packages")
+@patch("pyclean.cleaner.package_managers.pip.run")
+@patch.object(Pipx, "iter_python_packages")
+@patch.object(Pipx, "remove_python_packages")
+def test_clean_interactive_removes_in_background(
+    mock_pipx_remove,
+    mock_pipx_get,
+    mock_pip_remove,
+    mock_pip_get,
+    mock_rpm_remove,
+    mock_rpm_get,
+    user_cleaner,
+):
+    mock_rpm_get.return_value = [package_a_rpm, package_b_rpm]
+    mock_pip_get.return_value = [package_a_pip, package_b_pip]
+    mock_pipx_get.return_value = []
+    next_question = Event()
+    # removal of package_a can finish only once the user is asked about package_b
+    mock_pip_remove.side_effect = lambda *_, **__: next_question.wait(timeout=10) or 1 / 0
+    answers = iter(["2", "n", "y", "2", "n", "y"])
+
+    def answer(*_):
+        if mock_pip_remove.called:
+            next_question.set()
+
+        return next(answers)
+
+    with patch("builtins.input", side_effect=answer):
+        user_cleaner.interactive_clean()
+
+    assert mock_pip_remove.call_count == 2
+    assert [step.succeeded for step in user_cleaner.removal_steps] == [True, True]
+    mock_rpm_remove.assert_not_called()
@@ -0,0 +1,63 @@
+from unittest.mock import patch
+
+from pyclean.cleaner.conflicts import FileOwnershipIndex, iter_absolute_files
+from pyclean.cleaner.package_managers.base import PackageInfo
+from pyclean.cleaner.package_managers.pip import Pip
+from pyclean.cleaner.package_managers.pipx import Pipx
+from pyclean.cleaner.package_managers.rpm import Rpm
+from pyclean.constants import PkgType
+
+SITE_PACKAGES = "/usr/lib/python3.12/site-packages"
+
+yaml_rpm = PackageInfo(
+    name="PyYAML",
+    package_name="python3-pyyaml",
+    version="6.0.1",
+    location=f"{SITE_PACKAGES}/yaml",
+    files=[f"{SITE_PACKAGES}/yaml", f"{SITE_PACKAGES}/yaml/__init__.py"],
+    pkg_type=PkgType.rpm,
+)
+
+yaml_pip = PackageInfo(
+    name="PyYAML",
+    package_name="PyYAML",
+    version="6.0.2",
+    location=SITE_PACKAGES,
+    files=["yaml/__init__.py", "yaml/__init__.py", "PyYAML-6.0.2.dist-info/RECORD"],
+    pkg_type=PkgType.pip,
+)
+
+other_rpm = PackageInfo(
+    name="yaml-extras",
+    package_name="python3-yaml-extras",
+    version="1.0",
+    location=f"{SITE_PACKAGES}/yaml",
+    files=[f"{SITE_PACKAGES}/yaml", f"{SITE_PACKAGES}/yaml/extras.py"],
+    pkg_type=PkgType.rpm,
+)
+
+
+def test_iter_absolute_files():
+    assert list(iter_absolute_files(yaml_pip)) == [
+        f"{SITE_PACKAGES}/yaml/__init__.py",
+        f"{SITE_PACKAGES}/yaml/__init__.py",
+        f"{SITE_PACKAGES}/PyYAML-6.0.2.dist-info/RECORD",
+    ]
+    assert list(iter_absolute_files(yaml_rpm)) == list(yaml_rpm.files)
+
+
+def test_conflicts():
+    index = FileOwnershipIndex([yaml_rpm, other_rpm, yaml_pip])
+
+    # the directory is shared only by rpm packages, which is fine
+    assert index.conflicts() == {f"{SITE_PACKAGES}/yaml/__init__.py": [yaml_rpm, yaml_pip]}
+    assert index.owners(f"{SITE_PACKAGES}/yaml/") == [yaml_rpm, other_rpm]
+
+
+@patch.object(Rpm, "iter_python_packages", return_value=[yaml_rpm])
+@patch.object(Pip, "iter_python_packages", return_value=[yaml_pip])
+@patch.object(Pipx, "iter_python_packages", return_value=[])
+def test_get_file_conflicts(_, __, ___, user_cleaner):
+    assert user_cleaner.get_file_conflicts() == {
+        f"{SITE_PACKAGES}/yaml/__init__.py": [yaml_rpm, yaml_pip],
+    }
@@ -0,0 +1,85 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from pyclean.cleaner.package_managers.base import PackageInfo
+from pyclean.cleaner.package_managers.dist_info import scan_site_packages
+from pyclean.cleaner.package_managers.pip import Pip
+from pyclean.cleaner.package_managers.rpm import RpmIndex
+from pyclean.constants import PkgType
+from tests.conftest import install_dist
+
+
+@pytest.fixture
+def site_packages(tmp_path):
+    path = tmp_path / "site-packages"
+    install_dist(path, "requests", "2.31.0", installer="pip")
+    install_dist(path, "six", "1.16.0", installer="rpm")
+    install_dist(path, "norecord", "1.0", installer="pip", record=False)
+    (path / "requests").mkdir()
+    return path
+
+
+def test_scan_site_packages(site_packages, tmp_path):
+    dists = sorted(
+        scan_site_packages([str(site_packages), str(site_packages), str(tmp_path / "missing")]),
+        key=lambda dist: dist.name,
+    )
+    assert [(dist.name, dist.version, dist.installer) for dist in dists] == [
+        ("norecord", "1.0", "pip"),
+        ("requests", "2.31.0", "pip"),
+        ("six", "1.16.0", "rpm"),
+    ]
+    assert dists[1].location == str(site_packages)
+    assert dists[1].files == [
+        "requests/__init__.py",
+        "requests/with,comma.py",
+        "requests-2.31.0.dist-info/RECORD",
+    ]
+
+
+def test_pip_get_python_packages(site_packages):
+    with patch("site.USER_SITE", str(site_packages)):
+        packages = Pip(system_clean=False).get_python_packages()
+
+    assert [(pkg.name, pkg.version, pkg.pkg_type) for pkg in packages] == [
+        ("requests", "2.31.0", PkgType.pip),
+    ]
+
+
+def test_pip_skips_packages_owned_by_rpm(site_packages):
+    dist_info = install_dist(site_packages, "urllib3", "2.0.7")
+    rpm = MagicMock()
+    rpm.fingerprint.return_value = "rpmdb"
+    rpm.index.return_value = RpmIndex(
+        headers=[],
+        python_packages=[
+            PackageInfo(
+                name="urllib3",
+                package_name="python3-urllib3",
+                version="2.0.7",
+                location=str(site_packages),
+                files=[str(dist_info)],
+                pkg_type=PkgType.rpm,
+            ),
+        ],
+    )
+    with patch("site.USER_SITE", str(site_packages)):
+        packages = Pip(system_clean=False, rpm=rpm).get_python_packages()
+
+    assert [pkg.name for pkg in packages] == ["requests"]
+    rpm.index.assert_called_once()
+
+
+def test_pip_rescan_processes_only_changed_dists(site_packages):
+    pip = Pip(system_clean=False)
+    with patch("site.USER_SITE", str(site_packages)):
+        before = pip.get_python_packages()
+        install_dist(site_packages, "urllib3", "2.0.7", installer="pip")
+        with patch.object(Pip, "_process_pip_package", wraps=pip._process_pip_package) as mock:
+            after = pip.get_python_packages()
+
+    assert [call.args[0].name for call in mock.call_args_list] == ["urllib3"]
+    assert sorted(pkg.name for pkg in after) == ["requests", "urllib3"]
+    # unchanged distribution is reused from the previous scan as is
+    assert any(pkg is before[0] for pkg in after)
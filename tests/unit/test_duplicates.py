@@ -0,0 +1,58 @@
+from dataclasses import replace
+
+from pyclean.cleaner.duplicates import DuplicateIndex
+from pyclean.constants import PkgType
+from tests.conftest import package_a_pip, package_a_rpm, package_b_pip, package_b_rpm
+
+ORDER = {PkgType.rpm: 0, PkgType.pip: 1, PkgType.pipx: 2}
+
+
+def _order(package):
+    return ORDER[package.pkg_type]
+
+
+def test_duplicates():
+    index = DuplicateIndex()
+    index.replace([], [package_a_pip, package_b_pip])
+    index.replace([], [package_a_rpm])
+
+    assert index.duplicates(_order) == {"package_a": [package_a_rpm, package_a_pip]}
+
+
+def test_replace_updates_only_changed_groups():
+    index = DuplicateIndex()
+    pip_packages = [package_a_pip, package_b_pip]
+    index.replace([], [package_a_rpm, package_b_rpm])
+    index.replace([], pip_packages)
+
+    upgraded_b = replace(package_b_pip, version="2.0")
+    index.replace(pip_packages, [package_a_pip, upgraded_b])
+    assert index.duplicates(_order) == {
+        "package_a": [package_a_rpm, package_a_pip],
+        "package_b": [package_b_rpm, upgraded_b],
+    }
+
+    index.replace([package_a_pip, upgraded_b], [])
+    assert index.duplicates(_order) == {}
+
+
+def test_equal_packages_are_not_duplicates():
+    index = DuplicateIndex()
+    index.replace([], [package_a_pip, replace(package_a_pip)])
+
+    assert index.duplicates(_order) == {}
+
+
+def test_names_are_pep503_normalized():
+    rpm_yaml = replace(package_a_rpm, name="PyYAML", package_name="python3-PyYAML")
+    pip_yaml = replace(package_a_pip, name="pyyaml")
+    pip_foo_bar = replace(package_b_pip, name="foo_bar")
+    pipx_foo_bar = replace(package_b_pip, name="Foo.Bar", pkg_type=PkgType.pipx)
+    index = DuplicateIndex()
+    index.replace([], [pip_yaml, pip_foo_bar, pipx_foo_bar, rpm_yaml])
+
+    # named after the first package of the group
+    assert index.duplicates(_order) == {
+        "PyYAML": [rpm_yaml, pip_yaml],
+        "foo_bar": [pip_foo_bar, pipx_foo_bar],
+    }
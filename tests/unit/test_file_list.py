@@ -0,0 +1,54 @@
+from pyclean.cleaner.package_managers.file_list import FileList
+from tests.conftest import install_dist
+
+PATHS = [
+    "/usr/lib/python3.12/site-packages/yaml/__init__.py",
+    "/usr/lib/python3.12/site-packages/yaml/loader.py",
+    "/usr/lib/python3.12/site-packages/yaml",
+    "/usr/bin/pyyaml",
+    "relative",
+]
+
+
+def test_file_list():
+    files = FileList(PATHS)
+    assert list(files) == PATHS
+    assert len(files) == len(PATHS)
+    assert files == PATHS
+    assert files != PATHS[:-1]
+    assert not FileList()
+
+
+def test_file_list_interns_paths():
+    first = FileList(PATHS)
+    second = FileList(["/usr/lib/python3.12/site-packages/yaml/__init__.py"])
+    # directories and basenames are shared by all file lists
+    assert first._dirs[0] is second._dirs[0]
+    assert first._basenames[0] is second._basenames[0]
+
+
+def test_file_list_from_record(tmp_path):
+    dist_info = install_dist(tmp_path, "requests", "2.31.0")
+    files = FileList.from_record(str(dist_info))
+    absolute_files = FileList.from_record(str(dist_info), absolute=True)
+
+    assert len(files) == 3
+    assert list(files) == [
+        "requests/__init__.py",
+        "requests/with,comma.py",
+        "requests-2.31.0.dist-info/RECORD",
+    ]
+    assert next(iter(absolute_files)) == str(tmp_path / "requests" / "__init__.py")
+
+    (dist_info / "RECORD").unlink()
+    assert list(files) == []
+
+
+def test_file_list_json(tmp_path):
+    dist_info = install_dist(tmp_path, "requests", "2.31.0")
+    lazy = FileList.from_record(str(dist_info), absolute=True)
+
+    assert FileList.from_json(FileList(PATHS).to_json()) == PATHS
+    # lazy file list is not read just to be serialized
+    assert lazy.to_json() == {"record": str(dist_info), "absolute": True}
+    assert FileList.from_json(lazy.to_json()) == lazy
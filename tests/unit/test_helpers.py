@@ -0,0 +1,77 @@
+import io
+import json
+
+from pyclean.cleaner.shadowing import ImportAnalysis
+from pyclean.constants import OutputFormat
+from pyclean.helpers import OUTPUT_SCHEMA_VERSION, dupe_table, write_duplicates
+from tests.conftest import (
+    package_a_pip,
+    package_a_pipx,
+    package_a_rpm,
+    package_b_pip,
+    package_b_rpm,
+)
+
+# package_a is found with two providers first, the third one comes later in the scan and
+# its name, the one of its first package, differs
+DUPLICATES = [
+    ("package-a", "package_a", [package_a_rpm, package_a_pip], None),
+    ("package-b", "package_b", [package_b_rpm, package_b_pip], None),
+    ("package-a", "Package.A", [package_a_rpm, package_a_pip, package_a_pipx], None),
+]
+
+
+def test_write_duplicates_ndjson():
+    output = io.StringIO()
+    write_duplicates(output, DUPLICATES, OutputFormat.ndjson)
+
+    records = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert [(record["schema"], record["key"], record["name"]) for record in records] == [
+        (OUTPUT_SCHEMA_VERSION, "package-a", "package_a"),
+        (OUTPUT_SCHEMA_VERSION, "package-b", "package_b"),
+        (OUTPUT_SCHEMA_VERSION, "package-a", "Package.A"),
+    ]
+    assert records[0]["packages"][0] == {
+        "manager": "rpm",
+        "name": "package_a",
+        "package_name": "python3-package_a",
+        "version": "1.0",
+        "location": "/usr/lib",
+        "interpreter": None,
+        "file_count": 2,
+        "imported": None,
+    }
+
+
+def test_write_duplicates_json_with_files():
+    imports = ImportAnalysis(
+        [package_b_rpm, package_b_pip],
+        winners={"package_b": 1},
+        names=[{"package_b"}, {"package_b"}],
+    )
+    duplicates = [
+        *DUPLICATES[:1],
+        ("package-b", "package_b", [package_b_rpm, package_b_pip], imports),
+    ]
+    output = io.StringIO()
+    write_duplicates(output, [*duplicates, DUPLICATES[2]], OutputFormat.json, verbose=True)
+
+    document = json.loads(output.getvalue())
+    assert document["schema"] == OUTPUT_SCHEMA_VERSION
+    # the later duplicate supersedes the earlier one, even under another name
+    assert [record["name"] for record in document["duplicates"]] == ["Package.A", "package_b"]
+    assert [
+        [(package["manager"], package["imported"]) for package in record["packages"]]
+        for record in document["duplicates"]
+    ] == [
+        [("rpm", None), ("pip", None), ("pipx", None)],
+        [("rpm", "no"), ("pip", "yes")],
+    ]
+    assert document["duplicates"][1]["packages"][1]["files"] == ["file1", "file2", "file3"]
+
+
+def test_write_duplicates_text():
+    output = io.StringIO()
+    write_duplicates(output, DUPLICATES[:1], OutputFormat.text)
+
+    assert output.getvalue() == dupe_table("package_a", [package_a_rpm, package_a_pip]) + "\n"
@@ -0,0 +1,96 @@
+from pyclean.cleaner.impact import RpmDependencyGraph, pip_broken_requirements
+from pyclean.cleaner.package_managers.dist_info import DistInfo
+from pyclean.cleaner.package_managers.rpmdb import RpmHeader
+from tests.conftest import install_dist
+
+HEADERS = [
+    RpmHeader(name="python3-urllib3", version="2.0", provides=["python3dist(urllib3)"]),
+    RpmHeader(
+        name="python3-requests",
+        version="2.31",
+        requires=["python3dist(urllib3)", "rpmlib(PayloadIsZstd)"],
+        provides=["python3dist(requests)"],
+    ),
+    RpmHeader(name="httpie", version="3.2", requires=["python3dist(requests)"]),
+    # the capability is provided also by a package which stays
+    RpmHeader(name="python3-six", version="1.16", provides=["python3dist(six)"]),
+    RpmHeader(name="python3-six-compat", version="1.16", provides=["python3dist(six)"]),
+    RpmHeader(name="tool", version="1.0", requires=["python3dist(six)", "/usr/bin/sh"]),
+]
+
+
+def test_removal_closure():
+    graph = RpmDependencyGraph(HEADERS)
+
+    assert graph.removal_closure(["python3-urllib3", "python3-six", "unknown"]) == {
+        "python3-requests": ["python3dist(urllib3)"],
+        "httpie": ["python3dist(requests)"],
+    }
+
+
+def test_unneeded():
+    graph = RpmDependencyGraph(HEADERS)
+
+    assert graph.unneeded({"httpie"}) == ["python3-requests", "python3-urllib3"]
+    assert graph.unneeded({"python3-requests"}) == ["python3-urllib3"]
+    assert graph.unneeded({"tool"}) == ["python3-six", "python3-six-compat"]
+
+
+def test_pip_broken_requirements(tmp_path):
+    dist_info = install_dist(tmp_path, "httpie", "3.2")
+    (dist_info / "METADATA").write_text(
+        "Metadata-Version: 2.1\n"
+        "Name: httpie\n"
+        "Version: 3.2\n"
+        "Requires-Dist: Requests[socks] (>=2.22)\n"
+        "Requires-Dist: charset_normalizer>=2.0\n"
+        'Requires-Dist: pytest; extra == "test"\n'
+        "Requires-Dist: colorama; sys_platform == 'win32'\n"
+        "\n"
+        "Requires-Dist: not a header\n",
+    )
+    install_dist(tmp_path, "requests", "2.31")
+    dists = [DistInfo(str(path)) for path in sorted(tmp_path.glob("*.dist-info"))]
+
+    assert dists[0].requires == ["Requests", "charset_normalizer", "colorama"]
+    # charset-normalizer is removed from pip, but rpm still provides it
+    assert pip_broken_requirements(
+        dists,
+        removed={"requests", "charset-normalizer", "pytest"},
+        remaining={"charset-normalizer"},
+    ) == {"httpie": ["Requests"]}
+
+
+def test_file_and_rich_requires():
+    graph = RpmDependencyGraph(
+        [
+            RpmHeader(name="python3", version="3.12", files=["/usr/bin/python3", "/usr/lib"]),
+            RpmHeader(name="script", version="1.0", requires=["/usr/bin/python3"]),
+            RpmHeader(name="python3-six", version="1.16", provides=["python3dist(six)"]),
+            RpmHeader(
+                name="tool",
+                version="1.0",
+                requires=["(python3dist(six) or python3dist(six-compat) >= 1.0)"],
+            ),
+        ],
+    )
+
+    assert graph.removal_closure(["python3"]) == {"script": ["/usr/bin/python3"]}
+    assert graph.unresolved({"python3"}, auto_remove=False) == {}
+    assert graph.unresolved({"python3-six"}, auto_remove=False) == {
+        "tool": ["(python3dist(six) or python3dist(six-compat) >= 1.0)"],
+    }
+    # whatever the rich dependency pulled in may become unneeded
+    assert graph.unresolved({"tool"}, auto_remove=True) == {
+        "tool": ["(python3dist(six) or python3dist(six-compat) >= 1.0)"],
+    }
+    assert graph.unresolved({"tool"}, auto_remove=False) == {}
+
+
+def test_removal_closure_after_removals():
+    graph = RpmDependencyGraph(HEADERS)
+
+    assert graph.removal_closure(["python3-six-compat"]) == {}
+    assert graph.removal_closure(["python3-six-compat"], removed_before=["python3-six"]) == {
+        "tool": ["python3dist(six)"],
+    }
@@ -0,0 +1,95 @@
+import os
+import sys
+from unittest.mock import MagicMock
+
+from pyclean.cleaner.interpreters import (
+    Interpreter,
+    InterpreterDiscovery,
+    query_interpreter,
+    site_dirs_by_interpreter,
+)
+from pyclean.cleaner.package_managers.pip import Pip
+from tests.conftest import install_dist
+
+
+def test_query_interpreter():
+    interpreter = query_interpreter(sys.executable)
+
+    assert interpreter is not None
+    assert interpreter.version == f"{sys.version_info.major}.{sys.version_info.minor}"
+    assert interpreter.is_venv == (sys.prefix != sys.base_prefix)
+    assert interpreter.site_dirs
+    assert len(set(interpreter.site_dirs)) == len(interpreter.site_dirs)
+
+
+def test_query_interpreter_failing(tmp_path):
+    assert query_interpreter(str(tmp_path / "missing")) is None
+
+
+def test_discover_deduplicates(tmp_path):
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    # python3 is usually a symlink to python3.X, both are the same interpreter
+    (bin_dir / "python3").symlink_to(sys.executable)
+    (bin_dir / "python3.99").symlink_to(bin_dir / "python3")
+    (bin_dir / "python3-config").symlink_to(sys.executable)
+    venv_root = tmp_path / "venvs"
+    for venv in ("first", "second"):
+        (venv_root / venv / "bin").mkdir(parents=True)
+        # venvs symlink the same interpreter, but they are different environments
+        (venv_root / venv / "bin" / "python").symlink_to(sys.executable)
+
+    discovery = InterpreterDiscovery(
+        interpreter_globs=(str(bin_dir / "python3*"),),
+        venv_roots=(str(venv_root),),
+    )
+
+    assert [interpreter.path for interpreter in discovery.discover()] == [
+        str(bin_dir / "python3"),
+        str(venv_root / "first" / "bin" / "python"),
+        str(venv_root / "second" / "bin" / "python"),
+    ]
+
+
+def test_site_dirs_by_interpreter():
+    system = Interpreter(
+        path="/usr/bin/python3.12",
+        version="3.12",
+        site_dirs=["/usr/lib/python3.12/site-packages", "/home/user/.local/lib/python3.12"],
+        user_site="/home/user/.local/lib/python3.12",
+    )
+    venv = Interpreter(
+        path="/home/user/venvs/a/bin/python",
+        version="3.12",
+        is_venv=True,
+        site_dirs=["/home/user/venvs/a/lib/python3.12/site-packages"],
+    )
+
+    assert site_dirs_by_interpreter([system, venv], system_clean=False) == {
+        "/home/user/.local/lib/python3.12": "/usr/bin/python3.12",
+        "/home/user/venvs/a/lib/python3.12/site-packages": "/home/user/venvs/a/bin/python",
+    }
+    assert list(site_dirs_by_interpreter([system, venv], system_clean=True)) == [
+        "/usr/lib/python3.12/site-packages",
+        "/home/user/.local/lib/python3.12",
+        "/home/user/venvs/a/lib/python3.12/site-packages",
+    ]
+
+
+def test_pip_tags_packages_with_interpreter(tmp_path):
+    first = tmp_path / "first"
+    second = tmp_path / "second"
+    install_dist(first, "requests", "2.31.0", installer="pip")
+    install_dist(second, "requests", "2.28.0", installer="pip")
+    discovery = MagicMock()
+    discovery.discover.return_value = [
+        Interpreter(path="/usr/bin/python3.9", version="3.9", user_site=str(first)),
+        Interpreter(path="/usr/bin/python3.12", version="3.12", user_site=str(second)),
+    ]
+
+    packages = Pip(system_clean=False, discovery=discovery).get_python_packages()
+
+    assert sorted((pkg.version, pkg.location, pkg.interpreter) for pkg in packages) == [
+        ("2.28.0", os.path.normpath(second), "/usr/bin/python3.12"),
+        ("2.31.0", os.path.normpath(first), "/usr/bin/python3.9"),
+    ]
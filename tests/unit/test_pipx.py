@@ -0,0 +1,59 @@
+import json
+from unittest.mock import patch
+
+import pytest
+
+from pyclean.cleaner.package_managers.pipx import Pipx
+from pyclean.constants import PkgType
+from tests.conftest import install_dist
+
+
+def _create_venv(pipx_home, name, version, metadata_version="0.5"):
+    venv = pipx_home / "venvs" / name
+    (venv / "bin").mkdir(parents=True)
+    install_dist(venv / "lib" / "python3.12" / "site-packages", name, version, installer="pip")
+    metadata = {
+        "main_package": {
+            "package": name,
+            "package_version": version,
+            "app_paths": [{"__Path__": str(venv / "bin" / name), "__type__": "Path"}],
+        },
+        "source_interpreter": {"__Path__": "/usr/bin/python3.12", "__type__": "Path"},
+        "pipx_metadata_version": metadata_version,
+    }
+    (venv / "pipx_metadata.json").write_text(json.dumps(metadata))
+    return venv
+
+
+@pytest.fixture
+def pipx_home(tmp_path, monkeypatch):
+    monkeypatch.setenv("PIPX_HOME", str(tmp_path))
+    return tmp_path
+
+
+def test_get_python_packages_from_metadata(pipx_home):
+    black_venv = _create_venv(pipx_home, "black", "24.3.0")
+    _create_venv(pipx_home, "tox", "4.14.2")
+
+    with patch.object(Pipx, "_venvs_from_cli") as mock_cli:
+        packages = Pipx(system_clean=False).get_python_packages()
+
+    mock_cli.assert_not_called()
+    assert [(pkg.name, pkg.version, pkg.pkg_type) for pkg in packages] == [
+        ("black", "24.3.0", PkgType.pipx),
+        ("tox", "4.14.2", PkgType.pipx),
+    ]
+    assert packages[0].location == str(black_venv)
+    assert packages[0].files == [
+        str(black_venv / "lib" / "python3.12" / "site-packages" / path)
+        for path in ["black/__init__.py", "black/with,comma.py", "black-24.3.0.dist-info/RECORD"]
+    ]
+
+
+def test_get_python_packages_unknown_metadata_falls_back_to_cli(pipx_home):
+    _create_venv(pipx_home, "black", "24.3.0", metadata_version="99.0")
+
+    with patch.object(Pipx, "_venvs_from_cli", return_value={}) as mock_cli:
+        assert Pipx(system_clean=False).get_python_packages() == []
+
+    mock_cli.assert_called_once()
@@ -0,0 +1,111 @@
+import pytest
+
+from pyclean.cleaner.impact import RemovalImpact
+from pyclean.cleaner.package_managers.base import PackageInfo
+from pyclean.cleaner.policy import Policy, version_key
+from pyclean.constants import PkgType
+from pyclean.helpers import plan_report
+from tests.conftest import (
+    package_a_pip,
+    package_a_pipx,
+    package_a_rpm,
+    package_b_pip,
+    package_b_pipx,
+    package_b_rpm,
+)
+
+DUPLICATES = [
+    ("package-a", "package_a", [package_a_rpm, package_a_pip, package_a_pipx]),
+    ("package-b", "package_b", [package_b_rpm, package_b_pip]),
+]
+
+
+def test_first_matching_rule_decides():
+    policy = Policy.from_dict(
+        {
+            "rule": [
+                {"names": ["Package.A"], "keep": "rpm"},
+                # no pipx copy of package_b, the next rule decides
+                {"names": ["package-*"], "keep": "pipx"},
+                {"keep": "newest"},
+            ],
+        },
+    )
+
+    plan = policy.plan(DUPLICATES)
+
+    assert plan.packages == {
+        PkgType.pip: [package_a_pip],
+        PkgType.pipx: [package_a_pipx],
+        PkgType.rpm: [package_b_rpm],
+    }
+
+
+def test_protected_and_unmatched_packages_are_kept(tmp_path):
+    policy_file = tmp_path / "policy.toml"
+    policy_file.write_text(
+        'protect = ["/home/user/"]\nauto_remove = true\n\n'
+        '[[rule]]\nnames = ["package_a"]\nkeep = "rpm"\n',
+    )
+
+    plan = Policy.load(policy_file).plan(
+        [*DUPLICATES, ("package-b", "package_b", [package_b_pipx])],
+    )
+
+    assert plan.auto_remove
+    assert plan.packages == {}
+
+
+@pytest.mark.parametrize(
+    "data, match",
+    [
+        ({"rule": [{"keep": "dnf"}]}, "Rule 1 has to keep"),
+        ({"rule": [{"keep": "rpm", "name": ["a"]}]}, "unknown keys: name"),
+        ({"rules": []}, "Unknown policy keys: rules"),
+    ],
+)
+def test_invalid_policy(data, match):
+    with pytest.raises(ValueError, match=match):
+        Policy.from_dict(data)
+
+
+def test_version_key():
+    assert version_key("1.10") > version_key("1.9")
+    assert version_key("1.0") > version_key("1.0rc1")
+    assert version_key("1.0.1") > version_key("1.0")
+    assert version_key("2.31.0") == version_key("2.31.0")
+
+
+def test_packages_of_unknown_installer_are_skipped():
+    # pip package without INSTALLER and rpm package without any files
+    unknown = PackageInfo(
+        name="package_a",
+        package_name="package_a",
+        version="0.9",
+        location="/home/user/.local",
+        files=[],
+    )
+    no_files_rpm = PackageInfo(
+        name="package_b",
+        package_name="python3-package_b",
+        version="1.0",
+        location=None,
+        files=[],
+        pkg_type=PkgType.rpm,
+    )
+    policy = Policy.from_dict({"protect": ["/usr"], "rule": [{"keep": "pip"}]})
+
+    plan = policy.plan(
+        [
+            ("package-a", "package_a", [package_a_rpm, package_a_pip, unknown]),
+            ("package-b", "package_b", [no_files_rpm, package_b_pip]),
+        ],
+    )
+
+    assert plan.packages == {PkgType.rpm: [no_files_rpm]}
+    assert plan.skipped == [unknown]
+    assert policy.removed("package_a", [package_a_pip, unknown]) == []
+    assert plan.to_dict()["skipped"] == [
+        {"package_name": "package_a", "version": "0.9", "location": "/home/user/.local"},
+    ]
+    assert "Skip 1 packages" in plan_report(plan, RemovalImpact())
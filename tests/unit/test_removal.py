@@ -0,0 +1,135 @@
+import json
+import sys
+from dataclasses import replace
+from subprocess import CalledProcessError
+from threading import Barrier
+from unittest.mock import MagicMock, patch
+
+from pyclean.cleaner.package_managers.pip import Pip
+from pyclean.cleaner.package_managers.rpm import Rpm
+from pyclean.cleaner.removal import RemovalPlan, RemovalQueue, execute_removal, write_journal
+from pyclean.constants import PkgType
+from tests.conftest import install_dist, package_a_pip, package_a_rpm, package_b_pip
+
+
+def _pkg_manager(pkg_type, remove):
+    pkg_manager = MagicMock()
+    pkg_manager.pkg_type = pkg_type
+    pkg_manager.removal_batches.side_effect = lambda packages: [packages]
+    pkg_manager.batch_removal_command.side_effect = lambda packages, *_: [
+        pkg_type.value,
+        *sorted({package.package_name for package in packages}),
+    ]
+    pkg_manager.rollback_command.return_value = None
+    pkg_manager.remove_packages.side_effect = remove
+    return pkg_manager
+
+
+def test_execute_removal_runs_package_managers_concurrently():
+    # both removals have to be running at once to get through the barrier
+    barrier = Barrier(2, timeout=10)
+    rpm = _pkg_manager(PkgType.rpm, lambda *_: barrier.wait())
+    pip = _pkg_manager(PkgType.pip, lambda *_: barrier.wait())
+    plan = RemovalPlan(
+        packages={PkgType.rpm: [package_a_rpm], PkgType.pip: [package_a_pip, package_b_pip]},
+    )
+
+    steps = execute_removal(plan, [rpm, pip])
+
+    assert [(step.pkg_type, step.command, step.succeeded) for step in steps] == [
+        (PkgType.rpm, ["rpm", "python3-package_a"], True),
+        (PkgType.pip, ["pip", "package_a", "package_b"], True),
+    ]
+    pip.remove_packages.assert_called_once_with([package_a_pip, package_b_pip], False, False)
+
+
+def test_execute_removal_records_failures(tmp_path):
+    def fail(*_):
+        raise CalledProcessError(1, ["sudo", "dnf", "remove"])
+
+    rpm = _pkg_manager(PkgType.rpm, fail)
+    pip = _pkg_manager(PkgType.pip, None)
+    plan = RemovalPlan(packages={PkgType.rpm: [package_a_rpm], PkgType.pip: [package_a_pip]})
+
+    steps = execute_removal(plan, [rpm, pip])
+
+    assert [(step.returncode, step.succeeded) for step in steps] == [(1, False), (0, True)]
+    journal = json.loads(write_journal(steps, tmp_path).read_text())
+    assert [(step["pkg_type"], step["returncode"]) for step in journal] == [("rpm", 1), ("pip", 0)]
+    assert journal[1]["packages"] == [{"package_name": "package_a", "version": "1.1"}]
+
+
+@patch("pyclean.cleaner.package_managers.pip.run")
+def test_pip_removes_packages_by_pip_of_their_interpreter(mock_run):
+    package_a_venv = replace(package_a_pip, interpreter="/venv/bin/python", location="/venv")
+    package_b_venv = replace(package_b_pip, interpreter="/venv/bin/python", location="/venv")
+    pip = Pip(system_clean=False)
+    plan = RemovalPlan(packages={PkgType.pip: [package_a_venv, package_a_pip, package_b_venv]})
+
+    steps = execute_removal(plan, [pip])
+
+    assert [(step.command, step.rollback) for step in steps] == [
+        (
+            ["/venv/bin/python", "-m", "pip", "uninstall", "--yes", "package_a", "package_b"],
+            ["/venv/bin/python", "-m", "pip", "install", "package_a==1.1", "package_b==1.1"],
+        ),
+        (
+            [sys.executable, "-m", "pip", "uninstall", "--yes", "package_a"],
+            [sys.executable, "-m", "pip", "install", "package_a==1.1"],
+        ),
+    ]
+    assert mock_run.call_count == 2
+
+
+@patch("pyclean.cleaner.package_managers.pip.run")
+def test_pip_removal_fails_if_package_is_left(mock_run, tmp_path):
+    install_dist(tmp_path, "package_a", "1.1")
+    package = replace(package_a_pip, location=str(tmp_path))
+
+    steps = execute_removal(RemovalPlan(packages={PkgType.pip: [package]}), [Pip(False)])
+
+    assert not steps[0].succeeded
+    assert steps[0].error == f"pip didn't remove package_a in {tmp_path}"
+
+
+def test_rollback_commands():
+    assert Rpm(system_clean=False).rollback_command([package_a_rpm]) == [
+        "sudo",
+        "dnf",
+        "install",
+        "python3-package_a-1.0",
+    ]
+    assert Pip(system_clean=False).rollback_command([package_a_pip, package_b_pip]) == [
+        sys.executable,
+        "-m",
+        "pip",
+        "install",
+        "package_a==1.1",
+        "package_b==1.1",
+    ]
+
+
+def test_removal_queue_runs_in_order():
+    removed = []
+    pip = _pkg_manager(PkgType.pip, lambda packages, *_: removed.append(packages[0].name))
+    rpm = _pkg_manager(PkgType.rpm, lambda packages, *_: removed.append(packages[0].name))
+
+    with RemovalQueue([rpm, pip]) as removals:
+        removals.submit(RemovalPlan(packages={PkgType.pip: [package_b_pip]}))
+        removals.submit(RemovalPlan(packages={PkgType.rpm: [package_a_rpm]}))
+
+    assert removed == ["package_b", "package_a"]
+    assert removals.pending() == 0
+    assert [step.pkg_type for step in removals.steps] == [PkgType.pip, PkgType.rpm]
+
+
+def test_rpm_removal_assume_yes():
+    rpm = Rpm(system_clean=False)
+
+    assert rpm.removal_command(["python3-package_a"], auto_remove=True, assume_yes=True) == [
+        "sudo",
+        "dnf",
+        "remove",
+        "--assumeyes",
+        "python3-package_a",
+    ]
@@ -0,0 +1,79 @@
+import json
+
+from pyclean.cleaner.cleaner import Cleaner
+from pyclean.cleaner.roots import report_name, scan_roots
+from pyclean.constants import PkgType
+from tests.conftest import install_dist
+
+
+def _create_root(root, name, version):
+    user_site = root / "home" / "user" / ".local" / "lib" / "python3.12" / "site-packages"
+    install_dist(user_site, name, version, installer="pip")
+    # paths in pipx metadata are the ones inside the root
+    venv = f"/home/user/.local/share/pipx/venvs/{name}"
+    venv_path = root / venv.lstrip("/")
+    install_dist(venv_path / "lib" / "python3.12" / "site-packages", name, version, "pip")
+    metadata = {
+        "main_package": {
+            "package": name,
+            "package_version": version,
+            "app_paths": [{"__Path__": f"{venv}/bin/{name}", "__type__": "Path"}],
+        },
+        "pipx_metadata_version": "0.5",
+    }
+    (venv_path / "pipx_metadata.json").write_text(json.dumps(metadata))
+    return user_site, venv_path
+
+
+def test_cleaner_scans_root(tmp_path):
+    user_site, venv_path = _create_root(tmp_path, "black", "24.3.0")
+
+    duplicates = Cleaner(system_clean=False, root=str(tmp_path)).get_package_duplicates()
+
+    assert [(pkg.pkg_type, pkg.location, pkg.interpreter) for pkg in duplicates["black"]] == [
+        (PkgType.pip, str(user_site), f"{tmp_path}/usr/bin/python3.12"),
+        (PkgType.pipx, str(venv_path), f"{venv_path}/bin/python"),
+    ]
+
+
+def test_scan_roots(tmp_path):
+    first = tmp_path / "images" / "first"
+    _create_root(first, "black", "24.3.0")
+    second = tmp_path / "images" / "second"
+    second.mkdir(parents=True)
+    report_dir = tmp_path / "reports"
+
+    reports = sorted(
+        scan_roots([str(first), str(second)], str(report_dir), system_clean=False, use_cache=False),
+        key=lambda report: report.root,
+    )
+
+    assert [(report.root, report.duplicates, report.errors) for report in reports] == [
+        (str(first), 1, {}),
+        (str(second), 0, {}),
+    ]
+    assert reports[0].report_path == str(report_dir / report_name(str(first)))
+    assert "Name: black" in (report_dir / report_name(str(first))).read_text()
+    assert "Name:" not in (report_dir / report_name(str(second))).read_text()
+
+
+def test_scan_roots_reports_failed_root(tmp_path):
+    first = tmp_path / "images" / "first"
+    _create_root(first, "black", "24.3.0")
+    second = tmp_path / "images" / "second"
+    second.mkdir(parents=True)
+    report_dir = tmp_path / "reports"
+    # the report of the first root can't be written
+    (report_dir / report_name(str(first))).mkdir(parents=True)
+
+    reports = sorted(
+        scan_roots([str(first), str(second)], str(report_dir), system_clean=False, use_cache=False),
+        key=lambda report: report.root,
+    )
+
+    assert [(report.root, report.error is not None) for report in reports] == [
+        (str(first), True),
+        (str(second), False),
+    ]
+    assert "Is a directory" in reports[0].error
+    assert (report_dir / report_name(str(second))).is_file()
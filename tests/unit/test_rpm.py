@@ -0,0 +1,231 @@
+from unittest.mock import ANY, patch
+
+from pyclean.cleaner.package_managers.base import PackageInfo
+from pyclean.cleaner.package_managers.rpm import (
+    _FILES_QUERY_FORMAT,
+    _METADATA_QUERY_FORMAT,
+    PythonDistIndex,
+    Rpm,
+    RpmHeader,
+    RpmIndex,
+    parse_rpm_query,
+)
+from pyclean.constants import PkgType
+
+RPM_QUERY_OUTPUT = """\
+@@PKG bash 5.2.26 bash-5.2.26-1.fc40.x86_64 1700000000:aa
+@@REQ /bin/sh
+@@REQ libc.so.6()(64bit)
+@@PRV bash
+@@PKG python3-pyyaml 6.0.1 python3-pyyaml-6.0.1-1.fc40.x86_64 1700000000:bb
+@@REQ python(abi)
+@@PRV python3dist(pyyaml)
+@@PRV python3.12dist(pyyaml)
+@@PKG gpg-pubkey 8d8c1f3a gpg-pubkey-8d8c1f3a-1.(none) 1700000000:cc
+@@REQ (none)
+@@PRV gpg(Fedora)
+@@PKG pyscript 1.0 pyscript-1.0-1.noarch 1700000000:dd
+@@REQ /usr/bin/python3
+"""
+
+RPM_FILES_OUTPUT = """\
+@@PKG python3-pyyaml 6.0.1 python3-pyyaml-6.0.1-1.fc40.x86_64 1700000000:bb
+@@FILE /usr/lib64/python3.12/site-packages/yaml/__init__.py
+@@FILE /usr/lib64/python3.12/site-packages/yaml/loader.py
+@@PKG pyscript 1.0 pyscript-1.0-1.noarch 1700000000:dd
+@@FILE /usr/bin/pyscript
+"""
+
+
+def test_parse_rpm_query():
+    headers = list(parse_rpm_query(RPM_QUERY_OUTPUT.splitlines(keepends=True)))
+    assert headers == [
+        RpmHeader(
+            name="bash",
+            version="5.2.26",
+            key="bash-5.2.26-1.fc40.x86_64",
+            stamp="1700000000:aa",
+            requires=["/bin/sh", "libc.so.6()(64bit)"],
+            provides=["bash"],
+        ),
+        RpmHeader(
+            name="python3-pyyaml",
+            version="6.0.1",
+            key="python3-pyyaml-6.0.1-1.fc40.x86_64",
+            stamp="1700000000:bb",
+            requires=["python(abi)"],
+            provides=["python3dist(pyyaml)", "python3.12dist(pyyaml)"],
+        ),
+        RpmHeader(
+            name="gpg-pubkey",
+            version="8d8c1f3a",
+            key="gpg-pubkey-8d8c1f3a-1.(none)",
+            stamp="1700000000:cc",
+            provides=["gpg(Fedora)"],
+        ),
+        RpmHeader(
+            name="pyscript",
+            version="1.0",
+            key="pyscript-1.0-1.noarch",
+            stamp="1700000000:dd",
+            requires=["/usr/bin/python3"],
+        ),
+    ]
+
+
+def test_python_dist_index():
+    index = PythonDistIndex(
+        [
+            RpmHeader(name="python3-pyyaml", version="6.0.1", provides=["python3dist(pyyaml)"]),
+            RpmHeader(
+                name="python3-requests+socks",
+                version="2.31.0",
+                provides=["python3dist(requests[socks])"],
+            ),
+            RpmHeader(name="bash", version="5.2.26", provides=["bash"]),
+        ],
+    )
+    assert "python3-pyyaml" in index
+    assert index.dist_name("python3-pyyaml") == "pyyaml"
+    assert "python3-requests+socks" not in index
+    assert index.dist_name("bash") is None
+
+
+def _fake_query(query_output, files_output):
+    def query(_, query_format, names=None):
+        if query_format == _FILES_QUERY_FORMAT:
+            output = files_output
+        elif query_format == _METADATA_QUERY_FORMAT:
+            output = query_output
+        else:
+            output = "".join(line for line in query_output.splitlines(True) if "@@PKG" in line)
+
+        for header in parse_rpm_query(output.splitlines()):
+            if names is None or header.name in names:
+                yield header
+
+    return query
+
+
+def test_get_python_packages():
+    with patch.object(
+        Rpm,
+        "_query",
+        autospec=True,
+        side_effect=_fake_query(RPM_QUERY_OUTPUT, RPM_FILES_OUTPUT),
+    ) as mock_query:
+        packages = Rpm(system_clean=True).get_python_packages()
+
+    # file lists are fetched only for python packages
+    mock_query.assert_called_with(ANY, _FILES_QUERY_FORMAT, ["pyscript", "python3-pyyaml"])
+    assert [(pkg.name, pkg.package_name) for pkg in packages] == [
+        ("pyyaml", "python3-pyyaml"),
+        ("pyscript", "pyscript"),
+    ]
+    assert packages[0].location == "/usr/lib64/python3.12/site-packages/yaml"
+    assert all(pkg.pkg_type == PkgType.rpm for pkg in packages)
+
+
+def test_iter_all_packages():
+    with patch.object(
+        Rpm,
+        "_query",
+        autospec=True,
+        side_effect=_fake_query(
+            RPM_QUERY_OUTPUT,
+            "@@PKG bash 5.2.26 bash-5.2.26-1.fc40.x86_64 1700000000:aa\n@@FILE /usr/bin/bash\n"
+            + RPM_FILES_OUTPUT,
+        ),
+    ):
+        packages = list(Rpm(system_clean=True).iter_all_packages())
+
+    # not only python packages, their files are protected too
+    assert ("bash", ["/usr/bin/bash"]) in [(pkg.package_name, list(pkg.files)) for pkg in packages]
+
+
+def test_rescan_processes_only_changed_packages():
+    rpm = Rpm(system_clean=True)
+    with patch.object(
+        Rpm,
+        "_query",
+        autospec=True,
+        side_effect=_fake_query(RPM_QUERY_OUTPUT, RPM_FILES_OUTPUT),
+    ):
+        before = rpm.get_python_packages()
+
+    reinstalled = RPM_QUERY_OUTPUT.replace("1700000000:dd", "1700000500:ee")
+    rpm.invalidate()
+    with patch.object(
+        Rpm,
+        "_query",
+        autospec=True,
+        side_effect=_fake_query(reinstalled, RPM_FILES_OUTPUT),
+    ) as mock_query:
+        after = rpm.get_python_packages()
+
+    mock_query.assert_any_call(ANY, _METADATA_QUERY_FORMAT, ["pyscript"])
+    mock_query.assert_called_with(ANY, _FILES_QUERY_FORMAT, ["pyscript"])
+    assert after == before
+    # unchanged package is reused from the previous scan as is
+    assert after[0] is before[0]
+    assert after[1] is not before[1]
+
+
+def test_rpm_index():
+    headers = list(parse_rpm_query(RPM_QUERY_OUTPUT.splitlines()))
+    headers[1].files = ["/usr/lib64/python3.12/site-packages/PyYAML-6.0.1.dist-info"]
+    package = Rpm._process_rpm_package(headers[1], PythonDistIndex(headers))
+    index = RpmIndex(headers, [package])
+
+    assert index.version("bash") == "5.2.26"
+    assert index.version("python3-pyyaml") == "6.0.1"
+    # PyPI name from python3dist() works as well, in any PEP 503 spelling
+    assert index.version("PyYAML") == "6.0.1"
+    assert index.version("requests") is None
+    assert (
+        index.owner("/usr/lib64/python3.12/site-packages/PyYAML-6.0.1.dist-info/")
+        == "python3-pyyaml"
+    )
+    assert index.owner("/usr/bin/bash") is None
+
+
+def test_without_duplicates_normalizes_names():
+    library = PackageInfo(
+        name="Foo_Bar",
+        package_name="python3-Foo_Bar",
+        version="1.0",
+        location="/usr/lib/python3.12/site-packages",
+        files=[],
+        pkg_type=PkgType.rpm,
+    )
+    binary = PackageInfo(
+        name="foo-bar",
+        package_name="foo-bar",
+        version="1.0",
+        location="/usr/bin",
+        files=[],
+        pkg_type=PkgType.rpm,
+    )
+    assert Rpm._without_duplicates([library, binary]) == [binary]
+
+
+def test_parse_rpm_query_digests():
+    output = """\
+@@PKG python3-pyyaml 6.0.1 python3-pyyaml-6.0.1-1.fc40.x86_64 1700000000:bb
+@@ALGO 8
+@@DIG  /usr/lib64/python3.12/site-packages/yaml
+@@DIG abc123 /usr/lib64/python3.12/site-packages/yaml/__init__.py
+@@PKG empty 1.0 empty-1.0-1.noarch 1700000000:cc
+@@ALGO (none)
+@@DIG (none) (none)
+"""
+    pyyaml, empty = parse_rpm_query(output.splitlines())
+
+    assert pyyaml.digest_algorithm == 8
+    assert pyyaml.files == [
+        "/usr/lib64/python3.12/site-packages/yaml",
+        "/usr/lib64/python3.12/site-packages/yaml/__init__.py",
+    ]
+    assert pyyaml.digests == ["", "abc123"]
+    assert empty.digest_algorithm == 1
+    assert empty.files == []
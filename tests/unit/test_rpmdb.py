@@ -0,0 +1,163 @@
+import sqlite3
+import struct
+from typing import Any
+
+import pytest
+
+from pyclean.cleaner.package_managers.file_list import FileDigest
+from pyclean.cleaner.package_managers.rpm import Rpm
+from pyclean.cleaner.package_managers.rpmdb import (
+    RPM_INT32_TYPE,
+    RPM_STRING_ARRAY_TYPE,
+    RPM_STRING_TYPE,
+    RPMTAG_BASENAMES,
+    RPMTAG_DIRINDEXES,
+    RPMTAG_DIRNAMES,
+    RPMTAG_FILEDIGESTALGO,
+    RPMTAG_FILEDIGESTS,
+    RPMTAG_INSTALLTIME,
+    RPMTAG_NAME,
+    RPMTAG_PROVIDENAME,
+    RPMTAG_REQUIRENAME,
+    RPMTAG_VERSION,
+    RpmHeader,
+    iter_rpmdb_headers,
+    parse_header_blob,
+)
+from pyclean.constants import RpmBackend
+
+
+def _header_blob(tags: dict[int, tuple[int, Any]]) -> bytes:
+    index = b""
+    data = b""
+    for tag, (tag_type, value) in tags.items():
+        if tag_type == RPM_INT32_TYPE:
+            # int32 values are aligned to 4 bytes
+            data += b"\0" * (-len(data) % 4)
+            encoded = struct.pack(f">{len(value)}i", *value)
+            count = len(value)
+        elif tag_type == RPM_STRING_TYPE:
+            encoded = value.encode() + b"\0"
+            count = 1
+        else:
+            encoded = b"".join(item.encode() + b"\0" for item in value)
+            count = len(value)
+
+        index += struct.pack(">iIiI", tag, tag_type, len(data), count)
+        data += encoded
+
+    return struct.pack(">II", len(tags), len(data)) + index + data
+
+
+PYTHON_REQUESTS_BLOB = _header_blob(
+    {
+        RPMTAG_NAME: (RPM_STRING_TYPE, "python3-requests"),
+        RPMTAG_VERSION: (RPM_STRING_TYPE, "2.31.0"),
+        RPMTAG_INSTALLTIME: (RPM_INT32_TYPE, [1700000000]),
+        RPMTAG_REQUIRENAME: (RPM_STRING_ARRAY_TYPE, ["python(abi)"]),
+        RPMTAG_PROVIDENAME: (RPM_STRING_ARRAY_TYPE, ["python3dist(requests)"]),
+        RPMTAG_DIRINDEXES: (RPM_INT32_TYPE, [0, 0]),
+        RPMTAG_BASENAMES: (RPM_STRING_ARRAY_TYPE, ["__init__.py", "api.py"]),
+        RPMTAG_DIRNAMES: (
+            RPM_STRING_ARRAY_TYPE,
+            ["/usr/lib/python3.12/site-packages/requests/"],
+        ),
+        RPMTAG_FILEDIGESTS: (RPM_STRING_ARRAY_TYPE, ["aa", "bb"]),
+        RPMTAG_FILEDIGESTALGO: (RPM_INT32_TYPE, [8]),
+    },
+)
+
+BASH_BLOB = _header_blob(
+    {
+        RPMTAG_NAME: (RPM_STRING_TYPE, "bash"),
+        RPMTAG_VERSION: (RPM_STRING_TYPE, "5.2.26"),
+        RPMTAG_DIRINDEXES: (RPM_INT32_TYPE, [0]),
+        RPMTAG_BASENAMES: (RPM_STRING_ARRAY_TYPE, ["bash"]),
+        RPMTAG_DIRNAMES: (RPM_STRING_ARRAY_TYPE, ["/usr/bin/"]),
+    },
+)
+
+
+@pytest.fixture
+def rpm_root(tmp_path):
+    rpmdb_dir = tmp_path / "var" / "lib" / "rpm"
+    rpmdb_dir.mkdir(parents=True)
+    connection = sqlite3.connect(rpmdb_dir / "rpmdb.sqlite")
+    connection.execute("CREATE TABLE Packages (hnum INTEGER PRIMARY KEY, blob BLOB NOT NULL)")
+    connection.executemany(
+        "INSERT INTO Packages (blob) VALUES (?)",
+        [(BASH_BLOB,), (PYTHON_REQUESTS_BLOB,)],
+    )
+    connection.commit()
+    connection.close()
+    return tmp_path
+
+
+def test_parse_header_blob():
+    tags = parse_header_blob(PYTHON_REQUESTS_BLOB)
+    assert tags[RPMTAG_NAME] == "python3-requests"
+    assert tags[RPMTAG_DIRINDEXES] == [0, 0]
+    assert tags[RPMTAG_PROVIDENAME] == ["python3dist(requests)"]
+
+
+def test_parse_header_blob_truncated():
+    with pytest.raises(ValueError):
+        parse_header_blob(PYTHON_REQUESTS_BLOB[:-10])
+
+
+def test_iter_rpmdb_headers(rpm_root):
+    assert list(iter_rpmdb_headers(str(rpm_root))) == [
+        RpmHeader(
+            name="bash",
+            version="5.2.26",
+            key="bash-5.2.26-(none).(none)",
+            stamp="0:(none)",
+            files=["/usr/bin/bash"],
+        ),
+        RpmHeader(
+            name="python3-requests",
+            version="2.31.0",
+            key="python3-requests-2.31.0-(none).(none)",
+            stamp="1700000000:(none)",
+            requires=["python(abi)"],
+            provides=["python3dist(requests)"],
+            files=[
+                "/usr/lib/python3.12/site-packages/requests/__init__.py",
+                "/usr/lib/python3.12/site-packages/requests/api.py",
+            ],
+        ),
+    ]
+
+
+def test_sqlite_backend(rpm_root, tmp_path_factory):
+    rpm = Rpm(system_clean=True, backend=RpmBackend.sqlite, root=str(rpm_root))
+    assert rpm.exists()
+    assert [pkg.package_name for pkg in rpm.get_python_packages()] == ["python3-requests"]
+
+    empty_root = tmp_path_factory.mktemp("empty")
+    assert not Rpm(system_clean=True, backend=RpmBackend.sqlite, root=str(empty_root)).exists()
+
+
+def test_iter_rpmdb_headers_by_key(rpm_root):
+    headers = iter_rpmdb_headers(
+        str(rpm_root),
+        with_files=False,
+        keys={"python3-requests-2.31.0-(none).(none)"},
+    )
+    assert [(header.name, header.files) for header in headers] == [("python3-requests", [])]
+
+
+def test_sqlite_backend_file_digests(rpm_root):
+    rpm = Rpm(system_clean=True, backend=RpmBackend.sqlite, root=str(rpm_root))
+    package = rpm.get_python_packages()[0]
+
+    # paths inside the root are mapped to this machine
+    site_packages = f"{rpm_root}/usr/lib/python3.12/site-packages"
+    assert package.files == [
+        f"{site_packages}/requests/__init__.py",
+        f"{site_packages}/requests/api.py",
+    ]
+    assert rpm.file_digests(package) == {
+        f"{site_packages}/requests/__init__.py": FileDigest("sha256", "aa"),
+        f"{site_packages}/requests/api.py": FileDigest("sha256", "bb"),
+    }
@@ -0,0 +1,82 @@
+import sys
+
+from pyclean.cleaner.package_managers.base import PackageInfo
+from pyclean.cleaner.shadowing import (
+    PathPriority,
+    analyze_imports,
+    interpreter_sys_path,
+)
+from pyclean.constants import PkgType
+
+USER_SITE = "/home/user/.local/lib/python3.12/site-packages"
+SYSTEM_SITE = "/usr/lib/python3.12/site-packages"
+PATH_PRIORITY = PathPriority(["/usr/lib/python312.zip", USER_SITE, SYSTEM_SITE])
+
+
+def _package(pkg_type, location, files):
+    return PackageInfo(
+        name="PyYAML",
+        package_name="PyYAML",
+        version="6.0",
+        location=location,
+        files=files,
+        pkg_type=pkg_type,
+    )
+
+
+rpm_yaml = _package(
+    PkgType.rpm,
+    SYSTEM_SITE,
+    [
+        f"{SYSTEM_SITE}/yaml",
+        f"{SYSTEM_SITE}/yaml/__init__.py",
+        f"{SYSTEM_SITE}/yaml/__pycache__/__init__.cpython-312.pyc",
+        f"{SYSTEM_SITE}/_yaml/__init__.py",
+        f"{SYSTEM_SITE}/PyYAML-6.0.dist-info/METADATA",
+        "/usr/share/doc/python3-pyyaml/README",
+    ],
+)
+pip_yaml = _package(
+    PkgType.pip,
+    USER_SITE,
+    ["yaml/__init__.py", "PyYAML-6.0.dist-info/RECORD", "../../../bin/yaml-tool"],
+)
+
+
+def test_interpreter_sys_path():
+    sys_path = interpreter_sys_path(sys.executable)
+    assert "" not in sys_path
+    assert sys_path[-1] == sys.path[-1]
+
+
+def test_top_level():
+    assert PATH_PRIORITY.top_level(f"{SYSTEM_SITE}/yaml/sub/module.py") == (SYSTEM_SITE, "yaml")
+    assert PATH_PRIORITY.top_level(f"{SYSTEM_SITE}/six.py") == (SYSTEM_SITE, "six")
+    assert PATH_PRIORITY.top_level(f"{SYSTEM_SITE}/_yaml.cpython-312.so") == (
+        SYSTEM_SITE,
+        "_yaml",
+    )
+    assert PATH_PRIORITY.top_level(f"{SYSTEM_SITE}/distutils-precedence.pth") is None
+    assert PATH_PRIORITY.top_level(f"{SYSTEM_SITE}/six-1.0.dist-info/RECORD") is None
+    assert PATH_PRIORITY.top_level("/usr/bin/yaml-tool") is None
+
+
+def test_analyze_imports():
+    imports = analyze_imports([rpm_yaml, pip_yaml], PATH_PRIORITY)
+
+    assert imports.names == [{"yaml", "_yaml"}, {"yaml"}]
+    # user site-packages come first on sys.path
+    assert imports.winners == {"yaml": 1, "_yaml": 0}
+    assert imports.status(0) == "partly"
+    assert imports.status(1) == "yes"
+
+
+def test_analyze_imports_same_directory():
+    other_rpm = _package(PkgType.rpm, SYSTEM_SITE, [f"{SYSTEM_SITE}/yaml/__init__.py"])
+    system_pip = _package(PkgType.pip, SYSTEM_SITE, ["yaml/__init__.py"])
+    not_importable = _package(PkgType.pipx, "/opt/venv", ["/opt/venv/lib/yaml/__init__.py"])
+    imports = analyze_imports([other_rpm, system_pip, not_importable], PATH_PRIORITY)
+
+    # whoever installed last overwrote the files
+    assert imports.winners == {"yaml": None}
+    assert [imports.status(i) for i in range(3)] == ["?", "?", "-"]
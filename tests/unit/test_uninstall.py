@@ -0,0 +1,102 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+from pyclean.cleaner.package_managers.base import PackageInfo
+from pyclean.cleaner.package_managers.dist_info import DistInfo
+from pyclean.cleaner.package_managers.pip import Pip
+from pyclean.cleaner.removal import RemovalPlan
+from pyclean.cleaner.uninstall import NativeUninstaller, TrashSession, latest_session
+from pyclean.constants import PkgType
+from tests.conftest import install_dist
+
+
+@pytest.fixture
+def site_packages(tmp_path):
+    path = tmp_path / "site-packages"
+    install_dist(path, "requests", "2.31.0", installer="pip")
+    (path / "requests" / "__pycache__").mkdir(parents=True)
+    (path / "requests" / "__init__.py").write_text("")
+    (path / "requests" / "with,comma.py").write_text("")
+    (path / "requests" / "__pycache__" / "__init__.cpython-312.pyc").write_text("")
+    # another distribution in the same site-packages stays untouched
+    install_dist(path, "six", "1.16.0", installer="pip")
+    return path
+
+
+def test_uninstall_and_restore(site_packages, tmp_path):
+    before = sorted(path for path in site_packages.rglob("*"))
+    dist = DistInfo(str(site_packages / "requests-2.31.0.dist-info"))
+    session = TrashSession.create(tmp_path / "trash")
+
+    moved = NativeUninstaller(session).uninstall(dist)
+
+    assert str(site_packages / "requests" / "__pycache__" / "__init__.cpython-312.pyc") in moved
+    assert str(site_packages / "requests-2.31.0.dist-info" / "METADATA") in moved
+    # empty directories are pruned, the rest of site-packages is kept
+    assert sorted(path.name for path in site_packages.iterdir()) == ["six-1.16.0.dist-info"]
+
+    restored = latest_session(tmp_path / "trash")
+    assert restored is not None
+    assert restored.restore() == []
+    assert sorted(path for path in site_packages.rglob("*")) == before
+    assert latest_session(tmp_path / "trash") is None
+
+
+def test_uninstall_refuses_protected_files(site_packages, tmp_path):
+    dist = DistInfo(str(site_packages / "requests-2.31.0.dist-info"))
+    protected = str(site_packages / "requests" / "__init__.py")
+    uninstaller = NativeUninstaller(
+        TrashSession.create(tmp_path / "trash"),
+        is_protected=lambda path: path == protected,
+    )
+
+    with pytest.raises(PermissionError, match="requests"):
+        uninstaller.uninstall(dist)
+
+    assert (site_packages / "requests" / "with,comma.py").exists()
+    assert (site_packages / "requests-2.31.0.dist-info" / "RECORD").exists()
+
+
+def test_pip_native_uninstall_keeps_rpm_files(site_packages, tmp_path):
+    rpm = MagicMock()
+    # not a python package, its files are protected all the same
+    rpm.iter_all_packages.return_value = [
+        PackageInfo(
+            name="requests-tools",
+            package_name="requests-tools",
+            version="1.0",
+            location=str(site_packages),
+            files=[str(site_packages / "requests" / "__init__.py")],
+            pkg_type=PkgType.rpm,
+        ),
+    ]
+    pip = Pip(system_clean=False, rpm=rpm, trash=TrashSession.create(tmp_path / "trash"))
+    requests = PackageInfo(
+        name="requests",
+        package_name="requests",
+        version="2.31.0",
+        location=str(site_packages),
+        files=[],
+        pkg_type=PkgType.pip,
+    )
+    six = PackageInfo(
+        name="six",
+        package_name="six",
+        version="1.16.0",
+        location=str(site_packages),
+        files=[],
+        pkg_type=PkgType.pip,
+    )
+
+    with pytest.raises(RuntimeError, match="owned by rpm"):
+        pip.remove_packages([requests, six], auto_remove=False)
+
+    # six is uninstalled even though requests was refused
+    assert sorted(path.name for path in site_packages.iterdir()) == [
+        "requests",
+        "requests-2.31.0.dist-info",
+    ]
+    assert pip.rollback_command([six]) == ["pyclean", "undo", pip.trash.session_id]
+    step = RemovalPlan(packages={PkgType.pip: [six]}).steps([pip])[0]
+    assert (step.to_dict()["kind"], step.command) == ("native-uninstall", None)
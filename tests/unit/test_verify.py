@@ -0,0 +1,91 @@
+import base64
+import hashlib
+
+from pyclean.cleaner.package_managers.base import PackageInfo
+from pyclean.cleaner.package_managers.dist_info import DistInfo
+from pyclean.cleaner.package_managers.file_list import FileDigest, record_digests
+from pyclean.cleaner.verify import hash_file, hash_files, verify_packages
+from pyclean.constants import PkgType
+from tests.conftest import install_dist
+
+RPM_CONTENT = b"rpm version\n"
+PIP_CONTENT = b"pip version\n"
+
+
+def _sha256(content):
+    return hashlib.sha256(content).hexdigest()
+
+
+def _package(pkg_type, location):
+    return PackageInfo(
+        name="yaml",
+        package_name="yaml",
+        version="1.0",
+        location=str(location),
+        files=[],
+        pkg_type=pkg_type,
+    )
+
+
+def test_hash_file(tmp_path):
+    path = tmp_path / "file"
+    path.write_bytes(RPM_CONTENT)
+    (tmp_path / "empty").touch()
+
+    assert hash_file(str(path), "sha256") == _sha256(RPM_CONTENT)
+    assert hash_file(str(path), "md5") == hashlib.md5(RPM_CONTENT).hexdigest()
+    assert hash_file(str(tmp_path / "empty"), "sha256") == _sha256(b"")
+    assert hash_file(str(tmp_path / "missing"), "sha256") is None
+
+
+def test_hash_files_bounded(tmp_path):
+    requests = []
+    for i in range(200):
+        path = tmp_path / f"file{i}"
+        path.write_bytes(str(i).encode())
+        requests.append((str(path), "sha256"))
+
+    hashes = hash_files(requests, jobs=2, max_in_flight=1)
+    assert hashes == {request: _sha256(str(i).encode()) for i, request in enumerate(requests)}
+
+
+def test_record_digests(tmp_path):
+    dist_info = install_dist(tmp_path, "yaml", "1.0")
+    digest = base64.urlsafe_b64encode(hashlib.sha256(PIP_CONTENT).digest()).rstrip(b"=")
+    (dist_info / "RECORD").write_text(
+        f"yaml/__init__.py,sha256={digest.decode()},12\nyaml-1.0.dist-info/RECORD,,\n",
+    )
+
+    assert record_digests(DistInfo(str(dist_info))) == {
+        str(tmp_path / "yaml" / "__init__.py"): FileDigest("sha256", _sha256(PIP_CONTENT)),
+    }
+
+
+def test_verify_packages(tmp_path):
+    overwritten = str(tmp_path / "yaml" / "__init__.py")
+    missing = str(tmp_path / "yaml" / "missing.py")
+    (tmp_path / "yaml").mkdir()
+    (tmp_path / "yaml" / "__init__.py").write_bytes(PIP_CONTENT)
+    rpm = _package(PkgType.rpm, tmp_path)
+    pip = _package(PkgType.pip, tmp_path)
+
+    rpm_result, pip_result = verify_packages(
+        [
+            (
+                rpm,
+                {
+                    overwritten: FileDigest("md5", hashlib.md5(RPM_CONTENT).hexdigest()),
+                    missing: FileDigest("md5", hashlib.md5(b"").hexdigest()),
+                },
+            ),
+            (pip, {overwritten: FileDigest("sha256", _sha256(PIP_CONTENT))}),
+        ],
+        jobs=1,
+    )
+
+    # pip was installed last, its copy of the file is on the disk
+    assert rpm_result.modified == {overwritten: pip}
+    assert rpm_result.missing == [missing]
+    assert rpm_result.verified == 0
+    assert pip_result.verified == 1
+    assert not pip_result.modified